@@ -0,0 +1,314 @@
+import os
+import json
+import hmac
+import time
+import logging
+import asyncio
+import decimal
+import hashlib
+import datetime
+from contextlib import asynccontextmanager
+from pymysql.err import MySQLError
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from database.async_connector import close_async_pool
+from models.contract import (
+    list_contracts_async,
+    get_contract_by_id_async,
+    get_contract_assessments_async,
+    get_contract_payouts_async,
+    extend_contract_async
+)
+from models.assessment import (
+    list_assessments_async,
+    get_assessment_by_id_async,
+    file_claim_async,
+    update_assessment_result_async,
+    ASSESSMENT_RESULTS
+)
+from models.payout import list_payouts_async, get_payout_by_id_async, update_payout_status_async
+from models.customer import get_customer_by_id_async
+
+logger = logging.getLogger(__name__)
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Worker processes; each has its own connection pool (ASYNC_POOL_SIZE) and response cache
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Clients must send it in the X-API-Key header when set
+API_KEY = os.getenv("API_KEY")
+# Seconds a GET response is served from memory before the database is asked again
+API_CACHE_SECONDS = float(os.getenv("API_CACHE_SECONDS", "5"))
+API_CACHE_MAX_ENTRIES = 10000
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+PAYOUT_STATUSES = ["Pending", "Approved", "Rejected", "Completed"]
+
+# Encoded GET responses: cache key -> (expires_at, body, etag)
+_responses = {}
+# Responses being loaded, shared by identical requests arriving meanwhile
+_loading = {}
+# Bumped by every write so loads that started before it are not cached
+_generation = 0
+
+def to_json_value(value):
+    """JSON form of the database values json cannot encode (money as exact strings)"""
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def encode(data):
+    """Encode data as a compact JSON body"""
+    return json.dumps(data, default=to_json_value, separators=(",", ":")).encode()
+
+def invalidate_responses():
+    """Forget all cached responses after a write"""
+    global _generation
+    _generation += 1
+    _responses.clear()
+
+async def load_response(key, load):
+    """Run a loader and cache its encoded result (unless a write happened meanwhile)"""
+    generation = _generation
+    body = encode(await load())
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if generation == _generation:
+        if len(_responses) >= API_CACHE_MAX_ENTRIES:
+            _responses.pop(next(iter(_responses)))  # Oldest entry
+        _responses[key] = (time.monotonic() + API_CACHE_SECONDS, body, etag)
+    return body, etag
+
+async def cached_response(request, load):
+    """Answer a GET from the response cache or the loader, honouring If-None-Match.
+
+    Concurrent misses for the same URL share one database query.
+    """
+    key = f"{request.url.path}?{'&'.join(sorted(f'{k}={v}' for k, v in request.query_params.multi_items()))}"
+    entry = _responses.get(key)
+    if entry and entry[0] > time.monotonic():
+        _, body, etag = entry
+    else:
+        task = _loading.get(key)
+        if task is None:
+            task = _loading[key] = asyncio.ensure_future(load_response(key, load))
+            task.add_done_callback(lambda _: _loading.pop(key, None))
+        # One client disconnecting must not cancel the load for the others
+        body, etag = await asyncio.shield(task)
+
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={int(API_CACHE_SECONDS)}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def json_response(data, status_code=200):
+    """Uncached JSON response (writes)"""
+    return Response(encode(data), status_code=status_code, media_type="application/json")
+
+def page_params(request):
+    """Keyset cursor and page size of a list request"""
+    try:
+        limit = int(request.query_params.get("limit", API_PAGE_SIZE))
+    except ValueError:
+        raise HTTPException(400, "limit must be an integer")
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise HTTPException(400, f"limit must be between 1 and {API_MAX_PAGE_SIZE}")
+    return request.query_params.get("after"), limit
+
+async def list_page(request, list_fn, id_column, **filters):
+    """One page of a listing; 'next' is the cursor of the following page (null on the last)"""
+    after, limit = page_params(request)
+
+    async def load():
+        items = await list_fn(after=after, limit=limit, **filters)
+        return {'items': items, 'next': items[-1][id_column] if len(items) == limit else None}
+
+    return await cached_response(request, load)
+
+async def lookup(request, get_fn, key, label):
+    """A single record by ID, or 404"""
+    async def load():
+        record = await get_fn(key)
+        if record is None:
+            raise HTTPException(404, f"{label} {key} not found")
+        return record
+
+    return await cached_response(request, load)
+
+async def read_body(request, *required):
+    """JSON object body of a write request with the required fields present"""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "Request body must be a JSON object")
+    missing = [field for field in required if body.get(field) in (None, "")]
+    if missing:
+        raise HTTPException(400, f"Missing fields: {', '.join(missing)}")
+    return body
+
+def parse_date(value, field):
+    """ISO date from a request field"""
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        raise HTTPException(400, f"{field} must be a date (YYYY-MM-DD)")
+
+async def health(request):
+    return JSONResponse({'status': "ok"})
+
+async def list_contracts(request):
+    return await list_page(request, list_contracts_async, 'ContractID', status=request.query_params.get("status"))
+
+async def get_contract(request):
+    return await lookup(request, get_contract_by_id_async, request.path_params['contract_id'], "Contract")
+
+async def get_contract_claims(request):
+    contract_id = request.path_params['contract_id']
+    return await cached_response(request, lambda: get_contract_assessments_async(contract_id))
+
+async def get_contract_payouts(request):
+    contract_id = request.path_params['contract_id']
+    return await cached_response(request, lambda: get_contract_payouts_async(contract_id))
+
+async def extend_contract(request):
+    contract_id = request.path_params['contract_id']
+    body = await read_body(request, 'expiration_date')
+    expiration_date = parse_date(body['expiration_date'], 'expiration_date')
+    if not await extend_contract_async(contract_id, expiration_date):
+        raise HTTPException(404, f"Contract {contract_id} not found")
+    invalidate_responses()
+    return json_response(await get_contract_by_id_async(contract_id))
+
+async def list_claims(request):
+    return await list_page(
+        request, list_assessments_async, 'AssessmentID',
+        result=request.query_params.get("result"),
+        contract_id=request.query_params.get("contract_id")
+    )
+
+async def get_claim(request):
+    return await lookup(request, get_assessment_by_id_async, request.path_params['assessment_id'], "Claim")
+
+async def file_claim(request):
+    body = await read_body(request, 'contract_id', 'claim_amount')
+    try:
+        claim_amount = decimal.Decimal(str(body['claim_amount']))
+    except decimal.InvalidOperation:
+        raise HTTPException(400, "claim_amount must be a number")
+    if not claim_amount.is_finite() or claim_amount <= 0:
+        raise HTTPException(400, "claim_amount must be positive")
+    assessment_date = parse_date(body.get('assessment_date') or datetime.date.today(), 'assessment_date')
+
+    contract = await get_contract_by_id_async(body['contract_id'])
+    if contract is None:
+        raise HTTPException(404, f"Contract {body['contract_id']} not found")
+    if contract['Status'] != 'Active':
+        raise HTTPException(409, f"Contract {body['contract_id']} is not active")
+
+    assessment_id = await file_claim_async(contract['ContractID'], assessment_date, claim_amount.quantize(decimal.Decimal("0.01")))
+    invalidate_responses()
+    return json_response(await get_assessment_by_id_async(assessment_id), status_code=201)
+
+async def update_claim(request):
+    assessment_id = request.path_params['assessment_id']
+    body = await read_body(request, 'result')
+    if body['result'] not in ASSESSMENT_RESULTS:
+        raise HTTPException(400, f"result must be one of {', '.join(ASSESSMENT_RESULTS)}")
+    if not await update_assessment_result_async(assessment_id, body['result']):
+        raise HTTPException(404, f"Claim {assessment_id} not found")
+    invalidate_responses()
+    return json_response(await get_assessment_by_id_async(assessment_id))
+
+async def list_payouts(request):
+    return await list_page(
+        request, list_payouts_async, 'PayoutID',
+        status=request.query_params.get("status"),
+        contract_id=request.query_params.get("contract_id")
+    )
+
+async def get_payout(request):
+    return await lookup(request, get_payout_by_id_async, request.path_params['payout_id'], "Payout")
+
+async def update_payout(request):
+    payout_id = request.path_params['payout_id']
+    body = await read_body(request, 'status')
+    if body['status'] not in PAYOUT_STATUSES:
+        raise HTTPException(400, f"status must be one of {', '.join(PAYOUT_STATUSES)}")
+    if not await update_payout_status_async(payout_id, body['status']):
+        raise HTTPException(404, f"Payout {payout_id} not found")
+    invalidate_responses()
+    return json_response(await get_payout_by_id_async(payout_id))
+
+async def get_customer(request):
+    return await lookup(request, get_customer_by_id_async, request.path_params['customer_id'], "Customer")
+
+async def http_error(request, exc):
+    return JSONResponse({'error': exc.detail}, status_code=exc.status_code)
+
+async def database_error(request, exc):
+    logger.error("API database error on %s: %s", request.url.path, exc)
+    return JSONResponse({'error': "Database unavailable"}, status_code=503)
+
+async def timeout_error(request, exc):
+    return JSONResponse({'error': "Database query timed out"}, status_code=504)
+
+class APIKeyMiddleware:
+    """Reject requests without the API key (when API_KEY is set); /health stays open"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if API_KEY and scope['type'] == "http" and scope['path'] != "/health":
+            key = Headers(scope=scope).get("x-api-key", "")
+            if not hmac.compare_digest(key.encode(), API_KEY.encode()):
+                response = JSONResponse({'error': "Invalid or missing API key"}, status_code=401)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await close_async_pool()
+
+routes = [
+    Route("/health", health),
+    Route("/contracts", list_contracts),
+    Route("/contracts/{contract_id}", get_contract),
+    Route("/contracts/{contract_id}/claims", get_contract_claims),
+    Route("/contracts/{contract_id}/payouts", get_contract_payouts),
+    Route("/contracts/{contract_id}/extend", extend_contract, methods=["POST"]),
+    Route("/claims", list_claims),
+    Route("/claims", file_claim, methods=["POST"]),
+    Route("/claims/{assessment_id}", get_claim),
+    Route("/claims/{assessment_id}", update_claim, methods=["PATCH"]),
+    Route("/payouts", list_payouts),
+    Route("/payouts/{payout_id}", get_payout),
+    Route("/payouts/{payout_id}", update_payout, methods=["PATCH"]),
+    Route("/customers/{customer_id}", get_customer)
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(APIKeyMiddleware)],
+    exception_handlers={
+        HTTPException: http_error,
+        MySQLError: database_error,
+        asyncio.TimeoutError: timeout_error
+    },
+    lifespan=lifespan
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api.server:app", host=API_HOST, port=API_PORT, workers=API_WORKERS, access_log=False)
@@ -1,4 +1,7 @@
 -- Create and populate the database for an Insurance Management System
+-- Superseded by database/migrations: python -m database.migrate creates the schema (000_baseline.sql)
+-- and every later change, including the triggers. Kept for reference only; do not run it on a
+-- migrated database (it drops every table but not schema_migrations).
 CREATE DATABASE IF NOT EXISTS prj_insurance;
 USE prj_insurance;
 
@@ -16,7 +19,9 @@ CREATE TABLE Customers (
     CustomerID VARCHAR(10) PRIMARY KEY,
     CustomerName VARCHAR(100),
     Address VARCHAR(255),
-    PhoneNumber VARCHAR(20)
+    PhoneNumber VARCHAR(20),
+    -- Digits of the phone number, so it can be searched however it was typed
+    PhoneDigits VARCHAR(20) AS (REGEXP_REPLACE(PhoneNumber, '[^0-9]', '')) STORED
 );
 
 CREATE TABLE InsuranceTypes (
@@ -83,6 +88,10 @@ INSERT INTO Users (Username, PasswordHash, RoleID) VALUES
 UPDATE Assessments SET EncryptedClaimAmount = AES_ENCRYPT(ClaimAmount, 'encryption_key');
 UPDATE Payouts SET EncryptedAmount = AES_ENCRYPT(Amount, 'encryption_key');
 
+-- Customer search: full-text on name and address, phone numbers by their digits
+CREATE FULLTEXT INDEX ft_customer_search ON Customers(CustomerName, Address);
+CREATE INDEX idx_customer_phone_digits ON Customers(PhoneDigits);
+
 -- Optimize contract lookups by CustomerID, InsuranceTypeID, ExpirationDate, and Status
 CREATE INDEX idx_contract_customer ON InsuranceContracts(CustomerID);
 CREATE INDEX idx_contract_type ON InsuranceContracts(InsuranceTypeID);
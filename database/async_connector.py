@@ -0,0 +1,182 @@
+import os
+import logging
+import asyncio
+from contextlib import asynccontextmanager
+import aiomysql
+from pymysql.constants import CLIENT
+# Re-exported, so the models catch duplicate keys without importing pymysql themselves
+from pymysql.err import IntegrityError
+from database.db_connector import (
+    connection_config,
+    arrow_type,
+    build_record_batch,
+    ARROW_BATCH_SIZE
+)
+from database.local_store import bump_shared_versions
+
+logger = logging.getLogger(__name__)
+
+# Connections per event loop; coroutines are cheap, so this can be larger than DB_POOL_SIZE
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "20"))
+# Seconds a statement (or one streamed batch) may take before it is cancelled
+QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "30"))
+# Pooled connections idle longer than this are reopened (below MySQL's wait_timeout)
+POOL_RECYCLE_SECONDS = 3600
+
+# A pool belongs to the event loop that created it: event loop -> pool creation task
+_pools = {}
+# KILL QUERY tasks still running (kept so they are not garbage collected)
+_kill_tasks = set()
+
+def async_connection_config():
+    """Connection settings in the form aiomysql expects"""
+    config = connection_config()
+    config['db'] = config.pop('database')
+    config.pop('client_flags')
+    config['charset'] = "utf8mb4"
+    # Row counts of UPDATEs include matched rows that already had the new values
+    config['client_flag'] = CLIENT.FOUND_ROWS
+    return config
+
+async def get_async_pool():
+    """Connection pool of the running event loop (created on first use)"""
+    loop = asyncio.get_running_loop()
+    task = _pools.get(loop)
+    if task is None:
+        # Coroutines asking at the same time all wait on the same creation
+        task = _pools[loop] = loop.create_task(aiomysql.create_pool(
+            minsize=1,
+            maxsize=ASYNC_POOL_SIZE,
+            pool_recycle=POOL_RECYCLE_SECONDS,
+            **async_connection_config()
+        ))
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        _pools.pop(loop, None)  # Try again on the next call
+        raise
+
+async def close_async_pool():
+    """Close the pool of the running event loop, waiting for connections in use"""
+    task = _pools.pop(asyncio.get_running_loop(), None)
+    if task is not None and task.done() and not task.exception():
+        pool = task.result()
+        pool.close()
+        await pool.wait_closed()
+
+async def kill_query(thread_id):
+    """Stop the statement running on a server connection (best effort)"""
+    try:
+        connection = await aiomysql.connect(**async_connection_config())
+    except Exception as e:
+        logger.warning("Could not connect to cancel query %s: %s", thread_id, e)
+        return
+    try:
+        async with connection.cursor() as cursor:
+            await cursor.execute("KILL QUERY %s", (thread_id,))
+    except Exception as e:
+        logger.warning("Could not cancel query %s: %s", thread_id, e)
+    finally:
+        connection.close()
+
+async def run_with_timeout(connection, step, timeout=QUERY_TIMEOUT):
+    """Await one query step on a connection.
+
+    On timeout or cancellation the statement is also stopped on the server, which would
+    otherwise keep running it after the client has given up.
+    """
+    try:
+        return await asyncio.wait_for(step, timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        task = asyncio.get_running_loop().create_task(kill_query(connection.thread_id()))
+        _kill_tasks.add(task)
+        task.add_done_callback(_kill_tasks.discard)
+        raise
+
+@asynccontextmanager
+async def acquire():
+    """Borrow a connection from the pool of the running event loop.
+
+    A connection whose query failed, timed out or was cancelled may still have a
+    result on the wire, so it is closed instead of being reused.
+    """
+    pool = await get_async_pool()
+    connection = await pool.acquire()
+    try:
+        yield connection
+    except BaseException:
+        connection.close()
+        raise
+    finally:
+        pool.release(connection)
+
+async def fetch(query, params=None, timeout=QUERY_TIMEOUT):
+    """Execute a SELECT query and return the rows as dicts (like get_cached_data, uncached).
+
+    Raises on errors instead of reporting them in the page.
+    """
+    async with acquire() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            await run_with_timeout(connection, cursor.execute(query, params), timeout)
+            return await cursor.fetchall()
+
+async def fetch_one(query, params=None, timeout=QUERY_TIMEOUT):
+    """Execute a SELECT query and return the first row as a dict, or None"""
+    rows = await fetch(query, params, timeout)
+    return rows[0] if rows else None
+
+async def execute(query, params=None, timeout=QUERY_TIMEOUT):
+    """Execute a write query, commit it and return the number of matched rows"""
+    async with acquire() as connection:
+        async with connection.cursor() as cursor:
+            await run_with_timeout(connection, cursor.execute(query, params), timeout)
+            await connection.commit()
+            affected = cursor.rowcount
+    return affected
+
+async def execute_insert_id(query, params=None, timeout=QUERY_TIMEOUT):
+    """Execute a write query, commit it and return the LAST_INSERT_ID it set (e.g. a taken counter value)"""
+    async with acquire() as connection:
+        async with connection.cursor() as cursor:
+            await run_with_timeout(connection, cursor.execute(query, params), timeout)
+            await connection.commit()
+            insert_id = cursor.lastrowid
+    return insert_id
+
+async def mark_changed(*names):
+    """Report writes to the named data (e.g. 'contracts') to the Streamlit app.
+
+    Its caches are in another process; it clears them on its next page run (sync_external_writes).
+    """
+    await asyncio.to_thread(bump_shared_versions, names)
+
+async def stream(query, params=None, batch_size=ARROW_BATCH_SIZE, timeout=QUERY_TIMEOUT):
+    """Execute a SELECT query and yield the result as Arrow record batches (see stream_query).
+
+    The timeout applies to the statement and to each batch. Leaving the loop early
+    closes the connection instead of reading the remaining rows.
+    """
+    async with acquire() as connection:
+        # Unbuffered cursor: rows are read from the server one batch at a time
+        cursor = await connection.cursor(aiomysql.SSCursor)
+        await run_with_timeout(connection, cursor.execute(query, params), timeout)
+
+        columns = [desc[0] for desc in cursor.description]
+        types = [arrow_type(desc[0], desc[1]) for desc in cursor.description]
+        empty = True
+        finished = False
+        try:
+            while True:
+                rows = await run_with_timeout(connection, cursor.fetchmany(batch_size), timeout)
+                if not rows:
+                    break
+                empty = False
+                yield build_record_batch(columns, types, rows)
+            if empty:
+                yield build_record_batch(columns, types, [])
+            finished = True
+        finally:
+            if finished:
+                await cursor.close()
+            else:
+                connection.close()
@@ -1,29 +1,96 @@
 import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, FieldType, ClientFlag
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool, CNX_POOL_MAXSIZE
 from dotenv import load_dotenv
+from database.local_store import shared_versions
 
 # Load environment variables
 load_dotenv()
 
-def create_connection():
-    """Create a database connection to MySQL server"""
+# Connections kept open for the page queries (also the number of parallel fetches)
+DB_POOL_SIZE = min(int(os.getenv("DB_POOL_SIZE", "8")), CNX_POOL_MAXSIZE)
+# Parameter sets written per transaction by execute_many (one executemany and one commit each)
+WRITE_CHUNK_SIZE = int(os.getenv("WRITE_CHUNK_SIZE", "1000"))
+
+def connection_config():
+    """Connection settings of the MySQL server"""
+    return dict(
+        host=os.getenv("DB_HOST", "localhost"),
+        database=os.getenv("DB_NAME", "prj_insurance"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        connect_timeout=10,  # Add connect timeout
+        # Row counts of UPDATEs include matched rows that already had the new values
+        client_flags=[ClientFlag.FOUND_ROWS]
+    )
+
+@st.cache_resource
+def get_connection_pool():
+    """Shared pool of MySQL connections (once per server process)"""
+    return MySQLConnectionPool(pool_name="insurance_pool", pool_size=DB_POOL_SIZE, **connection_config())
+
+def create_connection(pooled=True):
+    """Create a database connection to MySQL server.
+
+    Pooled connections go back to the pool on close(). If every pooled connection is
+    in use, a direct connection is opened instead of waiting.
+    """
     connection = None
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            database=os.getenv("DB_NAME", "prj_insurance"),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            connect_timeout=10  # Add connect timeout
-        )
+        if pooled and DB_POOL_SIZE > 0:
+            try:
+                connection = get_connection_pool().get_connection()
+            except PoolError:
+                connection = mysql.connector.connect(**connection_config())
+        else:
+            connection = mysql.connector.connect(**connection_config())
         if connection.is_connected():
             return connection
     except Error as e:
         st.error(f"Error connecting to MySQL: {e}")
         return None
 
+@st.cache_resource
+def get_fetch_executor():
+    """Thread pool that runs independent page queries in parallel"""
+    return ThreadPoolExecutor(max_workers=max(DB_POOL_SIZE, 1), thread_name_prefix="db-fetch")
+
+def fetch_concurrently(*calls):
+    """Run independent data calls in parallel and return their results in order.
+
+    Each call is a function without arguments (use a lambda to pass some). The calls
+    run in this script run's context, so their st.error() messages still show on the page.
+    """
+    if len(calls) < 2 or threading.current_thread().name.startswith("db-fetch"):
+        # Nothing to overlap, or already on a fetch thread (waiting on the pool could deadlock)
+        return [call() for call in calls]
+
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        try:
+            return call()
+        finally:
+            # Pool threads are reused by other sessions
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    executor = get_fetch_executor()
+    futures = [executor.submit(run, call) for call in calls]
+    return [future.result() for future in futures]
+
 @st.cache_data(ttl=300)  # Cache data for 5 minutes
 def get_cached_data(query, params=None):
     """Execute a SELECT query and cache the results"""
@@ -51,6 +118,200 @@ def get_cached_data(query, params=None):
                 cursor.close()
                 connection.close()
 
+@st.cache_data(ttl=300)  # Cache data for 5 minutes
+def get_cached_batch(queries):
+    """Execute several SELECT queries on one connection and cache their results together.
+
+    queries is a tuple of (query, params) pairs; returns the rows of each query, in order.
+    """
+    connection = create_connection()
+    if not connection:
+        st.warning("Database connection failed. Please check your connection settings.")
+        return None
+    
+    query = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        results = []
+        for query, params in queries:
+            cursor.execute(query, params)
+            results.append(cursor.fetchall())
+        return results
+    except Error as e:
+        st.error(f"Error executing query: {e}")
+        st.code(query, language="sql")  # Show the query for debugging
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+@st.cache_data(ttl=300)  # Cache data for 5 minutes
+def get_cached_multi(query, params=None):
+    """Execute a multi-statement SELECT query in one round trip and cache all its results as one entry.
+
+    The statements are separated by ';' and share the params (in order). Returns the rows
+    of each statement, in order.
+    """
+    connection = create_connection()
+    if not connection:
+        st.warning("Database connection failed. Please check your connection settings.")
+        return None
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        # Each result has to be read before the next one arrives
+        return [result.fetchall() for result in cursor.execute(query, params, multi=True) if result.with_rows]
+    except Error as e:
+        st.error(f"Error executing query: {e}")
+        st.code(query, language="sql")  # Show the query for debugging
+        return None
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+
+# Money columns (DECIMAL in MySQL) are carried as int64 cents in columnar results
+MONEY_COLUMNS = {
+    'ClaimAmount', 'Amount', 'TotalAmount', 'AverageAmount', 'TotalPayoutAmount',
+    'AverageClaimAmount', 'MaximumClaimAmount', 'TotalApprovedAmount',
+    'AveragePayoutAmount', 'MaximumPayoutAmount', 'AvgPayoutPerCustomer'
+}
+# Low-cardinality text columns that are dictionary-encoded (categoricals in pandas)
+CATEGORY_COLUMNS = {'Status', 'Result', 'InsuranceName', 'Segment'}
+ARROW_BATCH_SIZE = 10000
+
+DECIMAL_TYPES = (FieldType.DECIMAL, FieldType.NEWDECIMAL)
+INTEGER_TYPES = (FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR)
+FLOAT_TYPES = (FieldType.FLOAT, FieldType.DOUBLE)
+DATETIME_TYPES = (FieldType.DATETIME, FieldType.TIMESTAMP)
+TEXT_TYPES = (FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING)
+
+def arrow_type(name, field_type):
+    """Arrow type for a result column, or None to let Arrow infer it"""
+    if field_type in DECIMAL_TYPES:
+        return pa.int64() if name in MONEY_COLUMNS else pa.float64()
+    if field_type == FieldType.DATE:
+        return pa.date32()
+    if field_type in DATETIME_TYPES:
+        return pa.timestamp('us')
+    if field_type in INTEGER_TYPES:
+        return pa.int64()
+    if field_type in FLOAT_TYPES:
+        return pa.float64()
+    if field_type in TEXT_TYPES:
+        return pa.dictionary(pa.int32(), pa.string()) if name in CATEGORY_COLUMNS else pa.string()
+    return None
+
+def build_record_batch(columns, types, rows):
+    """Build an Arrow record batch column by column from tuple rows"""
+    arrays = []
+    values_by_column = list(zip(*rows)) if rows else [()] * len(columns)
+    for name, type_, values in zip(columns, types, values_by_column):
+        if type_ == pa.int64() and name in MONEY_COLUMNS:
+            # DECIMAL(12, 2) fits exactly in float64 before rounding to cents
+            cents = np.rint(pd.Series(values, dtype=object).astype('float64').to_numpy() * 100)
+            arrays.append(pa.array(np.nan_to_num(cents).astype(np.int64), mask=np.isnan(cents)))
+        elif type_ == pa.float64():
+            arrays.append(pa.array(pd.Series(values, dtype=object).astype('float64').to_numpy(), from_pandas=True))
+        elif type_ is not None and pa.types.is_dictionary(type_):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=type_))
+    return pa.RecordBatch.from_arrays(arrays, names=columns)
+
+def stream_query(query, params=None, batch_size=ARROW_BATCH_SIZE):
+    """Execute a SELECT query and yield the result as Arrow record batches.
+
+    Rows are read with an unbuffered cursor, so the server only sends the next batch
+    when the caller asks for it. An empty result yields one empty batch with the columns.
+    """
+    # Own connection: a stream can stay open for long and may have to drop its socket
+    connection = create_connection(pooled=False)
+    if not connection:
+        st.warning("Database connection failed. Please check your connection settings.")
+        return
+    
+    cursor = None
+    finished = False
+    try:
+        # Unbuffered, tuple cursor: nothing is held client-side beyond the current batch
+        cursor = connection.cursor(buffered=False)
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        
+        columns = [desc[0] for desc in cursor.description]
+        types = [arrow_type(desc[0], desc[1]) for desc in cursor.description]
+        empty = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            empty = False
+            yield build_record_batch(columns, types, rows)
+        
+        if empty:
+            schema = pa.schema([(name, type_ or pa.null()) for name, type_ in zip(columns, types)])
+            yield pa.RecordBatch.from_pylist([], schema=schema)
+        finished = True
+    except Error as e:
+        st.error(f"Error executing query: {e}")
+        st.code(query, language="sql")  # Show the query for debugging
+    finally:
+        if connection.is_connected():
+            if finished or cursor is None:
+                if cursor:
+                    cursor.close()
+                connection.close()
+            else:
+                # The caller stopped early: drop the socket instead of reading the rest of the rows
+                # (the C extension has no shutdown() and drains the result on close)
+                getattr(connection, 'shutdown', connection.close)()
+
+def fetch_arrow(query, params=None, batch_size=ARROW_BATCH_SIZE):
+    """Execute a SELECT query and return the result as an Arrow table, converted in batches"""
+    tables = [pa.Table.from_batches([batch]) for batch in stream_query(query, params, batch_size)]
+    if not tables:
+        return None
+    # Columns Arrow had to infer may be all-null in some batches
+    return pa.concat_tables(tables, promote_options='default')
+
+@st.cache_data(ttl=300)  # Cache data for 5 minutes
+def get_cached_arrow(query, params=None):
+    """Execute a SELECT query and cache the result in Arrow IPC stream form"""
+    table = fetch_arrow(query, params)
+    if table is None:
+        return None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def get_arrow_table(query, params=None):
+    """Get a cached query result as an Arrow table (read without copying from the IPC bytes)"""
+    data = get_cached_arrow(query, params)
+    if data is None:
+        return pa.table({})
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+def get_cached_frame(query, params=None):
+    """Get a cached query result as a typed DataFrame.
+
+    Money columns are Int64 cents, dates datetime64 and the CATEGORY_COLUMNS categoricals.
+    """
+    return arrow_to_frame(get_arrow_table(query, params))
+
+def arrow_to_frame(table):
+    """Convert an Arrow result table to a typed DataFrame (see get_cached_frame)"""
+    df = table.to_pandas(date_as_object=False, types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    # Nullable Int64 is only needed where there are NULLs; charts handle plain int64 better
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.Int64Dtype) and not df[col].hasnans:
+            df[col] = df[col].astype('int64')
+    return df
+
 def execute_query(connection, query, data=None):
     """Execute SQL query and return result if it's a SELECT query"""
     if not connection:
@@ -75,8 +336,63 @@ def execute_query(connection, query, data=None):
     finally:
         cursor.close()
 
+# Bumped after every successful write from this process; derived artifacts
+# (e.g. report exports) are keyed on it so they are rebuilt after changes
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+def get_data_version():
+    """Current data version of this process"""
+    return _data_version
+
+def bump_data_version():
+    """Mark data written by this process as changed"""
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+def clear_query_caches():
+    """Drop the cached query results after a write and bump the data version"""
+    get_cached_data.clear()
+    get_cached_batch.clear()
+    get_cached_multi.clear()
+    get_cached_arrow.clear()
+    bump_data_version()
+
+# Model caches to drop when another process (the API) writes their data: name -> clear function
+_external_clears = {}
+# Shared write counts this process has caught up with (None until the first page run)
+_seen_versions = None
+_seen_versions_lock = threading.Lock()
+
+def on_external_write(name, callback):
+    """Clear a model's caches when another process reports writing its data (see bump_shared_versions)"""
+    _external_clears[name] = callback
+
+def sync_external_writes():
+    """Drop the caches of the data other processes wrote since the last call; pages call it on every run"""
+    global _seen_versions
+    versions = shared_versions()
+    with _seen_versions_lock:
+        seen, _seen_versions = _seen_versions, versions
+    # Nothing is cached yet on the first run of the process
+    changed = [] if seen is None else [name for name, version in versions.items() if seen.get(name) != version]
+    if changed:
+        clear_query_caches()
+        for name in changed:
+            if name in _external_clears:
+                _external_clears[name]()
+
 def execute_write_query(query, data=None):
-    """Execute non-SELECT queries (INSERT, UPDATE, DELETE) and handle connection"""
+    """Execute non-SELECT queries (INSERT, UPDATE, DELETE) and handle connection.
+
+    Inside transaction() the query joins its transaction and errors are raised.
+    """
+    work = current_transaction()
+    if work is not None:
+        work.execute(query, data)
+        return True
+    
     connection = create_connection()
     if not connection:
         st.warning("Database connection failed. Please check your connection settings.")
@@ -104,6 +420,165 @@ def execute_write_query(query, data=None):
     
     # Clear cache after write operations
     if success:
-        get_cached_data.clear()
+        clear_query_caches()
     
     return success
+
+class UnitOfWork:
+    """Writes sharing one connection and transaction (see unit_of_work)"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        # Rows affected by committed statements, and by those still waiting for the commit
+        self.affected = 0
+        self.pending = 0
+        # Run once after the commit (see on_commit)
+        self.callbacks = []
+        self._savepoints = 0
+
+    def execute(self, query, params=None):
+        """Execute one statement in the transaction; returns the rows it affected"""
+        self.cursor.execute(query, params)
+        if self.cursor.with_rows:
+            self.cursor.fetchall()
+            return 0
+        count = max(self.cursor.rowcount, 0)
+        self.pending += count
+        return count
+
+    def fetch_value(self, query, params=None):
+        """First column of the first row of a query run in the transaction"""
+        self.cursor.execute(query, params)
+        rows = self.cursor.fetchall()
+        return rows[0][0] if rows else None
+
+    def execute_many(self, query, param_sets):
+        """Execute a statement for every parameter set (one multi-row INSERT for inserts).
+
+        Returns the rows affected; they are committed with the rest of the transaction.
+        """
+        param_sets = list(param_sets)
+        if not param_sets:
+            return 0
+        self.cursor.executemany(query, param_sets)
+        count = max(self.cursor.rowcount, 0)
+        self.pending += count
+        return count
+
+    @contextmanager
+    def savepoint(self):
+        """Block whose writes are undone on their own (and the error re-raised) if it fails"""
+        self._savepoints += 1
+        name = f"uow_{self._savepoints}"
+        pending = self.pending
+        self.cursor.execute(f"SAVEPOINT {name}")
+        try:
+            yield
+        except Error:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.pending = pending
+            raise
+        self.cursor.execute(f"RELEASE SAVEPOINT {name}")
+
+    def commit(self):
+        """Commit the writes so far"""
+        self.connection.commit()
+        self.affected += self.pending
+        self.pending = 0
+
+    def rollback(self):
+        """Undo the writes since the last commit"""
+        self.connection.rollback()
+        self.pending = 0
+
+@contextmanager
+def unit_of_work(pooled=True):
+    """Transaction for a batch of writes on one connection.
+
+    Yields a UnitOfWork. What is not committed yet is committed when the block ends, or
+    rolled back if it raises. The query caches are cleared once, after the last commit.
+    """
+    connection = create_connection(pooled=pooled)
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    
+    work = UnitOfWork(connection)
+    try:
+        yield work
+        work.commit()
+    except BaseException:
+        if connection.is_connected():
+            work.rollback()
+        raise
+    finally:
+        if connection.is_connected():
+            work.cursor.close()
+        connection.close()
+        if work.affected:
+            clear_query_caches()
+            for callback in work.callbacks:
+                callback()
+
+# Transaction the model writes of this thread (one script run) join, see transaction()
+_transactions = threading.local()
+
+def current_transaction():
+    """UnitOfWork of the transaction open on this thread, or None"""
+    return getattr(_transactions, 'work', None)
+
+@contextmanager
+def transaction():
+    """Run the model writes of the block as one transaction, e.g. filing a claim and its payout.
+
+    execute_write_query and execute_many calls inside the block use its connection and
+    commit together when it ends; an error rolls them all back and is raised. Reads are
+    not part of it (they do not see its writes before the commit). A nested block runs
+    under a savepoint of the outer one.
+    """
+    work = current_transaction()
+    if work is not None:
+        with work.savepoint():
+            yield work
+        return
+    
+    with unit_of_work() as work:
+        _transactions.work = work
+        try:
+            yield work
+        finally:
+            _transactions.work = None
+
+def on_commit(callback):
+    """Run a callback (e.g. clearing a model's caches) after the current transaction commits, or now"""
+    work = current_transaction()
+    if work is None:
+        callback()
+    elif callback not in work.callbacks:
+        work.callbacks.append(callback)
+
+def execute_many(query, param_sets, chunk_size=WRITE_CHUNK_SIZE):
+    """Execute a write query for many parameter sets on one connection, one commit per chunk.
+
+    Returns the number of affected rows, or None on error (the failing chunk is rolled
+    back; the chunks before it stay committed). Inside transaction() all the sets are
+    written in its transaction and errors are raised.
+    """
+    param_sets = list(param_sets)
+    work = current_transaction()
+    if work is not None:
+        return work.execute_many(query, param_sets)
+    
+    try:
+        with unit_of_work() as work:
+            for start in range(0, len(param_sets), chunk_size):
+                work.execute_many(query, param_sets[start:start + chunk_size])
+                work.commit()
+            return work.affected
+    except RuntimeError as e:
+        st.warning(f"{e}. Please check your connection settings.")
+        return None
+    except Error as e:
+        st.error(f"Error executing query: {e}")
+        st.code(query, language="sql")  # Show the query for debugging
+        return None
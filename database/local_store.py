@@ -0,0 +1,109 @@
+import os
+import sqlite3
+from contextlib import closing
+
+# Local state of the app itself (export jobs, ...), kept outside MySQL
+APP_STATE_DIR = os.getenv(
+    "APP_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".app_state")
+)
+
+LOCAL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS export_jobs (
+        job_id TEXT PRIMARY KEY,
+        job_key TEXT NOT NULL,
+        dataset TEXT NOT NULL,
+        format TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress_rows INTEGER NOT NULL DEFAULT 0,
+        total_rows INTEGER,
+        path TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        expires_at REAL,
+        owner TEXT,
+        heartbeat_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_export_jobs_key ON export_jobs (job_key, status);
+    CREATE TABLE IF NOT EXISTS report_snapshots (
+        report TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (report, version)
+    );
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+"""
+
+# Columns of LOCAL_SCHEMA added after their table was created, for state stores created before
+ADDED_COLUMNS = {
+    'export_jobs': ["owner TEXT", "heartbeat_at REAL"]
+}
+
+def state_path(*parts):
+    """Path inside the app state directory (created on first use)"""
+    path = os.path.join(APP_STATE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def create_local_connection():
+    """Create a connection to the local SQLite state store"""
+    connection = sqlite3.connect(state_path("app_state.db"), timeout=30)
+    connection.row_factory = sqlite3.Row
+    # WAL lets the Streamlit sessions read while a worker thread writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def init_local_store():
+    """Create the local state tables if they do not exist, and the columns added since"""
+    with closing(create_local_connection()) as connection:
+        connection.executescript(LOCAL_SCHEMA)
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row['name'] for row in connection.execute(f"PRAGMA table_info({table})")}
+            for column in columns:
+                if column.split()[0] not in existing:
+                    try:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+                    except sqlite3.OperationalError:
+                        pass  # Added by another process meanwhile
+
+def local_query(query, params=()):
+    """Execute a SELECT query on the local store and return the rows as dicts"""
+    with closing(create_local_connection()) as connection:
+        return [dict(row) for row in connection.execute(query, params).fetchall()]
+
+def local_execute(query, params=()):
+    """Execute a write query on the local store and commit it"""
+    with closing(create_local_connection()) as connection:
+        with connection:
+            return connection.execute(query, params).rowcount
+
+# Whether this process created the local tables already (for the helpers read on every page run)
+_schema_ready = False
+
+def ensure_local_store():
+    """init_local_store, once per process"""
+    global _schema_ready
+    if not _schema_ready:
+        init_local_store()
+        _schema_ready = True
+
+def bump_shared_versions(names):
+    """Count a write to each named data (e.g. 'contracts'), for every process sharing APP_STATE_DIR"""
+    ensure_local_store()
+    with closing(create_local_connection()) as connection:
+        with connection:
+            connection.executemany(
+                "INSERT INTO data_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                [(name,) for name in names]
+            )
+
+def shared_versions():
+    """Write count of each named data, see bump_shared_versions"""
+    ensure_local_store()
+    return {row['name']: row['version'] for row in local_query("SELECT name, version FROM data_versions")}
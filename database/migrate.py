@@ -0,0 +1,321 @@
+"""Apply the schema migrations of database/migrations: python -m database.migrate
+
+Migrations are numbered .sql files (NNN_name.sql), applied once each in order. Each
+applied migration is recorded in schema_migrations with the checksum of its file, so
+re-running applies only the new ones and an edited migration stops the run.
+
+Built for a loaded server: DDL waits at most MIGRATION_LOCK_WAIT seconds for the
+table's metadata lock (instead of queueing every query behind it) and is retried,
+and statements that would block writes on a large table (ALTER TABLE / CREATE INDEX
+without LOCK=NONE) are refused unless --allow-locking is given.
+"""
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+import mysql.connector
+from mysql.connector import Error
+from database.db_connector import connection_config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Seconds a DDL statement waits for the metadata lock of its table before giving up
+MIGRATION_LOCK_WAIT = int(os.getenv("MIGRATION_LOCK_WAIT", "10"))
+# Attempts of a statement that timed out waiting for a lock
+MIGRATION_RETRIES = int(os.getenv("MIGRATION_RETRIES", "5"))
+# Tables with at least this many rows are only changed online (LOCK=NONE) without --allow-locking
+ONLINE_DDL_MIN_ROWS = int(os.getenv("ONLINE_DDL_MIN_ROWS", "10000"))
+# Server-wide lock held while migrating, so two deploys never migrate at once
+MIGRATION_LOCK = "schema_migrate"
+ER_LOCK_WAIT_TIMEOUT = 1205
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(255) NOT NULL,
+    Checksum CHAR(64) NOT NULL,
+    AppliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DurationMs INT NULL  -- NULL for migrations recorded with --baseline
+)
+"""
+APPLIED_MIGRATIONS_QUERY = "SELECT Version, Name, Checksum, AppliedAt, DurationMs FROM schema_migrations ORDER BY Version"
+RECORD_MIGRATION_QUERY = "INSERT INTO schema_migrations (Version, Name, Checksum, DurationMs) VALUES (%s, %s, %s, %s)"
+TABLE_ROWS_QUERY = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+
+# Statements that change a table's structure, with the table they change
+DDL_TABLE = re.compile(
+    r"^\s*(?:ALTER\s+TABLE|CREATE\s+(?:UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?INDEX\s+`?\w+`?\s+ON)\s+`?(\w+)`?",
+    re.IGNORECASE)
+ONLINE_DDL = re.compile(r"\bLOCK\s*=?\s*NONE\b", re.IGNORECASE)
+
+class Migration:
+    """One migration file"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        # Line endings do not count, so a checkout on another OS keeps the checksums
+        self.checksum = hashlib.sha256(self.sql.replace("\r\n", "\n").encode("utf-8")).hexdigest()
+
+    def __str__(self):
+        return f"{self.version:03d}_{self.name}"
+
+    def statements(self):
+        return split_statements(self.sql)
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Migration files of the directory, by version"""
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise RuntimeError(f"Two migrations numbered {version}: {migrations[version].path} and {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def split_statements(sql):
+    """Statements of a SQL script, without comments.
+
+    Follows the mysql client's rules: DELIMITER lines change the statement terminator
+    (for trigger and procedure bodies), and terminators inside quotes or comments do
+    not end a statement.
+    """
+    statements, current = [], []
+    delimiter = ";"
+    quote = None
+    in_comment = False
+    for line in sql.splitlines():
+        command = re.match(r"^\s*DELIMITER\s+(\S+)\s*$", line, re.IGNORECASE)
+        if command and quote is None and not in_comment and not "".join(current).strip():
+            delimiter = command.group(1)
+            continue
+
+        i = 0
+        while i < len(line):
+            if in_comment:
+                end = line.find("*/", i)
+                if end < 0:
+                    break
+                in_comment = False
+                i = end + 2
+                continue
+            char = line[i]
+            if quote:
+                current.append(char)
+                if char == "\\" and quote != "`" and i + 1 < len(line):
+                    current.append(line[i + 1])
+                    i += 2
+                    continue
+                if char == quote:
+                    quote = None
+                i += 1
+                continue
+            if char == "#" or re.match(r"--(\s|$)", line[i:i + 3]):
+                break
+            if line.startswith("/*", i):
+                in_comment = True
+                i += 2
+                continue
+            if line.startswith(delimiter, i):
+                statement = "".join(current).strip()
+                if statement:
+                    statements.append(statement)
+                current = []
+                i += len(delimiter)
+                continue
+            if char in "'\"`":
+                quote = char
+            current.append(char)
+            i += 1
+        current.append("\n")
+
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def locking_table(statement):
+    """Table a statement changes without LOCK=NONE (None for online and non-DDL statements)"""
+    match = DDL_TABLE.match(statement)
+    if match and not ONLINE_DDL.search(statement):
+        return match.group(1)
+    return None
+
+def summary(statement, width=70):
+    """A statement on one line, shortened, for the reports"""
+    text = " ".join(statement.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+def connect():
+    """Connection to the server with the application database selected (created if missing)"""
+    config = connection_config()
+    database = config.pop('database')
+    connection = mysql.connector.connect(**config, autocommit=True)
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    cursor.execute(f"USE `{database}`")
+    cursor.execute("SET SESSION lock_wait_timeout = %s", (MIGRATION_LOCK_WAIT,))
+    cursor.close()
+    return connection
+
+def applied_migrations(cursor):
+    """Recorded migrations by version"""
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute(APPLIED_MIGRATIONS_QUERY)
+    return {row['Version']: row for row in cursor.fetchall()}
+
+def changed_migrations(migrations, applied):
+    """Applied migrations whose file no longer matches the recorded checksum"""
+    return [m for m in migrations if m.version in applied and applied[m.version]['Checksum'] != m.checksum]
+
+def table_rows(cursor, table):
+    """Row estimate of a table (0 if it does not exist yet)"""
+    cursor.execute(TABLE_ROWS_QUERY, (table,))
+    row = cursor.fetchone()
+    return (row['TABLE_ROWS'] or 0) if row else 0
+
+def execute_statement(cursor, statement):
+    """Run one statement, retrying while its table's metadata lock is held by other sessions"""
+    for attempt in range(1, MIGRATION_RETRIES + 1):
+        try:
+            cursor.execute(statement)
+            if cursor.with_rows:
+                cursor.fetchall()
+            return
+        except Error as e:
+            if e.errno != ER_LOCK_WAIT_TIMEOUT or attempt == MIGRATION_RETRIES:
+                raise
+            print(f"      lock wait timeout, retrying ({attempt}/{MIGRATION_RETRIES - 1})")
+            time.sleep(attempt * 2)
+
+def apply_migration(cursor, migration, allow_locking=False):
+    """Run the statements of a migration and record it; returns its duration in seconds"""
+    statements = migration.statements()
+    print(f"Applying {migration} ({len(statements)} statements)")
+    started = time.perf_counter()
+    for number, statement in enumerate(statements, 1):
+        table = locking_table(statement)
+        if table and not allow_locking:
+            rows = table_rows(cursor, table)
+            if rows >= ONLINE_DDL_MIN_ROWS:
+                raise RuntimeError(
+                    f"Statement {number} of {migration} locks {table} (~{rows:,} rows) for the whole change: "
+                    f"add ALGORITHM=INPLACE, LOCK=NONE if the server supports it, or run with --allow-locking")
+
+        statement_started = time.perf_counter()
+        try:
+            execute_statement(cursor, statement)
+        except Error as e:
+            # DDL commits on its own: the statements before this one stay applied
+            raise RuntimeError(
+                f"Statement {number} of {migration} failed: {e.msg}\n    {summary(statement)}\n"
+                f"Statements 1-{number - 1} are applied. Finish the migration by hand, then record it "
+                f"with --baseline {migration.version}") from e
+        print(f"  [{number}/{len(statements)}] {time.perf_counter() - statement_started:7.2f}s  {summary(statement)}")
+
+    duration = time.perf_counter() - started
+    cursor.execute(RECORD_MIGRATION_QUERY, (migration.version, migration.name, migration.checksum, int(duration * 1000)))
+    print(f"Applied {migration} in {duration:.2f}s")
+    return duration
+
+def print_status(migrations, applied):
+    """Applied / pending state of every migration"""
+    files = {m.version for m in migrations}
+    for migration in migrations:
+        row = applied.get(migration.version)
+        if row is None:
+            state = "pending"
+        elif row['Checksum'] != migration.checksum:
+            state = f"CHANGED since applied {row['AppliedAt']:%Y-%m-%d %H:%M}"
+        elif row['DurationMs'] is None:
+            state = f"baseline {row['AppliedAt']:%Y-%m-%d %H:%M}"
+        else:
+            state = f"applied  {row['AppliedAt']:%Y-%m-%d %H:%M} ({row['DurationMs'] / 1000:.2f}s)"
+        print(f"{str(migration):40} {state}")
+    for version in sorted(set(applied) - files):
+        print(f"{version:03d}_{applied[version]['Name']:36} applied, file missing")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Apply the pending schema migrations of database/migrations")
+    parser.add_argument("--status", action="store_true", help="list the migrations and whether they are applied")
+    parser.add_argument("--dry-run", action="store_true", help="list the statements that would run")
+    parser.add_argument("--target", type=int, help="apply migrations up to this version only")
+    parser.add_argument("--baseline", type=int, metavar="VERSION",
+                        help="record migrations up to VERSION as applied without running them (existing databases)")
+    parser.add_argument("--allow-locking", action="store_true",
+                        help="run DDL that blocks writes on large tables (maintenance windows)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    migrations = load_migrations()
+    try:
+        connection = connect()
+    except Error as e:
+        print(f"Database connection failed: {e}")
+        return 2
+
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (MIGRATION_LOCK,))
+        if not cursor.fetchone()['locked']:
+            print("Another migration is running")
+            return 2
+
+        applied = applied_migrations(cursor)
+        if args.status:
+            print_status(migrations, applied)
+            return 0
+
+        changed = changed_migrations(migrations, applied)
+        if changed:
+            for migration in changed:
+                print(f"{migration} was edited after it was applied: add a new migration instead")
+            return 1
+
+        target = args.baseline if args.baseline is not None else args.target
+        pending = [m for m in migrations if m.version not in applied and (target is None or m.version <= target)]
+        if not pending:
+            print("No pending migrations")
+            return 0
+
+        if args.baseline is not None:
+            for migration in pending:
+                if args.dry_run:
+                    print(f"Would record {migration} as applied (not run)")
+                    continue
+                cursor.execute(RECORD_MIGRATION_QUERY, (migration.version, migration.name, migration.checksum, None))
+                print(f"Recorded {migration} as applied (not run)")
+            return 0
+
+        if args.dry_run:
+            for migration in pending:
+                print(migration)
+                for number, statement in enumerate(migration.statements(), 1):
+                    table = locking_table(statement)
+                    flag = f"  [locks {table} (~{table_rows(cursor, table):,} rows)]" if table else ""
+                    print(f"  [{number}] {summary(statement)}{flag}")
+            return 0
+
+        started = time.perf_counter()
+        try:
+            for migration in pending:
+                apply_migration(cursor, migration, allow_locking=args.allow_locking)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print(f"\n{len(pending)} migrations applied in {time.perf_counter() - started:.2f}s")
+        return 0
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+-- Baseline schema: tables, indexes, triggers, event and procedure of prj_insurance,
+-- with the roles and users the application logs in with.
+-- Runs on an empty database only; a database created with data_gen.sql / sql_function.sql
+-- already has all of this: record it with python -m database.migrate --baseline 001
+
+-- Create Tables
+CREATE TABLE Customers (
+    CustomerID VARCHAR(10) PRIMARY KEY,
+    CustomerName VARCHAR(100),
+    Address VARCHAR(255),
+    PhoneNumber VARCHAR(20)
+);
+
+CREATE TABLE InsuranceTypes (
+    InsuranceTypeID VARCHAR(10) PRIMARY KEY,
+    InsuranceName VARCHAR(100),
+    Description TEXT
+);
+
+
+CREATE TABLE InsuranceContracts (
+    ContractID VARCHAR(10) PRIMARY KEY,
+    CustomerID VARCHAR(10),
+    InsuranceTypeID VARCHAR(10),
+    SignDate DATE,
+    ExpirationDate DATE,
+    Status VARCHAR(20) DEFAULT 'Active',
+    FOREIGN KEY (CustomerID) REFERENCES Customers(CustomerID),
+    FOREIGN KEY (InsuranceTypeID) REFERENCES InsuranceTypes(InsuranceTypeID)
+);
+
+CREATE TABLE Assessments (
+    AssessmentID VARCHAR(10) PRIMARY KEY,
+    ContractID VARCHAR(10),
+    AssessmentDate DATE,
+    ClaimAmount DECIMAL(12, 2),
+    Result VARCHAR(255),
+    EncryptedClaimAmount VARBINARY(255),
+    FOREIGN KEY (ContractID) REFERENCES InsuranceContracts(ContractID)
+);
+
+CREATE TABLE Payouts (
+    PayoutID VARCHAR(10) PRIMARY KEY,
+    ContractID VARCHAR(10),
+    Amount DECIMAL(12, 2),
+    PayoutDate DATE,
+    Status VARCHAR(20) DEFAULT 'Pending',
+    EncryptedAmount VARBINARY(255),
+    FOREIGN KEY (ContractID) REFERENCES InsuranceContracts(ContractID)
+);
+
+CREATE TABLE Roles (
+    RoleID INT PRIMARY KEY AUTO_INCREMENT,
+    RoleName VARCHAR(50) UNIQUE NOT NULL
+);
+
+CREATE TABLE Users (
+    UserID INT PRIMARY KEY AUTO_INCREMENT,
+    Username VARCHAR(50) UNIQUE NOT NULL,
+    PasswordHash VARCHAR(255) NOT NULL,
+    RoleID INT,
+    FOREIGN KEY (RoleID) REFERENCES Roles(RoleID)
+);
+
+-- Insert Roles
+INSERT INTO Roles (RoleName) VALUES ('Admin'), ('Insurance Agent'), ('Claim Assessor');
+
+-- Insert Users
+INSERT INTO Users (Username, PasswordHash, RoleID) VALUES
+('admin', SHA2('admin123', 256), 1),
+('agent_user', SHA2('agent123', 256), 2),
+('assessor_user', SHA2('assessor123', 256), 3);
+
+-- Optimize contract lookups by CustomerID, InsuranceTypeID, ExpirationDate, and Status
+CREATE INDEX idx_contract_customer ON InsuranceContracts(CustomerID);
+CREATE INDEX idx_contract_type ON InsuranceContracts(InsuranceTypeID);
+CREATE INDEX idx_contract_expiration ON InsuranceContracts(ExpirationDate);
+CREATE INDEX idx_contract_status ON InsuranceContracts(Status);
+
+-- Optimize claim (assessment) lookups by ContractID, Result, and AssessmentDate
+CREATE INDEX idx_assessment_contract ON Assessments(ContractID);
+CREATE INDEX idx_assessment_result ON Assessments(Result);
+CREATE INDEX idx_assessment_date ON Assessments(AssessmentDate);
+
+-- Optimize payout lookups by ContractID and Status
+CREATE INDEX idx_payout_contract ON Payouts(ContractID);
+CREATE INDEX idx_payout_status ON Payouts(Status);
+
+-- Create Trigger to Automatically Create Payouts After Assessment Creation
+
+DELIMITER $$
+
+CREATE TRIGGER AfterAssessmentInsert
+AFTER INSERT ON Assessments
+FOR EACH ROW
+BEGIN
+    -- Generate a unique PayoutID
+    DECLARE new_payout_id VARCHAR(10);
+
+    -- Bulk ingestion (models/ingest.py) sets @bulk_ingest and creates the payouts of a whole chunk in one statement
+    IF @bulk_ingest IS NULL OR @bulk_ingest = 0 THEN
+        SET new_payout_id = CONCAT('P', LPAD((SELECT COUNT(*) + 1 FROM Payouts), 3, '0'));
+
+        -- Automatically create a payout with status 'Pending'
+        INSERT INTO Payouts (PayoutID, ContractID, Amount, PayoutDate, Status)
+        VALUES (
+            new_payout_id,
+            NEW.ContractID,
+            NEW.ClaimAmount, -- Use the claim amount from the assessment
+            CURDATE(), -- Current date as PayoutDate
+            'Pending' -- Default status
+        );
+    END IF;
+END$$
+
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER AfterAssessmentUpdate
+AFTER UPDATE ON Assessments
+FOR EACH ROW
+BEGIN
+    -- Update the payout status based on the assessment result
+    IF NEW.Result = 'Approved' THEN
+        UPDATE Payouts
+        SET Status = 'Approved'
+        WHERE ContractID = NEW.ContractID AND Amount = NEW.ClaimAmount;
+    ELSEIF NEW.Result = 'Rejected' THEN
+        UPDATE Payouts
+        SET Status = 'Rejected'
+        WHERE ContractID = NEW.ContractID AND Amount = NEW.ClaimAmount;
+    END IF;
+END$$
+
+DELIMITER ;
+
+DELIMITER $$
+
+CREATE TRIGGER BeforeContractInsert
+BEFORE INSERT ON InsuranceContracts
+FOR EACH ROW
+BEGIN
+    -- Calculate the expiration date as one year from the sign date
+    SET NEW.ExpirationDate = DATE_ADD(NEW.SignDate, INTERVAL 1 YEAR);
+    -- Set the status based on the expiration date
+    IF NEW.ExpirationDate > CURDATE() THEN
+        SET NEW.Status = 'Active';
+    ELSE
+        SET NEW.Status = 'Expired';
+    END IF;
+END$$
+
+DELIMITER ;
+
+DELIMITER $$
+-- Create Trigger to Automatically change the status of a contract to 'Expired' after one year
+CREATE EVENT ExpireContractsEvent
+ON SCHEDULE EVERY 1 DAY
+DO
+BEGIN
+    UPDATE InsuranceContracts
+    SET Status = 'Expired'
+    WHERE ExpirationDate < CURDATE() AND Status = 'Active';
+END$$
+
+DELIMITER ;
+
+DELIMITER $$
+
+CREATE TRIGGER BeforeContractUpdate
+BEFORE UPDATE ON InsuranceContracts
+FOR EACH ROW
+BEGIN
+    -- Check if we're explicitly setting an expiration date (for contract extension)
+    IF NEW.ExpirationDate != OLD.ExpirationDate THEN
+        -- This is likely a contract extension, so keep the user-specified expiration date
+        -- Only update the status based on the new expiration date
+        IF NEW.ExpirationDate > CURDATE() THEN
+            SET NEW.Status = 'Active';
+        ELSE
+            SET NEW.Status = 'Expired';
+        END IF;
+    ELSE
+        -- Regular update (not extending the contract)
+        -- Calculate the expiration date as one year from the sign date
+        SET NEW.ExpirationDate = DATE_ADD(NEW.SignDate, INTERVAL 1 YEAR);
+        
+        -- Update the status based on the new expiration date
+        IF NEW.ExpirationDate > CURDATE() THEN
+            SET NEW.Status = 'Active';
+        ELSE
+            SET NEW.Status = 'Expired';
+        END IF;
+    END IF;
+END$$
+
+DELIMITER ;
+
+-- Create contract for a customer
+DELIMITER $$
+CREATE PROCEDURE CreateContract (
+    IN p_ContractID VARCHAR(10),
+    IN p_CustomerID VARCHAR(10),
+    IN p_InsuranceTypeID VARCHAR(10),
+    IN p_SignDate DATE,
+    IN p_ExpirationDate DATE
+)
+BEGIN
+    INSERT INTO InsuranceContracts (
+        ContractID, CustomerID, InsuranceTypeID, SignDate, ExpirationDate, Status
+    )
+    VALUES (
+        p_ContractID, p_CustomerID, p_InsuranceTypeID, p_SignDate, p_ExpirationDate, 'Active'
+    );
+END$$
+DELIMITER ;
@@ -0,0 +1,9 @@
+-- Customer search: full-text on name and address, phone numbers by their digits
+-- PhoneDigits is a stored generated column, so adding it rebuilds Customers, and the first full-text index
+-- rebuilds it again (neither can use LOCK=NONE):
+-- on a large table, run it in a quiet period with --allow-locking.
+ALTER TABLE Customers
+    ADD COLUMN PhoneDigits VARCHAR(20) AS (REGEXP_REPLACE(PhoneNumber, '[^0-9]', '')) STORED;
+
+CREATE FULLTEXT INDEX ft_customer_search ON Customers(CustomerName, Address);
+CREATE INDEX idx_customer_phone_digits ON Customers(PhoneDigits) ALGORITHM=INPLACE LOCK=NONE;
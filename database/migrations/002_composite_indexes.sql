@@ -0,0 +1,42 @@
+-- Composite / covering indexes for the filters and sort orders of the model queries
+-- (check the plans with: python -m database.verify_indexes)
+-- Built online: ALGORITHM=INPLACE, LOCK=NONE keeps the tables readable and writable meanwhile.
+-- Each replaced single-column index is a prefix of its new index, which also serves the foreign key.
+
+-- Assessments
+--   WHERE Result = 'Pending' ORDER BY AssessmentDate (pending / approved claims, pending count)
+--   WHERE ContractID = ? ORDER BY AssessmentDate DESC (a contract's claims)
+--   WHERE ContractID = ? AND ClaimAmount = ? AND Result = 'Approved' (claim of a payout)
+ALTER TABLE Assessments
+    ADD INDEX idx_assessment_result_date (Result, AssessmentDate),
+    ADD INDEX idx_assessment_contract_date (ContractID, AssessmentDate),
+    ADD INDEX idx_assessment_contract_amount (ContractID, ClaimAmount, Result),
+    DROP INDEX idx_assessment_result,
+    DROP INDEX idx_assessment_contract,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Payouts
+--   WHERE Status = 'Pending' ORDER BY PayoutDate (pending payouts); SUM(Amount) by status read from the index alone
+--   WHERE ContractID = ? AND Amount = ? (payout of a claim, also the AfterAssessmentUpdate trigger)
+--   WHERE ContractID = ? ORDER BY PayoutDate DESC (a contract's payouts)
+--   ORDER BY PayoutDate DESC LIMIT ? (payouts page)
+ALTER TABLE Payouts
+    ADD INDEX idx_payout_status_date (Status, PayoutDate, Amount),
+    ADD INDEX idx_payout_contract_amount (ContractID, Amount),
+    ADD INDEX idx_payout_contract_date (ContractID, PayoutDate),
+    ADD INDEX idx_payout_date (PayoutDate),
+    DROP INDEX idx_payout_status,
+    DROP INDEX idx_payout_contract,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- InsuranceContracts
+--   WHERE Status = 'Active' AND ExpirationDate BETWEEN ... (expiring soon, active count)
+--   WHERE CustomerID = ? ORDER BY SignDate DESC (a customer's contracts)
+--   ORDER BY SignDate DESC LIMIT ? (recent contracts)
+ALTER TABLE InsuranceContracts
+    ADD INDEX idx_contract_status_expiration (Status, ExpirationDate),
+    ADD INDEX idx_contract_customer_sign (CustomerID, SignDate),
+    ADD INDEX idx_contract_sign_date (SignDate),
+    DROP INDEX idx_contract_status,
+    DROP INDEX idx_contract_customer,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,231 @@
+-- Archive of closed claims and payouts
+-- ArchiveClosedClaims moves claims (Approved / Rejected) and payouts (Approved / Rejected / Completed)
+-- older than a number of years out of Assessments and Payouts, so the tables the application reads
+-- and writes keep only recent and open rows. ArchiveClosedClaimsEvent runs it every night.
+--
+-- The archive tables are compressed and partitioned by year, so a history query over a date range
+-- reads only the partitions of those years. Assessments and Payouts themselves are not partitioned:
+-- MySQL cannot partition a table that has foreign keys, and their primary keys would have to include
+-- the date; the archive is their cold partition instead.
+-- Model functions read the archive only when asked for history (models/archive.py); all-time payout
+-- totals add PayoutArchiveTotals, which ArchiveClosedClaims keeps up to date, instead of reading it.
+-- ArchiveClosedClaims also splits a new yearly partition off p_future each year (ExtendArchivePartitions).
+
+CREATE TABLE AssessmentsArchive (
+    AssessmentID VARCHAR(10) NOT NULL,
+    ContractID VARCHAR(10),
+    AssessmentDate DATE NOT NULL,
+    ClaimAmount DECIMAL(12, 2),
+    Result VARCHAR(255),
+    EncryptedClaimAmount VARBINARY(255),
+    ArchivedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (AssessmentID, AssessmentDate),
+    INDEX idx_assessment_archive_contract (ContractID, AssessmentDate)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+PARTITION BY RANGE (YEAR(AssessmentDate)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION p2026 VALUES LESS THAN (2027),
+    PARTITION p2027 VALUES LESS THAN (2028),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+CREATE TABLE PayoutsArchive (
+    PayoutID VARCHAR(10) NOT NULL,
+    ContractID VARCHAR(10),
+    Amount DECIMAL(12, 2),
+    PayoutDate DATE NOT NULL,
+    Status VARCHAR(20),
+    EncryptedAmount VARBINARY(255),
+    ArchivedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (PayoutID, PayoutDate),
+    INDEX idx_payout_archive_contract (ContractID, PayoutDate)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+PARTITION BY RANGE (YEAR(PayoutDate)) (
+    PARTITION p_old VALUES LESS THAN (2020),
+    PARTITION p2020 VALUES LESS THAN (2021),
+    PARTITION p2021 VALUES LESS THAN (2022),
+    PARTITION p2022 VALUES LESS THAN (2023),
+    PARTITION p2023 VALUES LESS THAN (2024),
+    PARTITION p2024 VALUES LESS THAN (2025),
+    PARTITION p2025 VALUES LESS THAN (2026),
+    PARTITION p2026 VALUES LESS THAN (2027),
+    PARTITION p2027 VALUES LESS THAN (2028),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Count and amount of the archived payouts by status
+CREATE TABLE PayoutArchiveTotals (
+    Status VARCHAR(20) PRIMARY KEY,
+    PayoutCount BIGINT NOT NULL,
+    TotalAmount DECIMAL(16, 2) NOT NULL
+);
+
+-- Give the archive tables a partition for every year up to next year, split off p_future
+-- (which holds no rows yet, so the split is instant)
+DELIMITER $$
+CREATE PROCEDURE ExtendArchivePartitions ()
+BEGIN
+    DECLARE v_Table VARCHAR(64);
+    DECLARE v_Year INT;
+    DECLARE v_Index INT DEFAULT 1;
+
+    WHILE v_Index <= 2 DO
+        SET v_Table = ELT(v_Index, 'AssessmentsArchive', 'PayoutsArchive');
+        -- First year without a partition of its own: the bound of the last yearly partition
+        SELECT MAX(CAST(PARTITION_DESCRIPTION AS UNSIGNED)) INTO v_Year
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = v_Table AND PARTITION_DESCRIPTION <> 'MAXVALUE';
+
+        WHILE v_Year <= YEAR(CURDATE()) + 1 DO
+            SET @partition_ddl = CONCAT(
+                'ALTER TABLE ', v_Table, ' REORGANIZE PARTITION p_future INTO (',
+                'PARTITION p', v_Year, ' VALUES LESS THAN (', v_Year + 1, '), ',
+                'PARTITION p_future VALUES LESS THAN MAXVALUE)'
+            );
+            PREPARE partition_ddl FROM @partition_ddl;
+            EXECUTE partition_ddl;
+            DEALLOCATE PREPARE partition_ddl;
+            SET v_Year = v_Year + 1;
+        END WHILE;
+        SET v_Index = v_Index + 1;
+    END WHILE;
+END$$
+DELIMITER ;
+
+-- Move closed claims and payouts older than p_Years years to the archive, p_BatchSize rows per transaction
+DELIMITER $$
+CREATE PROCEDURE ArchiveClosedClaims (
+    IN p_Years INT,
+    IN p_BatchSize INT
+)
+BEGIN
+    DECLARE v_Cutoff DATE DEFAULT DATE_SUB(CURDATE(), INTERVAL p_Years YEAR);
+    DECLARE v_Batch INT DEFAULT 1;
+
+    CALL ExtendArchivePartitions();
+
+    -- IDs of the rows moved in the current batch
+    DROP TEMPORARY TABLE IF EXISTS ArchiveBatch;
+    CREATE TEMPORARY TABLE ArchiveBatch (ID VARCHAR(10) PRIMARY KEY);
+
+    WHILE v_Batch > 0 DO
+        START TRANSACTION;
+        DELETE FROM ArchiveBatch;
+        -- No ORDER BY: the (Result, AssessmentDate) index range stops after p_BatchSize rows
+        INSERT INTO ArchiveBatch (ID)
+        SELECT AssessmentID FROM Assessments
+        WHERE Result IN ('Approved', 'Rejected') AND AssessmentDate < v_Cutoff
+        LIMIT p_BatchSize;
+        SET v_Batch = ROW_COUNT();
+
+        INSERT IGNORE INTO AssessmentsArchive (AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result, EncryptedClaimAmount)
+        SELECT a.AssessmentID, a.ContractID, a.AssessmentDate, a.ClaimAmount, a.Result, a.EncryptedClaimAmount
+        FROM Assessments a
+        JOIN ArchiveBatch b ON b.ID = a.AssessmentID;
+        DELETE a FROM Assessments a JOIN ArchiveBatch b ON b.ID = a.AssessmentID;
+        COMMIT;
+    END WHILE;
+
+    SET v_Batch = 1;
+    WHILE v_Batch > 0 DO
+        START TRANSACTION;
+        DELETE FROM ArchiveBatch;
+        INSERT INTO ArchiveBatch (ID)
+        SELECT PayoutID FROM Payouts
+        WHERE Status IN ('Approved', 'Rejected', 'Completed') AND PayoutDate < v_Cutoff
+        LIMIT p_BatchSize;
+        SET v_Batch = ROW_COUNT();
+
+        INSERT INTO PayoutArchiveTotals (Status, PayoutCount, TotalAmount)
+        SELECT * FROM (
+            SELECT p.Status, COUNT(*) AS PayoutCount, COALESCE(SUM(p.Amount), 0) AS TotalAmount
+            FROM Payouts p
+            JOIN ArchiveBatch b ON b.ID = p.PayoutID
+            GROUP BY p.Status
+        ) batch
+        ON DUPLICATE KEY UPDATE
+            PayoutCount = PayoutArchiveTotals.PayoutCount + batch.PayoutCount,
+            TotalAmount = PayoutArchiveTotals.TotalAmount + batch.TotalAmount;
+
+        INSERT IGNORE INTO PayoutsArchive (PayoutID, ContractID, Amount, PayoutDate, Status, EncryptedAmount)
+        SELECT p.PayoutID, p.ContractID, p.Amount, p.PayoutDate, p.Status, p.EncryptedAmount
+        FROM Payouts p
+        JOIN ArchiveBatch b ON b.ID = p.PayoutID;
+        DELETE p FROM Payouts p JOIN ArchiveBatch b ON b.ID = p.PayoutID;
+        COMMIT;
+    END WHILE;
+
+    DROP TEMPORARY TABLE ArchiveBatch;
+END$$
+DELIMITER ;
+
+-- Archive claims and payouts closed more than 3 years ago, every night at 03:00
+CREATE EVENT ArchiveClosedClaimsEvent
+ON SCHEDULE EVERY 1 DAY
+STARTS CURRENT_DATE + INTERVAL 1 DAY + INTERVAL 3 HOUR
+DO CALL ArchiveClosedClaims(3, 5000);
+
+-- Payout numbers come from a counter row instead of scanning Payouts (and the archive) on every claim.
+-- BeforePayoutInsert keeps the counter at or above the number of every payout written by any path
+-- (the claim trigger, add_payout, bulk ingestion); claims take the next number from it.
+CREATE TABLE IdSequences (
+    Name VARCHAR(30) PRIMARY KEY,
+    LastNumber BIGINT UNSIGNED NOT NULL
+);
+
+-- The table locks keep claims and payouts from being written while the counter is seeded and the
+-- triggers are replaced.
+LOCK TABLES Assessments WRITE, Payouts WRITE, IdSequences WRITE;
+
+INSERT INTO IdSequences (Name, LastNumber)
+SELECT 'Payouts', COALESCE(MAX(CAST(SUBSTRING(PayoutID, 2) AS UNSIGNED)), 0) FROM Payouts;
+
+DELIMITER $$
+CREATE TRIGGER BeforePayoutInsert
+BEFORE INSERT ON Payouts
+FOR EACH ROW
+BEGIN
+    UPDATE IdSequences
+    SET LastNumber = GREATEST(LastNumber, CAST(SUBSTRING(NEW.PayoutID, 2) AS UNSIGNED))
+    WHERE Name = 'Payouts';
+END$$
+DELIMITER ;
+
+DROP TRIGGER IF EXISTS AfterAssessmentInsert;
+
+DELIMITER $$
+CREATE TRIGGER AfterAssessmentInsert
+AFTER INSERT ON Assessments
+FOR EACH ROW
+BEGIN
+    -- Generate a unique PayoutID
+    DECLARE new_payout_id VARCHAR(10);
+    DECLARE payout_number BIGINT UNSIGNED;
+
+    -- Bulk ingestion (models/ingest.py) sets @bulk_ingest and creates the payouts of a whole chunk in one statement
+    IF @bulk_ingest IS NULL OR @bulk_ingest = 0 THEN
+        -- The counter row stays locked until the claim commits, so concurrent claims get distinct numbers
+        UPDATE IdSequences SET LastNumber = LastNumber + 1 WHERE Name = 'Payouts';
+        SELECT LastNumber INTO payout_number FROM IdSequences WHERE Name = 'Payouts';
+        SET new_payout_id = CONCAT('P', LPAD(payout_number, GREATEST(3, CHAR_LENGTH(payout_number)), '0'));
+
+        -- Automatically create a payout with status 'Pending'
+        INSERT INTO Payouts (PayoutID, ContractID, Amount, PayoutDate, Status)
+        VALUES (
+            new_payout_id,
+            NEW.ContractID,
+            NEW.ClaimAmount, -- Use the claim amount from the assessment
+            CURDATE(), -- Current date as PayoutDate
+            'Pending' -- Default status
+        );
+    END IF;
+END$$
+DELIMITER ;
+
+UNLOCK TABLES;
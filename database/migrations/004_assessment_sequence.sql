@@ -0,0 +1,28 @@
+-- Claim numbers come from an IdSequences counter row too, like payout numbers (003_claims_archive.sql),
+-- so suggesting or allocating an assessment ID reads one row instead of Assessments and its archive.
+-- BeforeAssessmentInsert keeps the counter at or above the number of every claim written by any path
+-- (add_assessment, file_claim_async, bulk ingestion); new claims take the next number from it.
+
+-- The table lock keeps claims from being written while the counter is seeded and the trigger created.
+LOCK TABLES Assessments WRITE, AssessmentsArchive READ, IdSequences WRITE;
+
+INSERT INTO IdSequences (Name, LastNumber)
+SELECT 'Assessments', COALESCE(MAX(CAST(SUBSTRING(AssessmentID, 2) AS UNSIGNED)), 0)
+FROM (
+    SELECT AssessmentID FROM Assessments WHERE AssessmentID LIKE 'A%'
+    UNION ALL
+    SELECT AssessmentID FROM AssessmentsArchive WHERE AssessmentID LIKE 'A%'
+) ids;
+
+DELIMITER $$
+CREATE TRIGGER BeforeAssessmentInsert
+BEFORE INSERT ON Assessments
+FOR EACH ROW
+BEGIN
+    UPDATE IdSequences
+    SET LastNumber = GREATEST(LastNumber, CAST(SUBSTRING(NEW.AssessmentID, 2) AS UNSIGNED))
+    WHERE Name = 'Assessments';
+END$$
+DELIMITER ;
+
+UNLOCK TABLES;
@@ -0,0 +1,231 @@
+import os
+import re
+import logging
+import glob
+import time
+import threading
+from contextlib import contextmanager
+import streamlit as st
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import duckdb
+from database.db_connector import (
+    stream_query,
+    fetch_arrow,
+    get_cached_data,
+    get_cached_frame,
+    arrow_to_frame,
+    MONEY_COLUMNS,
+    CATEGORY_COLUMNS
+)
+from database.local_store import state_path
+
+logger = logging.getLogger(__name__)
+
+# "duckdb" runs the report queries on a local DuckDB replica instead of MySQL
+REPORTS_ENGINE = os.getenv("REPORTS_ENGINE", "mysql").lower()
+OLAP_REFRESH_SECONDS = int(os.getenv("OLAP_REFRESH_SECONDS", "300"))
+
+# Tables copied into the replica: MySQL query and DuckDB column definitions
+REPLICATED_TABLES = {
+    'Customers': (
+        "SELECT CustomerID, CustomerName, Address, PhoneNumber FROM Customers",
+        "CustomerID VARCHAR, CustomerName VARCHAR, Address VARCHAR, PhoneNumber VARCHAR"
+    ),
+    'InsuranceTypes': (
+        "SELECT InsuranceTypeID, InsuranceName, Description FROM InsuranceTypes",
+        "InsuranceTypeID VARCHAR, InsuranceName VARCHAR, Description VARCHAR"
+    ),
+    'InsuranceContracts': (
+        "SELECT ContractID, CustomerID, InsuranceTypeID, SignDate, ExpirationDate, Status FROM InsuranceContracts",
+        "ContractID VARCHAR, CustomerID VARCHAR, InsuranceTypeID VARCHAR, SignDate DATE, ExpirationDate DATE, Status VARCHAR"
+    ),
+    'Assessments': (
+        "SELECT AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result FROM Assessments",
+        "AssessmentID VARCHAR, ContractID VARCHAR, AssessmentDate DATE, ClaimAmount DECIMAL(12, 2), Result VARCHAR"
+    ),
+    'Payouts': (
+        "SELECT PayoutID, ContractID, Amount, PayoutDate, Status FROM Payouts",
+        "PayoutID VARCHAR, ContractID VARCHAR, Amount DECIMAL(12, 2), PayoutDate DATE, Status VARCHAR"
+    ),
+    # Archived claims and payouts, for the reports run with include_history (models/archive.py)
+    'AssessmentsArchive': (
+        "SELECT AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result FROM AssessmentsArchive",
+        "AssessmentID VARCHAR, ContractID VARCHAR, AssessmentDate DATE, ClaimAmount DECIMAL(12, 2), Result VARCHAR"
+    ),
+    'PayoutsArchive': (
+        "SELECT PayoutID, ContractID, Amount, PayoutDate, Status FROM PayoutsArchive",
+        "PayoutID VARCHAR, ContractID VARCHAR, Amount DECIMAL(12, 2), PayoutDate DATE, Status VARCHAR"
+    )
+}
+
+# Only one refresh at a time; readers never wait on it
+_refresh_lock = threading.Lock()
+# Set while computing report snapshots, which must not be served from the query caches
+_uncached = threading.local()
+
+def replica_paths():
+    """Finished replica files, newest first"""
+    return sorted(glob.glob(state_path("olap", "reports-*.duckdb")), reverse=True)
+
+def current_replica():
+    """Path of the newest replica, or None if none has been built yet"""
+    paths = replica_paths()
+    return paths[0] if paths else None
+
+def replica_timestamp(path=None):
+    """Time the given (or newest) replica was copied from MySQL, as epoch seconds"""
+    path = path or current_replica()
+    if not path:
+        return None
+    return int(re.search(r"reports-(\d+)\.duckdb$", path).group(1))
+
+def copy_table(connection, table, query, columns):
+    """Copy one MySQL table into DuckDB batch by batch"""
+    connection.execute(f"CREATE TABLE {table} ({columns})")
+    copied = False
+    for batch in stream_query(query):
+        copied = True
+        # Money arrives as int64 cents; the DuckDB columns are DECIMAL dollars like MySQL
+        money = [name for name in batch.schema.names if name in MONEY_COLUMNS]
+        replace = f" REPLACE ({', '.join(f'{name} / 100 AS {name}' for name in money)})" if money else ""
+        connection.register("batch", batch)
+        connection.execute(f"INSERT INTO {table} BY NAME SELECT *{replace} FROM batch")
+        connection.unregister("batch")
+    if not copied:
+        # stream_query yields nothing at all when the query failed
+        raise RuntimeError(f"Could not read {table} from MySQL")
+
+def refresh_replica():
+    """Copy the core tables into a new DuckDB file and switch readers over to it.
+
+    The copy is built under a temporary name and renamed when complete, so readers
+    always see either the previous replica or the new one in full.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return current_replica()  # Another refresh is already running
+    try:
+        timestamp = int(time.time())
+        path = state_path("olap", f"reports-{timestamp}.duckdb")
+        building_path = f"{path}.building"
+        connection = duckdb.connect(building_path)
+        try:
+            for table, (query, columns) in REPLICATED_TABLES.items():
+                copy_table(connection, table, query, columns)
+        except Exception:
+            connection.close()
+            os.remove(building_path)
+            raise
+        connection.close()
+        os.replace(building_path, path)
+        get_replica_connection.clear()
+
+        # Older replicas are no longer read once the cached connection is dropped
+        for old_path in replica_paths()[1:]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass  # Still open elsewhere; removed on a later refresh
+        return path
+    finally:
+        _refresh_lock.release()
+
+def replication_loop():
+    """Refresh the replica every OLAP_REFRESH_SECONDS"""
+    while True:
+        try:
+            refresh_replica()
+        except Exception:
+            logger.exception("OLAP replica refresh failed")
+        time.sleep(OLAP_REFRESH_SECONDS)
+
+@st.cache_resource
+def start_replication():
+    """Start the background replication thread (once per server process)"""
+    thread = threading.Thread(target=replication_loop, name="olap-replication", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def get_replica_connection(path):
+    """Read-only DuckDB connection to a replica file"""
+    return duckdb.connect(path, read_only=True)
+
+def to_duckdb_sql(query):
+    """Translate the MySQL dialect used by the report queries to DuckDB"""
+    query = query.replace("%s", "?")
+    query = re.sub(r"\bDATE_FORMAT\(", "strftime(", query)
+    return query.replace("CURDATE()", "current_date")
+
+def normalize_result(table):
+    """Give a DuckDB Arrow result the same column types as fetch_arrow()"""
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if field.name in MONEY_COLUMNS and (pa.types.is_decimal(field.type) or pa.types.is_floating(field.type)):
+            cents = np.rint(column.cast(pa.float64()).to_numpy(zero_copy_only=False) * 100)
+            column = pa.array(np.nan_to_num(cents).astype(np.int64), mask=np.isnan(cents))
+        elif pa.types.is_decimal(field.type) and field.type.scale == 0:
+            # SUM over integers comes back as HUGEINT
+            column = column.cast(pa.int64())
+        elif field.name in CATEGORY_COLUMNS and pa.types.is_string(field.type):
+            column = pc.dictionary_encode(column)
+        else:
+            continue
+        table = table.set_column(i, field.name, column)
+    return table
+
+def olap_enabled():
+    """Whether report queries should go to the DuckDB replica"""
+    if REPORTS_ENGINE != "duckdb":
+        return False
+    start_replication()
+    return current_replica() is not None
+
+def run_olap_query(query, params=None):
+    """Run a report query on the newest replica and return an Arrow table"""
+    cursor = get_replica_connection(current_replica()).cursor()
+    try:
+        return normalize_result(cursor.execute(to_duckdb_sql(query), params or []).fetch_arrow_table())
+    finally:
+        cursor.close()
+
+@contextmanager
+def uncached_reports():
+    """Run report queries in this thread against the database, bypassing the query caches.
+
+    A failed query raises instead of returning an empty result.
+    """
+    _uncached.active = True
+    try:
+        yield
+    finally:
+        _uncached.active = False
+
+def get_report_frame(query, params=None):
+    """Report aggregate as a typed DataFrame, from the replica when enabled, else from MySQL"""
+    if olap_enabled():
+        return arrow_to_frame(run_olap_query(query, params))
+    if getattr(_uncached, 'active', False):
+        table = fetch_arrow(query, params)
+        if table is None:
+            raise RuntimeError("Report query failed")
+        return arrow_to_frame(table)
+    return get_cached_frame(query, params)
+
+def get_report_rows(query, params=None):
+    """Report query result as a list of dicts, from the replica when enabled, else from MySQL"""
+    if not olap_enabled():
+        if getattr(_uncached, 'active', False):
+            result = get_cached_data.__wrapped__(query, params)
+            if result is None:
+                raise RuntimeError("Report query failed")
+            return result
+        return get_cached_data(query, params)
+    cursor = get_replica_connection(current_replica()).cursor()
+    try:
+        cursor.execute(to_duckdb_sql(query), params or [])
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
@@ -0,0 +1,192 @@
+"""Check the plans of the model queries: python -m database.verify_indexes
+
+Runs EXPLAIN on every query of the models in MODEL_MODULES (they keep their queries
+in *_QUERY / *_QUERIES constants) and fails when one reads a whole table or sorts with
+a filesort. The report queries are checked too: they run on MySQL unless REPORTS_ENGINE
+is duckdb. Bulk ingestion (models/ingest.py) reads whole tables by design and is left
+out. Run it against a database loaded with a realistic amount of data: on a few rows
+MySQL rightly prefers table scans.
+"""
+import sys
+import datetime
+from mysql.connector import Error
+from database.db_connector import create_connection
+from models import assessment, contract, cube, customer, dashboard, insurance_type, payout, report
+
+MODEL_MODULES = [contract, assessment, payout, customer, dashboard, insurance_type, report, cube]
+
+# Queries that read most of a table by design (whole listings), with the reason
+FULL_SCAN_QUERIES = {
+    'CONTRACTS_QUERY': "lists every contract",
+    'ASSESSMENTS_QUERY': "lists every claim",
+    'ALL_ASSESSMENTS_QUERY': "lists every claim",
+    'PAYOUTS_QUERY': "lists every payout",
+    'ACTIVE_CONTRACTS_QUERY': "most contracts are active",
+    'EXPIRING_CONTRACTS_QUERY': "includes every expired contract",
+    'ALL_CUSTOMERS_QUERY': "lists every customer",
+    'CONTRACTS_DROPDOWN_QUERY': "lists every contract",
+    'ASSESSMENTS_DROPDOWN_QUERY': "lists every claim",
+    'CUSTOMER_NAMES_QUERY': "lists every customer",
+    'CUSTOMER_KEYS_QUERY': "reads every customer once per import file, to find duplicates",
+    'ACTIVE_CONTRACT_COUNT_QUERY': "most contracts are active",
+    'CLAIM_COUNTS_BY_TYPE_QUERY': "aggregates every claim",
+    'CONTRACT_COUNTS_BY_STATUS_QUERY': "aggregates every contract",
+    'PAYOUT_COUNTS_BY_STATUS_QUERY': "aggregates every payout",
+    # Reports, cubes and exports aggregate or stream whole tables (cached for 5 minutes)
+    'CONTRACTS_BY_TYPE_QUERY': "report over every contract",
+    'CONTRACTS_BY_STATUS_QUERY': "report over every contract",
+    'CONTRACTS_BY_MONTH_QUERY': "report over every contract",
+    'ACTIVE_CONTRACTS_SUMMARY_QUERY': "report over the active contracts, most of them",
+    'CLAIMS_BY_STATUS_QUERY': "report over every claim",
+    'CLAIMS_BY_TYPE_QUERY': "report over every claim",
+    'CLAIM_AMOUNTS_BY_TYPE_QUERY': "report over every claim",
+    'CLAIMS_BY_MONTH_QUERY': "report over every claim",
+    'CLAIMS_METRICS_QUERY': "report over every claim",
+    'PAYOUTS_BY_TYPE_QUERY': "report over every approved payout",
+    'PAYOUTS_BY_MONTH_QUERY': "report over every approved payout",
+    'PAYOUTS_BY_STATUS_QUERY': "report over every payout",
+    'PAYOUT_METRICS_QUERY': "report over every payout",
+    'TOP_CUSTOMERS_BY_CONTRACTS_QUERY': "ranks every customer",
+    'TOP_CUSTOMERS_BY_PAYOUT_QUERY': "ranks every customer",
+    'TOP_CUSTOMERS_BY_CLAIMS_QUERY': "ranks every customer",
+    'CUSTOMER_OVERVIEW_QUERY': "report over every customer",
+    'CLAIMS_CUBE_QUERY': "cube over every claim",
+    'PAYOUTS_CUBE_QUERY': "cube over every payout",
+    'EXPORT_QUERIES': "full export"
+}
+# Tables this small are read whole whatever the indexes (e.g. InsuranceTypes)
+SMALL_TABLE_ROWS = 1000
+# Below this many claims the plans say little about production
+MIN_ASSESSMENT_ROWS = 10000
+
+# One existing row of each table, to fill in the query parameters
+SAMPLE_QUERIES = {
+    'customer': "SELECT CustomerID, PhoneDigits FROM Customers LIMIT 1",
+    'contract': "SELECT ContractID, CustomerID, InsuranceTypeID FROM InsuranceContracts LIMIT 1",
+    'assessment': "SELECT AssessmentID, ContractID, ClaimAmount FROM Assessments LIMIT 1",
+    'payout': "SELECT PayoutID FROM Payouts LIMIT 1",
+    'insurance_type': "SELECT InsuranceTypeID FROM InsuranceTypes LIMIT 1"
+}
+# Parameters of the queries with placeholders, from the sample rows
+QUERY_PARAMS = {
+    'CONTRACT_BY_ID_QUERY': lambda s: (s['contract']['ContractID'],),
+    'CONTRACTS_BY_CUSTOMER_QUERY': lambda s: (s['customer']['CustomerID'],),
+    'CONTRACT_ASSESSMENTS_QUERY': lambda s: (s['contract']['ContractID'],),
+    'CONTRACT_PAYOUTS_QUERY': lambda s: (s['contract']['ContractID'],),
+    'EXTEND_CONTRACT_QUERY': lambda s: (datetime.date.today(), s['contract']['ContractID']),
+    'UPDATE_CONTRACT_QUERY': lambda s: (s['contract']['CustomerID'], s['contract']['InsuranceTypeID'],
+                                        datetime.date.today(), datetime.date.today(), s['contract']['ContractID']),
+    'ASSESSMENT_BY_ID_QUERY': lambda s: (s['assessment']['AssessmentID'],),
+    'RELATED_PAYOUT_QUERY': lambda s: (s['assessment']['ContractID'], s['assessment']['ClaimAmount']),
+    'RELATED_ASSESSMENT_QUERY': lambda s: (s['assessment']['ContractID'], s['assessment']['ClaimAmount']),
+    'UPDATE_ASSESSMENT_RESULT_QUERY': lambda s: ("Pending", s['assessment']['AssessmentID']),
+    'PAYOUT_BY_ID_QUERY': lambda s: (s['payout']['PayoutID'],),
+    'PAYOUTS_PAGE_QUERY': lambda s: (100, 0),
+    'UPDATE_PAYOUT_STATUS_QUERY': lambda s: ("Pending", s['payout']['PayoutID']),
+    'CUSTOMER_BY_ID_QUERY': lambda s: (s['customer']['CustomerID'],),
+    'UPDATE_CUSTOMER_QUERY': lambda s: ("Name", "Address", "555-0000", s['customer']['CustomerID']),
+    'DELETE_CUSTOMER_QUERY': lambda s: (s['customer']['CustomerID'],),
+    'SEARCH_CUSTOMERS_QUERY': lambda s: ("+smith*", "+smith*", 50),
+    'SEARCH_CUSTOMERS_BY_PHONE_QUERY': lambda s: (f"{(s['customer']['PhoneDigits'] or '555')[:4]}%", 50),
+    'CUSTOMER_360_QUERIES': lambda s: (s['customer']['CustomerID'],),
+    'RECENT_CONTRACTS_QUERY': lambda s: (5,),
+    'RECENT_CLAIMS_QUERY': lambda s: (5,),
+    'INSURANCE_TYPE_BY_ID_QUERY': lambda s: (s['insurance_type']['InsuranceTypeID'],),
+    'UPDATE_INSURANCE_TYPE_QUERY': lambda s: ("Name", "Description", s['insurance_type']['InsuranceTypeID']),
+    'DELETE_INSURANCE_TYPE_QUERY': lambda s: (s['insurance_type']['InsuranceTypeID'],)
+}
+
+def model_queries():
+    """(name, query) of every named SELECT / UPDATE / DELETE query of the models"""
+    for module in MODEL_MODULES:
+        for name, value in vars(module).items():
+            if name.endswith("_QUERY") and isinstance(value, str):
+                queries = [(name, value)]
+            elif name.endswith("_QUERIES") and isinstance(value, tuple):
+                queries = [(f"{name}[{i}]", query) for i, query in enumerate(value)]
+            elif name.endswith("_QUERIES") and isinstance(value, dict):
+                queries = [(f"{name}[{key!r}]", query) for key, query in value.items()]
+            else:
+                continue
+            for label, query in queries:
+                statement = query.strip()
+                # Inserts have nothing to plan; templates and multi-statement queries are checked by their parts
+                if statement.split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE") and "{" not in statement and ";" not in statement:
+                    yield label, statement
+
+def load_samples(cursor):
+    """One row of each table, keyed by SAMPLE_QUERIES name"""
+    samples = {}
+    for key, query in SAMPLE_QUERIES.items():
+        cursor.execute(query)
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError(f"No rows in the {key} table: load data before checking the plans")
+        samples[key] = row
+    return samples
+
+def table_rows(cursor):
+    """Row estimate of each table (from the statistics, no count)"""
+    cursor.execute("SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()")
+    return {row['TABLE_NAME']: row['TABLE_ROWS'] or 0 for row in cursor.fetchall()}
+
+def plan_problems(plan):
+    """Full scans of large tables and filesorts in an EXPLAIN result (tables by their alias)"""
+    problems = []
+    for step in plan:
+        table = step['table'] or ""
+        # Derived tables and unions are planned in their own steps
+        if table.startswith("<"):
+            continue
+        if step['type'] == "ALL" and (step['rows'] or 0) >= SMALL_TABLE_ROWS:
+            problems.append(f"full scan of {table} (~{step['rows']:,} rows)")
+        if "filesort" in (step['Extra'] or ""):
+            problems.append(f"filesort on {table}")
+    return problems
+
+def main():
+    connection = create_connection(pooled=False)
+    if not connection:
+        print("Database connection failed")
+        return 2
+
+    failed = 0
+    try:
+        cursor = connection.cursor(dictionary=True)
+        rows_by_table = table_rows(cursor)
+        if rows_by_table.get('Assessments', 0) < MIN_ASSESSMENT_ROWS:
+            print(f"Warning: only ~{rows_by_table.get('Assessments', 0):,} claims; plans on small tables are not representative\n")
+        samples = load_samples(cursor)
+
+        for name, query in model_queries():
+            base_name = name.split("[")[0]
+            if "%s" in query and base_name not in QUERY_PARAMS:
+                print(f"FAIL  {name}: no sample parameters in QUERY_PARAMS")
+                failed += 1
+                continue
+            params = QUERY_PARAMS[base_name](samples) if "%s" in query else None
+            try:
+                cursor.execute(f"EXPLAIN {query}", params)
+                plan = cursor.fetchall()
+            except Error as e:
+                print(f"FAIL  {name}: {e.msg}")
+                failed += 1
+                continue
+
+            keys = ", ".join(f"{step['table']}:{step['key'] or step['type']}" for step in plan if step['table'])
+            problems = plan_problems(plan)
+            if problems and base_name in FULL_SCAN_QUERIES:
+                print(f"SCAN  {name}: {FULL_SCAN_QUERIES[base_name]} [{keys}]")
+            elif problems:
+                print(f"FAIL  {name}: {'; '.join(problems)} [{keys}]")
+                failed += 1
+            else:
+                print(f"OK    {name} [{keys}]")
+    finally:
+        connection.close()
+
+    print(f"\n{failed} queries with full scans or filesorts" if failed else "\nAll queries use indexes")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import re
+
+# Closed claims and payouts older than a few years are moved out of the hot tables by the
+# ArchiveClosedClaims procedure (database/migrations/003_claims_archive.sql). Queries read
+# the hot tables only unless history is asked for.
+ARCHIVE_TABLES = {
+    'Assessments': ('AssessmentsArchive', "AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result"),
+    'Payouts': ('PayoutsArchive', "PayoutID, ContractID, Amount, PayoutDate, Status")
+}
+# Words that can follow a table name in FROM / JOIN and are not its alias
+_NOT_ALIAS = r"(?:WHERE|GROUP|ORDER|LIMIT|HAVING|JOIN|LEFT|RIGHT|INNER|CROSS|ON|UNION)\b"
+_TABLE_REFERENCE = re.compile(
+    rf"\b(FROM|JOIN)\s+({'|'.join(ARCHIVE_TABLES)})\b(?:\s+(?:AS\s+)?(?!{_NOT_ALIAS})(\w+))?",
+    re.IGNORECASE)
+
+def history_table(table):
+    """Derived table with the hot and archived rows of Assessments or Payouts"""
+    archive, columns = ARCHIVE_TABLES[table]
+    return f"(SELECT {columns} FROM {table} UNION ALL SELECT {columns} FROM {archive})"
+
+def with_history(query, include_history=True):
+    """The query reading Assessments / Payouts together with their archive tables.
+
+    Every FROM / JOIN of those tables is replaced by history_table() under the same
+    alias, so the rest of the query is unchanged. Returns the query as is when
+    include_history is false.
+    """
+    if not include_history:
+        return query
+
+    def replace(match):
+        keyword, table, alias = match.groups()
+        table = next(name for name in ARCHIVE_TABLES if name.lower() == table.lower())
+        return f"{keyword} {history_table(table)} {alias or table}"
+
+    return _TABLE_REFERENCE.sub(replace, query)
@@ -1,34 +1,90 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from database.db_connector import create_connection, execute_query, get_cached_data, execute_write_query
+from database.db_connector import create_connection, execute_query, get_cached_data, get_cached_frame, get_arrow_table, execute_write_query, execute_many, on_commit, on_external_write
+from database import async_connector
+from models.archive import with_history
+from utils.formatting import format_currency
 from mysql.connector import Error
 
-@st.cache_data(ttl=300)
-def get_all_assessments():
-    """Get all assessments with contract and customer information"""
-    query = """
-        SELECT a.AssessmentID, a.ContractID, c.CustomerID, c.CustomerName, 
-               a.AssessmentDate, a.ClaimAmount, a.Result
-        FROM Assessments a
-        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
-        JOIN Customers c ON ic.CustomerID = c.CustomerID
-        ORDER BY a.AssessmentDate DESC
-    """
-    return get_cached_data(query)
+ASSESSMENT_RESULTS = ["Pending", "Approved", "Rejected"]
+
+# Queries shared by the cached functions and their async variants
+ASSESSMENTS_QUERY = """
+    SELECT a.AssessmentID, a.ContractID, c.CustomerID, c.CustomerName, 
+           a.AssessmentDate, a.ClaimAmount, a.Result
+    FROM Assessments a
+    JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
+    JOIN Customers c ON ic.CustomerID = c.CustomerID
+"""
+ALL_ASSESSMENTS_QUERY = ASSESSMENTS_QUERY + "ORDER BY a.AssessmentDate DESC"
+ASSESSMENT_BY_ID_QUERY = ASSESSMENTS_QUERY + "WHERE a.AssessmentID = %s"
+PENDING_ASSESSMENTS_QUERY = """
+    SELECT a.AssessmentID, a.ContractID, c.CustomerName,
+           a.AssessmentDate, a.ClaimAmount, a.Result
+    FROM Assessments a
+    JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
+    JOIN Customers c ON ic.CustomerID = c.CustomerID
+    WHERE a.Result = 'Pending'
+    ORDER BY a.AssessmentDate
+"""
+APPROVED_CLAIMS_QUERY = """
+    SELECT a.AssessmentID, a.ContractID, c.CustomerName,
+           a.AssessmentDate, a.ClaimAmount, a.Result
+    FROM Assessments a
+    JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
+    JOIN Customers c ON ic.CustomerID = c.CustomerID
+    WHERE a.Result = 'Approved'
+    ORDER BY a.AssessmentDate DESC
+"""
+ACTIVE_CONTRACTS_QUERY = """
+    SELECT c.ContractID, cust.CustomerName, t.InsuranceName
+    FROM InsuranceContracts c
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    WHERE c.Status = 'Active'
+"""
+# A claim and its payout are archived separately (by their own dates), so the other half
+# of a hot row may already be in the archive: these lookups read both
+RELATED_PAYOUT_QUERY = with_history("""
+    SELECT PayoutID, ContractID, PayoutDate, Amount, Status
+    FROM Payouts
+    WHERE ContractID = %s AND Amount = %s
+""")
+RELATED_ASSESSMENT_QUERY = with_history("""
+    SELECT AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result
+    FROM Assessments
+    WHERE ContractID = %s AND ClaimAmount = %s AND Result = 'Approved'
+""")
+ADD_ASSESSMENT_QUERY = """
+    INSERT INTO Assessments (AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result) 
+    VALUES (%s, %s, %s, %s, %s)
+"""
+UPDATE_ASSESSMENT_RESULT_QUERY = """
+    UPDATE Assessments 
+    SET Result = %s
+    WHERE AssessmentID = %s
+"""
+# Claim numbers come from the IdSequences counter (database/migrations/004_assessment_sequence.sql),
+# which stays at or above every claim number, archived claims included
+LAST_ASSESSMENT_NUMBER_QUERY = "SELECT LastNumber FROM IdSequences WHERE Name = 'Assessments'"
+# Take the next claim number (LAST_INSERT_ID returns the new value)
+NEXT_ASSESSMENT_NUMBER_QUERY = "UPDATE IdSequences SET LastNumber = LAST_INSERT_ID(LastNumber + 1) WHERE Name = 'Assessments'"
+ASSESSMENTS_DROPDOWN_QUERY = """
+    SELECT a.AssessmentID, c.CustomerName, a.ClaimAmount
+    FROM Assessments a
+    JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
+    JOIN Customers c ON ic.CustomerID = c.CustomerID
+"""
+
+def get_all_assessments(include_history=False):
+    """Get all assessments with contract and customer information (archived ones with include_history)"""
+    return get_arrow_table(with_history(ALL_ASSESSMENTS_QUERY, include_history))
 
 @st.cache_data(ttl=300)
 def get_assessment_by_id(assessment_id):
     """Get a specific assessment by ID"""
-    query = """
-        SELECT a.AssessmentID, a.ContractID, c.CustomerID, c.CustomerName, 
-               a.AssessmentDate, a.ClaimAmount, a.Result
-        FROM Assessments a
-        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
-        JOIN Customers c ON ic.CustomerID = c.CustomerID
-        WHERE a.AssessmentID = %s
-    """
-    result = get_cached_data(query, (assessment_id,))
+    result = get_cached_data(ASSESSMENT_BY_ID_QUERY, (assessment_id,))
     if result and len(result) > 0:
         return result[0]
     return None
@@ -36,130 +92,82 @@ def get_assessment_by_id(assessment_id):
 @st.cache_data(ttl=300)
 def get_assessments_dropdown():
     """Get assessments for dropdown selection"""
-    query = """
-        SELECT a.AssessmentID, c.CustomerName, a.ClaimAmount
-        FROM Assessments a
-        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
-        JOIN Customers c ON ic.CustomerID = c.CustomerID
-    """
-    assessments = get_cached_data(query)
-    if not assessments:
+    df = get_cached_frame(ASSESSMENTS_DROPDOWN_QUERY)
+    if df.empty:
         return {}
-    return {f"{a['AssessmentID']}: {a['CustomerName']} - ${float(a['ClaimAmount']):,.2f}": a['AssessmentID'] for a in assessments}
+    labels = df['AssessmentID'] + ': ' + df['CustomerName'].astype(str) + ' - ' + format_currency(df['ClaimAmount'])
+    return dict(zip(labels, df['AssessmentID']))
 
 @st.cache_data(ttl=300)
 def get_pending_assessments():
     """Get assessments with pending status"""
-    query = """
-        SELECT a.AssessmentID, a.ContractID, c.CustomerName,
-               a.AssessmentDate, a.ClaimAmount, a.Result
-        FROM Assessments a
-        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
-        JOIN Customers c ON ic.CustomerID = c.CustomerID
-        WHERE a.Result = 'Pending'
-        ORDER BY a.AssessmentDate
-    """
-    return get_cached_data(query)
+    return get_cached_frame(PENDING_ASSESSMENTS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_approved_claims():
     """Get assessments with approved status"""
-    query = """
-        SELECT a.AssessmentID, a.ContractID, c.CustomerName,
-               a.AssessmentDate, a.ClaimAmount, a.Result
-        FROM Assessments a
-        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
-        JOIN Customers c ON ic.CustomerID = c.CustomerID
-        WHERE a.Result = 'Approved'
-        ORDER BY a.AssessmentDate DESC
-    """
-    return get_cached_data(query)
+    return get_cached_frame(APPROVED_CLAIMS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_active_contracts_dropdown():
     """Get active contracts for dropdown selection"""
-    query = """
-        SELECT c.ContractID, cust.CustomerName, t.InsuranceName
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE c.Status = 'Active'
-    """
-    contracts = get_cached_data(query)
-    if not contracts:
+    df = get_cached_frame(ACTIVE_CONTRACTS_QUERY)
+    if df.empty:
         return {}
-    return {f"{c['ContractID']}: {c['CustomerName']} - {c['InsuranceName']}": c['ContractID'] for c in contracts}
+    labels = df['ContractID'] + ': ' + df['CustomerName'].astype(str) + ' - ' + df['InsuranceName'].astype(str)
+    return dict(zip(labels, df['ContractID']))
 
 @st.cache_data(ttl=300)
 def get_related_payout(contract_id, claim_amount):
     """Get payout related to an assessment"""
-    query = """
-        SELECT PayoutID, ContractID, PayoutDate, Amount, Status
-        FROM Payouts
-        WHERE ContractID = %s AND Amount = %s
-    """
-    return get_cached_data(query, (contract_id, claim_amount))
+    return get_cached_data(RELATED_PAYOUT_QUERY, (contract_id, claim_amount))
 
 @st.cache_data(ttl=300)
 def get_related_assessment(contract_id, claim_amount):
     """Get assessment related to a payout"""
-    query = """
-        SELECT AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result
-        FROM Assessments
-        WHERE ContractID = %s AND ClaimAmount = %s AND Result = 'Approved'
-    """
-    return get_cached_data(query, (contract_id, claim_amount))
+    return get_cached_data(RELATED_ASSESSMENT_QUERY, (contract_id, claim_amount))
 
 def generate_next_assessment_id():
-    """Generate the next assessment ID"""
-    last_assessment = get_cached_data("SELECT AssessmentID FROM Assessments ORDER BY AssessmentID DESC LIMIT 1")
-    next_id = "A001"  # Default starting ID if no records exist
-    
-    if last_assessment and len(last_assessment) > 0:
-        last_id = last_assessment[0]['AssessmentID']
-        # Extract the numeric part, increment it, and format it back
-        try:
-            id_num = int(last_id[1:])
-            next_id = f"A{(id_num + 1):03d}"
-        except (ValueError, IndexError):
-            pass  # Use default if parsing fails
-    
-    return next_id
+    """Generate the next assessment ID (after the claim counter, archived assessments included)"""
+    last_assessment = get_cached_data(LAST_ASSESSMENT_NUMBER_QUERY)
+    last_number = int(last_assessment[0]['LastNumber']) if last_assessment else 0
+    return f"A{last_number + 1:03d}"
 
 def add_assessment(assessment_id, contract_id, assessment_date, claim_amount, result):
     """Add a new assessment to the database"""
-    query = """
-    INSERT INTO Assessments (AssessmentID, ContractID, AssessmentDate, ClaimAmount, Result) 
-    VALUES (%s, %s, %s, %s, %s)
-    """
     data = (assessment_id, contract_id, assessment_date, claim_amount, result)
-    result = execute_write_query(query, data)
+    result = execute_write_query(ADD_ASSESSMENT_QUERY, data)
     
     # Clear cache for assessment-related functions
-    if hasattr(get_all_assessments, 'clear'):
-        get_all_assessments.clear()
-    if hasattr(get_assessments_dropdown, 'clear'):
-        get_assessments_dropdown.clear()
-    if hasattr(get_pending_assessments, 'clear'):
-        get_pending_assessments.clear()
-    if hasattr(get_approved_claims, 'clear'):
-        get_approved_claims.clear()
+    on_commit(clear_assessment_cache)
     
     return result
 
 def update_assessment_result(assessment_id, new_result):
     """Update an assessment's result"""
-    query = """
-    UPDATE Assessments 
-    SET Result = %s
-    WHERE AssessmentID = %s
-    """
     data = (new_result, assessment_id)
-    result = execute_write_query(query, data)
+    result = execute_write_query(UPDATE_ASSESSMENT_RESULT_QUERY, data)
+    
+    # Clear cache for assessment-related functions
+    on_commit(clear_assessment_cache)
+    
+    return result
+
+def update_assessment_results(assessment_ids, new_result):
+    """Set the same result on several assessments in one batch (e.g. approve a selection).
+
+    Returns the number of assessments updated, or None on error.
+    """
+    data = [(new_result, assessment_id) for assessment_id in assessment_ids]
+    result = execute_many(UPDATE_ASSESSMENT_RESULT_QUERY, data)
     
     # Clear cache for assessment-related functions
-    if hasattr(get_all_assessments, 'clear'):
-        get_all_assessments.clear()
+    on_commit(clear_assessment_cache)
+    
+    return result
+
+def clear_assessment_cache():
+    """Clear all cached assessment data"""
     if hasattr(get_assessment_by_id, 'clear'):
         get_assessment_by_id.clear()
     if hasattr(get_assessments_dropdown, 'clear'):
@@ -168,5 +176,65 @@ def update_assessment_result(assessment_id, new_result):
         get_pending_assessments.clear()
     if hasattr(get_approved_claims, 'clear'):
         get_approved_claims.clear()
-    
-    return result
+
+# Also cleared after writes the API makes in its own process
+on_external_write('assessments', clear_assessment_cache)
+
+# Async variants for callers running on an event loop (not cached: they read the database)
+async def get_all_assessments_async(include_history=False):
+    """Get all assessments with contract and customer information (archived ones with include_history)"""
+    return await async_connector.fetch(with_history(ALL_ASSESSMENTS_QUERY, include_history))
+
+async def list_assessments_async(after=None, limit=100, result=None, contract_id=None):
+    """Get a page of assessments ordered by ID, starting after the given assessment ID"""
+    conditions, params = [], []
+    if after:
+        conditions.append("a.AssessmentID > %s")
+        params.append(after)
+    if result:
+        conditions.append("a.Result = %s")
+        params.append(result)
+    if contract_id:
+        conditions.append("a.ContractID = %s")
+        params.append(contract_id)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    return await async_connector.fetch(
+        ASSESSMENTS_QUERY + where + "ORDER BY a.AssessmentID LIMIT %s",
+        (*params, limit)
+    )
+
+async def get_assessment_by_id_async(assessment_id):
+    """Get a specific assessment by ID"""
+    return await async_connector.fetch_one(ASSESSMENT_BY_ID_QUERY, (assessment_id,))
+
+async def add_assessment_async(assessment_id, contract_id, assessment_date, claim_amount, result):
+    """Add a new assessment to the database"""
+    data = (assessment_id, contract_id, assessment_date, claim_amount, result)
+    await async_connector.execute(ADD_ASSESSMENT_QUERY, data)
+    # The insert trigger also creates the claim's payout
+    await async_connector.mark_changed('assessments', 'payouts')
+
+async def file_claim_async(contract_id, assessment_date, claim_amount, attempts=5):
+    """File a new pending claim under the next free assessment ID and return the ID.
+
+    Each attempt takes a number from the claim counter; an ID entered in the Claims form
+    meanwhile can still take it first, and then the next number is tried.
+    """
+    for _ in range(attempts):
+        number = await async_connector.execute_insert_id(NEXT_ASSESSMENT_NUMBER_QUERY)
+        assessment_id = f"A{number:03d}"
+        try:
+            await add_assessment_async(assessment_id, contract_id, assessment_date, claim_amount, "Pending")
+            return assessment_id
+        except async_connector.IntegrityError as e:
+            # Only a duplicate assessment ID is worth another attempt (not a duplicate raised by a trigger)
+            if e.args[0] != 1062 or f"'{assessment_id}'" not in str(e):
+                raise
+    raise RuntimeError("Could not allocate an assessment ID")
+
+async def update_assessment_result_async(assessment_id, new_result):
+    """Update an assessment's result; returns whether the assessment exists"""
+    updated = await async_connector.execute(UPDATE_ASSESSMENT_RESULT_QUERY, (new_result, assessment_id))
+    # The update trigger also sets the status of the claim's payout
+    await async_connector.mark_changed('assessments', 'payouts')
+    return updated > 0
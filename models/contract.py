@@ -1,35 +1,81 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from database.db_connector import create_connection, execute_query, get_cached_data, execute_write_query
+from database.db_connector import create_connection, execute_query, get_cached_data, get_cached_multi, get_cached_frame, get_arrow_table, execute_write_query, execute_many, on_commit, on_external_write
+from database import async_connector
 from models.customer import get_customers
 from models.insurance_type import get_all_insurance_types
 from mysql.connector import Error
 
-@st.cache_data(ttl=300)
+# Queries shared by the cached functions and their async variants
+CONTRACTS_QUERY = """
+    SELECT c.ContractID, c.CustomerID, cust.CustomerName, c.InsuranceTypeID, 
+           t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
+    FROM InsuranceContracts c
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+"""
+CONTRACT_BY_ID_QUERY = CONTRACTS_QUERY + "WHERE c.ContractID = %s"
+CONTRACTS_BY_CUSTOMER_QUERY = """
+    SELECT c.ContractID, t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
+    FROM InsuranceContracts c
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    WHERE c.CustomerID = %s
+    ORDER BY c.SignDate DESC
+"""
+CONTRACT_ASSESSMENTS_QUERY = """
+    SELECT AssessmentID, AssessmentDate, ClaimAmount, Result
+    FROM Assessments
+    WHERE ContractID = %s
+    ORDER BY AssessmentDate DESC
+"""
+CONTRACT_PAYOUTS_QUERY = """
+    SELECT PayoutID, PayoutDate, Amount, Status
+    FROM Payouts
+    WHERE ContractID = %s
+    ORDER BY PayoutDate DESC
+"""
+EXPIRING_CONTRACTS_QUERY = """
+    SELECT c.ContractID, cust.CustomerName, t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
+    FROM InsuranceContracts c
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    WHERE c.ExpirationDate BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 3 MONTH)
+    OR (c.ExpirationDate < CURDATE() AND c.Status = 'Expired')
+    ORDER BY c.ExpirationDate
+"""
+# A contract with its assessments and payouts, sent as one multi-statement query
+CONTRACT_DETAIL_QUERY = ";".join([CONTRACT_BY_ID_QUERY, CONTRACT_ASSESSMENTS_QUERY, CONTRACT_PAYOUTS_QUERY])
+ADD_CONTRACT_QUERY = """
+    INSERT INTO InsuranceContracts (ContractID, CustomerID, InsuranceTypeID, SignDate) 
+    VALUES (%s, %s, %s, %s)
+"""
+EXTEND_CONTRACT_QUERY = """
+    UPDATE InsuranceContracts 
+    SET ExpirationDate = %s, Status = 'Active'
+    WHERE ContractID = %s
+"""
+CONTRACTS_DROPDOWN_QUERY = """
+    SELECT c.ContractID, cust.CustomerName, t.InsuranceName
+    FROM InsuranceContracts c
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+"""
+UPDATE_CONTRACT_QUERY = """
+    UPDATE InsuranceContracts 
+    SET CustomerID = %s, InsuranceTypeID = %s, SignDate = %s, ExpirationDate = %s
+    WHERE ContractID = %s
+"""
+LAST_CONTRACT_NUMBER_QUERY = "SELECT COALESCE(MAX(CAST(SUBSTRING(ContractID, 3) AS UNSIGNED)), 0) AS LastNumber FROM InsuranceContracts WHERE ContractID LIKE 'CT%'"
+
 def get_all_contracts():
     """Get all contracts with customer and insurance type information"""
-    query = """
-        SELECT c.ContractID, c.CustomerID, cust.CustomerName, c.InsuranceTypeID, 
-               t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-    """
-    return get_cached_data(query)
+    return get_arrow_table(CONTRACTS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_contract_by_id(contract_id):
     """Get a specific contract by ID"""
-    query = """
-        SELECT c.ContractID, c.CustomerID, cust.CustomerName, c.InsuranceTypeID, 
-               t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE c.ContractID = %s
-    """
-    result = get_cached_data(query, (contract_id,))
+    result = get_cached_data(CONTRACT_BY_ID_QUERY, (contract_id,))
     if result and len(result) > 0:
         return result[0]
     return None
@@ -37,123 +83,67 @@ def get_contract_by_id(contract_id):
 @st.cache_data(ttl=300)
 def get_contracts_dropdown():
     """Get contracts for dropdown selection"""
-    query = """
-        SELECT c.ContractID, cust.CustomerName, t.InsuranceName
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-    """
-    contracts = get_cached_data(query)
-    if not contracts:
+    df = get_cached_frame(CONTRACTS_DROPDOWN_QUERY)
+    if df.empty:
         return {}
-    return {f"{c['ContractID']}: {c['CustomerName']} - {c['InsuranceName']}": c['ContractID'] for c in contracts}
+    labels = df['ContractID'] + ': ' + df['CustomerName'].astype(str) + ' - ' + df['InsuranceName'].astype(str)
+    return dict(zip(labels, df['ContractID']))
 
 @st.cache_data(ttl=300)
 def get_contracts_by_customer(customer_id):
     """Get all contracts for a specific customer"""
-    query = """
-        SELECT c.ContractID, t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
-        FROM InsuranceContracts c
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE c.CustomerID = %s
-        ORDER BY c.SignDate DESC
-    """
-    return get_cached_data(query, (customer_id,))
+    return get_cached_data(CONTRACTS_BY_CUSTOMER_QUERY, (customer_id,))
 
 @st.cache_data(ttl=300)
 def get_expiring_contracts():
     """Get contracts that are expiring within 3 months or have expired"""
-    query = """
-        SELECT c.ContractID, cust.CustomerName, t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE c.ExpirationDate BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 3 MONTH)
-        OR (c.ExpirationDate < CURDATE() AND c.Status = 'Expired')
-        ORDER BY c.ExpirationDate
-    """
-    return get_cached_data(query)
+    return get_cached_data(EXPIRING_CONTRACTS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_contract_assessments(contract_id):
     """Get all assessments for a specific contract"""
-    query = """
-        SELECT AssessmentID, AssessmentDate, ClaimAmount, Result
-        FROM Assessments
-        WHERE ContractID = %s
-        ORDER BY AssessmentDate DESC
-    """
-    return get_cached_data(query, (contract_id,))
+    return get_cached_data(CONTRACT_ASSESSMENTS_QUERY, (contract_id,))
 
 @st.cache_data(ttl=300)
 def get_contract_payouts(contract_id):
     """Get all payouts for a specific contract"""
-    query = """
-        SELECT PayoutID, PayoutDate, Amount, Status
-        FROM Payouts
-        WHERE ContractID = %s
-        ORDER BY PayoutDate DESC
+    return get_cached_data(CONTRACT_PAYOUTS_QUERY, (contract_id,))
+
+def get_contract_detail(contract_id):
+    """Get a contract with its assessments and payouts in one round trip.
+
+    Returns a dict with 'contract', 'assessments' and 'payouts', or None if the contract
+    does not exist. The three results are cached as one entry, dropped by any write.
     """
-    return get_cached_data(query, (contract_id,))
+    results = get_cached_multi(CONTRACT_DETAIL_QUERY, (contract_id,) * 3)
+    if not results or not results[0]:
+        return None
+    contract, assessments, payouts = results
+    return {'contract': contract[0], 'assessments': assessments, 'payouts': payouts}
 
 def generate_next_contract_id():
-    """Generate the next contract ID"""
-    last_contract = get_cached_data("SELECT ContractID FROM InsuranceContracts ORDER BY ContractID DESC LIMIT 1")
-    next_id = "CT001"  # Default starting ID if no records exist
-    
-    if last_contract and len(last_contract) > 0:
-        last_id = last_contract[0]['ContractID']
-        # Extract the numeric part, increment it, and format it back
-        try:
-            id_num = int(last_id[2:])
-            next_id = f"CT{(id_num + 1):03d}"
-        except (ValueError, IndexError):
-            pass  # Use default if parsing fails
-    
-    return next_id
+    """Generate the next contract ID (after the highest number, so CT1000 follows CT999)"""
+    last_contract = get_cached_data(LAST_CONTRACT_NUMBER_QUERY)
+    last_number = int(last_contract[0]['LastNumber']) if last_contract else 0
+    return f"CT{last_number + 1:03d}"
 
 def add_contract(contract_id, customer_id, insurance_type_id, sign_date):
     """Add a new contract to the database"""
-    query = """
-    INSERT INTO InsuranceContracts (ContractID, CustomerID, InsuranceTypeID, SignDate) 
-    VALUES (%s, %s, %s, %s)
-    """
     data = (contract_id, customer_id, insurance_type_id, sign_date)
-    result = execute_write_query(query, data)
+    result = execute_write_query(ADD_CONTRACT_QUERY, data)
     
     # Clear cache for contract-related functions
-    if hasattr(get_all_contracts, 'clear'):
-        get_all_contracts.clear()
-    if hasattr(get_contracts_dropdown, 'clear'):
-        get_contracts_dropdown.clear()
-    if hasattr(get_contracts_by_customer, 'clear'):
-        get_contracts_by_customer.clear()
-    if hasattr(get_expiring_contracts, 'clear'):
-        get_expiring_contracts.clear()
+    on_commit(clear_contract_cache)
     
     return result
 
 def update_contract(contract_id, customer_id, insurance_type_id, sign_date, expiration_date):
     """Update an existing contract in the database"""
-    query = """
-    UPDATE InsuranceContracts 
-    SET CustomerID = %s, InsuranceTypeID = %s, SignDate = %s, ExpirationDate = %s
-    WHERE ContractID = %s
-    """
     data = (customer_id, insurance_type_id, sign_date, expiration_date, contract_id)
-    result = execute_write_query(query, data)
+    result = execute_write_query(UPDATE_CONTRACT_QUERY, data)
     
     # Clear cache for contract-related functions
-    if hasattr(get_all_contracts, 'clear'):
-        get_all_contracts.clear()
-    if hasattr(get_contract_by_id, 'clear'):
-        get_contract_by_id.clear()
-    if hasattr(get_contracts_dropdown, 'clear'):
-        get_contracts_dropdown.clear()
-    if hasattr(get_contracts_by_customer, 'clear'):
-        get_contracts_by_customer.clear()
-    if hasattr(get_expiring_contracts, 'clear'):
-        get_expiring_contracts.clear()
+    on_commit(clear_contract_cache)
     
     return result
 
@@ -165,32 +155,81 @@ def extend_contract(contract_id, new_expiration_date):
     else:
         formatted_date = str(new_expiration_date)
     
-    query = """
-    UPDATE InsuranceContracts 
-    SET ExpirationDate = %s, Status = 'Active'
-    WHERE ContractID = %s
-    """
     data = (formatted_date, contract_id)
     
-    # Force clear cache before executing the query
-    st.cache_data.clear()
-    
     # Execute the update query
-    result = execute_write_query(query, data)
+    result = execute_write_query(EXTEND_CONTRACT_QUERY, data)
     
-    # Clear individual function caches if they exist
-    try:
-        if hasattr(get_all_contracts, 'clear'):
-            get_all_contracts.clear()
-        if hasattr(get_contract_by_id, 'clear'):
-            get_contract_by_id.clear()
-        if hasattr(get_contracts_dropdown, 'clear'):
-            get_contracts_dropdown.clear()
-        if hasattr(get_contracts_by_customer, 'clear'):
-            get_contracts_by_customer.clear()
-        if hasattr(get_expiring_contracts, 'clear'):
-            get_expiring_contracts.clear()
-    except Exception as e:
-        print(f"Error clearing cache: {e}")
+    # Clear cache for contract-related functions (after the commit, so no stale rows are cached meanwhile)
+    on_commit(clear_contract_cache)
 
     return result
+
+def extend_contracts(contract_ids, new_expiration_date):
+    """Extend several contracts to the same expiration date in one batch.
+
+    Returns the number of contracts extended, or None on error.
+    """
+    data = [(new_expiration_date, contract_id) for contract_id in contract_ids]
+    result = execute_many(EXTEND_CONTRACT_QUERY, data)
+    
+    # Clear cache for contract-related functions
+    on_commit(clear_contract_cache)
+    
+    return result
+
+def clear_contract_cache():
+    """Clear all cached contract data"""
+    if hasattr(get_contract_by_id, 'clear'):
+        get_contract_by_id.clear()
+    if hasattr(get_contracts_dropdown, 'clear'):
+        get_contracts_dropdown.clear()
+    if hasattr(get_contracts_by_customer, 'clear'):
+        get_contracts_by_customer.clear()
+    if hasattr(get_expiring_contracts, 'clear'):
+        get_expiring_contracts.clear()
+
+# Also cleared after writes the API makes in its own process
+on_external_write('contracts', clear_contract_cache)
+
+# Async variants for callers running on an event loop (not cached: they read the database)
+async def get_all_contracts_async():
+    """Get all contracts with customer and insurance type information"""
+    return await async_connector.fetch(CONTRACTS_QUERY)
+
+async def list_contracts_async(after=None, limit=100, status=None):
+    """Get a page of contracts ordered by ID, starting after the given contract ID"""
+    conditions, params = [], []
+    if after:
+        conditions.append("c.ContractID > %s")
+        params.append(after)
+    if status:
+        conditions.append("c.Status = %s")
+        params.append(status)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    return await async_connector.fetch(
+        CONTRACTS_QUERY + where + "ORDER BY c.ContractID LIMIT %s",
+        (*params, limit)
+    )
+
+async def get_contract_by_id_async(contract_id):
+    """Get a specific contract by ID"""
+    return await async_connector.fetch_one(CONTRACT_BY_ID_QUERY, (contract_id,))
+
+async def get_contracts_by_customer_async(customer_id):
+    """Get all contracts for a specific customer"""
+    return await async_connector.fetch(CONTRACTS_BY_CUSTOMER_QUERY, (customer_id,))
+
+async def get_contract_assessments_async(contract_id):
+    """Get all assessments for a specific contract"""
+    return await async_connector.fetch(CONTRACT_ASSESSMENTS_QUERY, (contract_id,))
+
+async def get_contract_payouts_async(contract_id):
+    """Get all payouts for a specific contract"""
+    return await async_connector.fetch(CONTRACT_PAYOUTS_QUERY, (contract_id,))
+
+async def extend_contract_async(contract_id, new_expiration_date):
+    """Extend a contract's expiration date; returns whether the contract exists"""
+    updated = await async_connector.execute(EXTEND_CONTRACT_QUERY, (new_expiration_date, contract_id))
+    await async_connector.mark_changed('contracts')
+    return updated > 0
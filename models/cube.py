@@ -0,0 +1,89 @@
+import streamlit as st
+import pandas as pd
+from database.olap import get_report_frame
+from models.archive import with_history
+from utils.formatting import to_dollars
+
+# Dimensions shared by both cubes; the claim Result is exposed as Status
+CUBE_DIMENSIONS = ['InsuranceName', 'Status', 'Month', 'Segment']
+CUBE_MEASURES = {
+    "Count": 'Count',
+    "Total Amount": 'TotalAmount',
+    "Average Amount": 'AverageAmount'
+}
+
+# Customer segment by number of contracts held
+SEGMENT_SQL = """
+    CASE
+        WHEN seg.ContractCount >= 4 THEN 'Loyal (4+)'
+        WHEN seg.ContractCount >= 2 THEN 'Multi (2-3)'
+        ELSE 'Single'
+    END
+"""
+CLAIMS_CUBE_QUERY = f"""
+    SELECT t.InsuranceName, a.Result as Status,
+           DATE_FORMAT(a.AssessmentDate, '%Y-%m') as Month,
+           {SEGMENT_SQL} as Segment,
+           COUNT(*) as Count, COUNT(a.ClaimAmount) as AmountCount, SUM(a.ClaimAmount) as TotalAmount
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    JOIN (
+        SELECT CustomerID, COUNT(*) as ContractCount
+        FROM InsuranceContracts
+        GROUP BY CustomerID
+    ) seg ON c.CustomerID = seg.CustomerID
+    GROUP BY 1, 2, 3, 4
+"""
+PAYOUTS_CUBE_QUERY = f"""
+    SELECT t.InsuranceName, p.Status,
+           DATE_FORMAT(p.PayoutDate, '%Y-%m') as Month,
+           {SEGMENT_SQL} as Segment,
+           COUNT(*) as Count, COUNT(p.Amount) as AmountCount, SUM(p.Amount) as TotalAmount
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    JOIN (
+        SELECT CustomerID, COUNT(*) as ContractCount
+        FROM InsuranceContracts
+        GROUP BY CustomerID
+    ) seg ON c.CustomerID = seg.CustomerID
+    GROUP BY 1, 2, 3, 4
+"""
+
+@st.cache_data(ttl=300)
+def get_claims_cube(include_history=False):
+    """Get claim counts and amounts by insurance type, result, month and customer segment"""
+    return get_report_frame(with_history(CLAIMS_CUBE_QUERY, include_history))
+
+@st.cache_data(ttl=300)
+def get_payouts_cube(include_history=False):
+    """Get payout counts and amounts by insurance type, status, month and customer segment"""
+    return get_report_frame(with_history(PAYOUTS_CUBE_QUERY, include_history))
+
+def slice_cube(cube, rows, columns=None, filters=None, measure='Count'):
+    """Aggregate a cube to the given row (and optional column) dimensions in memory.
+
+    Counts and totals are summed and the average is recomputed from them (over rows
+    with an amount, like SQL AVG), so any combination of dimensions gives correct
+    averages. Amounts are in dollars.
+    """
+    if columns and not rows:
+        rows, columns = [columns], None
+    df = cube
+    for dimension, values in (filters or {}).items():
+        if values:
+            df = df[df[dimension].isin(values)]
+
+    keys = list(rows) + ([columns] if columns else [])
+    df = df.assign(TotalAmount=to_dollars(df['TotalAmount']).fillna(0))
+    if keys:
+        result = df.groupby(keys, observed=True)[['Count', 'AmountCount', 'TotalAmount']].sum().reset_index()
+    else:
+        result = df[['Count', 'AmountCount', 'TotalAmount']].sum().to_frame().T
+    result['AverageAmount'] = result['TotalAmount'] / result['AmountCount'].where(result['AmountCount'] > 0)
+    result = result.drop(columns='AmountCount')
+
+    if columns:
+        return result.pivot_table(index=list(rows), columns=columns, values=measure, observed=True).reset_index()
+    return result
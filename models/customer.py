@@ -1,7 +1,103 @@
+import re
 import streamlit as st
 import pandas as pd
+import pyarrow.compute as pc
 from mysql.connector import Error
-from database.db_connector import get_cached_data, execute_write_query
+from database.db_connector import (
+    get_cached_data,
+    get_cached_batch,
+    get_cached_frame,
+    fetch_arrow,
+    execute_write_query,
+    on_commit,
+    unit_of_work
+)
+from database import async_connector
+from utils.bulk_import import (
+    IMPORT_CHUNK_SIZE,
+    match_columns,
+    to_text,
+    from_text,
+    clean_text,
+    collect_errors,
+    format_ids,
+    chunked
+)
+from utils.search import TrigramIndex
+
+# Listed explicitly: the table also has the generated PhoneDigits column used by the search
+CUSTOMER_COLUMNS = "CustomerID, CustomerName, Address, PhoneNumber"
+CUSTOMER_SEARCH_LIMIT = 50
+
+ALL_CUSTOMERS_QUERY = f"SELECT {CUSTOMER_COLUMNS} FROM Customers"
+CUSTOMER_BY_ID_QUERY = f"SELECT {CUSTOMER_COLUMNS} FROM Customers WHERE CustomerID = %s"
+
+# Ranked full-text matches on name and address (ft_customer_search index)
+SEARCH_CUSTOMERS_QUERY = f"""
+    SELECT {CUSTOMER_COLUMNS}, MATCH(CustomerName, Address) AGAINST (%s IN BOOLEAN MODE) AS Score
+    FROM Customers
+    WHERE MATCH(CustomerName, Address) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY Score DESC
+    LIMIT %s
+"""
+# Phone numbers starting with the digits, however they were typed (idx_customer_phone_digits)
+SEARCH_CUSTOMERS_BY_PHONE_QUERY = f"""
+    SELECT {CUSTOMER_COLUMNS}
+    FROM Customers
+    WHERE PhoneDigits LIKE %s
+    ORDER BY PhoneDigits
+    LIMIT %s
+"""
+
+# Customer 360: everything about one customer, read as one batch on one connection.
+# Claims and payouts are the hot rows only: archived ones (closed more than 3 years ago)
+# are left out, since the archive cannot be filtered by customer without a scan.
+CUSTOMER_360_QUERIES = (
+    CUSTOMER_BY_ID_QUERY,
+    """
+    SELECT c.ContractID, t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
+    FROM InsuranceContracts c
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    WHERE c.CustomerID = %s
+    ORDER BY c.SignDate DESC
+    """,
+    """
+    SELECT a.AssessmentID, a.ContractID, a.AssessmentDate, a.ClaimAmount, a.Result
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    WHERE c.CustomerID = %s
+    ORDER BY a.AssessmentDate DESC
+    """,
+    """
+    SELECT p.PayoutID, p.ContractID, p.PayoutDate, p.Amount, p.Status
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    WHERE c.CustomerID = %s
+    ORDER BY p.PayoutDate DESC
+    """
+)
+
+INSERT_CUSTOMER_QUERY = """
+    INSERT INTO Customers (CustomerID, CustomerName, Address, PhoneNumber) 
+    VALUES (%s, %s, %s, %s)
+"""
+UPDATE_CUSTOMER_QUERY = """
+    UPDATE Customers 
+    SET CustomerName = %s, Address = %s, PhoneNumber = %s
+    WHERE CustomerID = %s
+"""
+CUSTOMER_NAMES_QUERY = "SELECT CustomerID, CustomerName FROM Customers"
+CUSTOMER_KEYS_QUERY = "SELECT CustomerName, PhoneNumber FROM Customers"
+LAST_CUSTOMER_NUMBER_QUERY = "SELECT COALESCE(MAX(CAST(SUBSTRING(CustomerID, 2) AS UNSIGNED)), 0) AS LastNumber FROM Customers WHERE CustomerID LIKE 'C%'"
+DELETE_CUSTOMER_QUERY = "DELETE FROM Customers WHERE CustomerID = %s"
+# Columns of an import file (IDs are allocated by the import) and other accepted headers
+CUSTOMER_IMPORT_COLUMNS = ['CustomerName', 'Address', 'PhoneNumber']
+CUSTOMER_IMPORT_ALIASES = {
+    'Name': 'CustomerName',
+    'Customer': 'CustomerName',
+    'Phone': 'PhoneNumber',
+    'Mobile': 'PhoneNumber'
+}
 
 def display_customer_management():
     """Display the customer management section"""
@@ -88,70 +184,246 @@ def display_edit_form(customer_id, customer):
 
 def get_all_customers():
     """Get all customers from database with caching"""
-    return get_cached_data("SELECT * FROM Customers")
+    return get_cached_data(ALL_CUSTOMERS_QUERY)
 
 def get_customer_by_id(customer_id):
     """Get a specific customer by ID"""
-    result = get_cached_data("SELECT * FROM Customers WHERE CustomerID = %s", (customer_id,))
+    result = get_cached_data(CUSTOMER_BY_ID_QUERY, (customer_id,))
     if result and len(result) > 0:
         return result[0]
     return None
 
+def get_customer_360(customer_id):
+    """A customer with all their contracts, claims and payouts, in a constant number of queries.
+
+    Returns a dict with 'customer', 'contracts', 'claims' and 'payouts' (claims and payouts
+    carry their ContractID), or None if the customer does not exist.
+    """
+    results = get_cached_batch(tuple((query, (customer_id,)) for query in CUSTOMER_360_QUERIES))
+    if not results or not results[0]:
+        return None
+    customer, contracts, claims, payouts = results
+    return {'customer': customer[0], 'contracts': contracts, 'claims': claims, 'payouts': payouts}
+
 def get_customers_dropdown():
     """Get customers for dropdown selection"""
-    customers = get_cached_data("SELECT CustomerID, CustomerName FROM Customers")
-    if not customers:
+    df = get_cached_frame(CUSTOMER_NAMES_QUERY)
+    if df.empty:
         return {}
-    return {f"{cust['CustomerID']}: {cust['CustomerName']}": cust['CustomerID'] for cust in customers}
+    labels = df['CustomerID'] + ': ' + df['CustomerName'].astype(str)
+    return dict(zip(labels, df['CustomerID']))
 
 def generate_next_customer_id():
-    """Generate the next customer ID"""
-    last_customer = get_cached_data("SELECT CustomerID FROM Customers ORDER BY CustomerID DESC LIMIT 1")
-    next_id = "C001"  # Default starting ID if no records exist
-    
-    if last_customer and len(last_customer) > 0:
-        last_id = last_customer[0]['CustomerID']
-        # Extract the numeric part, increment it, and format it back
-        try:
-            id_num = int(last_id[1:])
-            next_id = f"C{(id_num + 1):03d}"
-        except (ValueError, IndexError):
-            pass  # Use default if parsing fails
-    
-    return next_id
+    """Generate the next customer ID (after the highest number, so C1000 follows C999)"""
+    last_customer = get_cached_data(LAST_CUSTOMER_NUMBER_QUERY)
+    last_number = int(last_customer[0]['LastNumber']) if last_customer else 0
+    return f"C{last_number + 1:03d}"
 
 def add_customer(customer_id, customer_name, address, phone):
     """Add a new customer to the database"""
-    query = """
-    INSERT INTO Customers (CustomerID, CustomerName, Address, PhoneNumber) 
-    VALUES (%s, %s, %s, %s)
-    """
     data = (customer_id, customer_name, address, phone)
-    return execute_write_query(query, data)
+    result = execute_write_query(INSERT_CUSTOMER_QUERY, data)
+    
+    # New name for the fuzzy search
+    on_commit(clear_customer_cache)
+    
+    return result
 
 def update_customer(customer_id, customer_name, address, phone):
     """Update an existing customer in the database"""
-    query = """
-    UPDATE Customers 
-    SET CustomerName = %s, Address = %s, PhoneNumber = %s
-    WHERE CustomerID = %s
-    """
     data = (customer_name, address, phone, customer_id)
-    return execute_write_query(query, data)
+    result = execute_write_query(UPDATE_CUSTOMER_QUERY, data)
+    
+    on_commit(clear_customer_cache)
+    
+    return result
 
 def delete_customer(customer_id):
     """Delete a customer from the database"""
-    query = "DELETE FROM Customers WHERE CustomerID = %s"
-    result = execute_write_query(query, (customer_id,))
+    result = execute_write_query(DELETE_CUSTOMER_QUERY, (customer_id,))
     
     # Clear cache specifically for customer data
+    on_commit(clear_customer_cache)
+    
+    return result
+
+def clear_customer_cache():
+    """Clear all cached customer data"""
     if hasattr(get_all_customers, 'clear'):
         get_all_customers.clear()
     if hasattr(get_customers_dropdown, 'clear'):
         get_customers_dropdown.clear()
+    get_customer_name_index.clear()
+
+@st.cache_resource(ttl=3600)
+def get_customer_name_index():
+    """Trigram index of all customer names for fuzzy search (built once per server process)"""
+    table = fetch_arrow(CUSTOMER_NAMES_QUERY)
+    if table is None:
+        return TrigramIndex([], [])
+    return TrigramIndex(table.column('CustomerID').to_pylist(), table.column('CustomerName'))
+
+def fulltext_terms(term):
+    """Boolean-mode full-text query requiring every word of the term (as a prefix).
+
+    Words shorter than InnoDB's minimum token size (3) are not indexed and are left to
+    the fuzzy search.
+    """
+    words = [word for word in re.findall(r"\w+", term) if len(word) >= 3]
+    return " ".join(f"+{word}*" for word in words)
+
+def search_customers(term, limit=CUSTOMER_SEARCH_LIMIT):
+    """Customers matching a search term, best matches first.
+
+    A term of mostly digits is looked up as a phone number. Otherwise an exact customer ID
+    comes first, then full-text matches on name and address, then fuzzy name matches
+    (misspellings) from the in-memory trigram index. Each result has a 'Match' column.
+    """
+    term = term.strip()
+    if not term:
+        return []
     
-    return result
+    digits = re.sub(r"\D", "", term)
+    if len(digits) >= 3 and len(digits) >= len(re.sub(r"[\s()+.-]", "", term)):
+        rows = get_cached_data(SEARCH_CUSTOMERS_BY_PHONE_QUERY, (f"{digits}%", limit)) or []
+        return [{**row, 'Match': "Phone"} for row in rows]
+    
+    results = {}
+    by_id = get_customer_by_id(term.upper())
+    if by_id:
+        results[by_id['CustomerID']] = {**by_id, 'Match': "ID"}
+    
+    query = fulltext_terms(term)
+    if query:
+        for row in get_cached_data(SEARCH_CUSTOMERS_QUERY, (query, query, limit)) or []:
+            match = {column: value for column, value in row.items() if column != 'Score'}
+            results.setdefault(row['CustomerID'], {**match, 'Match': "Name / Address"})
+    
+    if len(results) < limit:
+        fuzzy = [key for key, _ in get_customer_name_index().search(term, limit) if key not in results]
+        if fuzzy:
+            placeholders = ", ".join(["%s"] * len(fuzzy))
+            rows = get_cached_data(f"SELECT {CUSTOMER_COLUMNS} FROM Customers WHERE CustomerID IN ({placeholders})", tuple(fuzzy))
+            by_key = {row['CustomerID']: row for row in rows or []}
+            for key in fuzzy:
+                if key in by_key:
+                    results[key] = {**by_key[key], 'Match': "Similar name"}
+    
+    return list(results.values())[:limit]
 
 def get_customers():
     """Get all customers from database - alias for get_all_customers"""
     return get_all_customers()
+
+def normalize_phone(series):
+    """Phone numbers reduced to their digits, keeping a leading +"""
+    text = pc.utf8_trim_whitespace(to_text(series))
+    digits = pc.replace_substring_regex(text, r"\D", "")
+    phones = pc.if_else(pc.starts_with(text, "+"), pc.binary_join_element_wise("+", digits, ""), digits)
+    return from_text(phones, series.index)
+
+def customer_keys(names, phones):
+    """Natural key (name and phone) of normalized customers, used to detect duplicates"""
+    keys = pc.binary_join_element_wise(pc.utf8_lower(to_text(names)), to_text(phones), "|")
+    return from_text(keys, names.index)
+
+def existing_customer_keys():
+    """Natural keys of the customers already in the database"""
+    table = fetch_arrow(CUSTOMER_KEYS_QUERY)
+    if table is None:
+        raise RuntimeError("Could not read the existing customers")
+    df = table.to_pandas()
+    return set(customer_keys(clean_text(df['CustomerName']), normalize_phone(df['PhoneNumber'])))
+
+def prepare_customer_import(raw):
+    """Validate and normalize the rows of an import file, all rows at once.
+
+    Returns the valid rows and the error message of every rejected row (both keep the
+    file's row index). Raises ValueError when required columns are missing.
+    """
+    df, missing = match_columns(raw, CUSTOMER_IMPORT_COLUMNS, CUSTOMER_IMPORT_ALIASES)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    
+    customers = pd.DataFrame({
+        'CustomerName': clean_text(df['CustomerName']),
+        'Address': clean_text(df['Address']),
+        'PhoneNumber': normalize_phone(df['PhoneNumber'])
+    }, index=df.index)
+    digits = pd.Series(pc.utf8_length(pc.utf8_ltrim(to_text(customers['PhoneNumber']), "+")), index=customers.index)
+    keys = customer_keys(customers['CustomerName'], customers['PhoneNumber'])
+    
+    errors = collect_errors(customers.index, [
+        (customers['CustomerName'] == "", "Customer name is required"),
+        (customers['CustomerName'].str.len() > 100, "Customer name is longer than 100 characters"),
+        (customers['Address'] == "", "Address is required"),
+        (customers['Address'].str.len() > 255, "Address is longer than 255 characters"),
+        (~digits.between(7, 15), "Phone number must have 7 to 15 digits"),
+        (keys.duplicated(), "Same name and phone as an earlier row"),
+        (keys.isin(existing_customer_keys()), "Customer already exists")
+    ])
+    rejected = errors != ""
+    return customers[~rejected], errors[rejected]
+
+def next_customer_number(work):
+    """Number of the next free customer ID"""
+    return int(work.fetch_value(LAST_CUSTOMER_NUMBER_QUERY)) + 1
+
+def import_customers(customers, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Insert validated customers under newly allocated IDs, one transaction per chunk.
+
+    IDs are handed out in blocks while holding a MySQL named lock, so two imports never
+    allocate the same IDs. A chunk that fails is retried row by row (each row under a
+    savepoint), so only the offending rows are rejected. Returns the imported rows with
+    their IDs and the errors by row.
+    """
+    imported = []
+    errors = {}
+    with unit_of_work(pooled=False) as work:
+        if work.fetch_value("SELECT GET_LOCK('customer_import', 10)") != 1:
+            raise RuntimeError("Another customer import is running, please try again later")
+        try:
+            next_number = next_customer_number(work)
+            done = 0
+            for chunk in chunked(customers, chunk_size):
+                chunk = chunk.assign(CustomerID=format_ids("C", next_number, len(chunk)).values)
+                rows = list(chunk[['CustomerID', *CUSTOMER_IMPORT_COLUMNS]].itertuples(index=False, name=None))
+                try:
+                    # One multi-row INSERT for the whole chunk
+                    work.execute_many(INSERT_CUSTOMER_QUERY, rows)
+                    work.commit()
+                    imported.append(chunk)
+                    next_number += len(chunk)
+                except Error:
+                    work.rollback()
+                    # IDs may have been taken meanwhile (e.g. from the Add Customer form): take a new block
+                    next_number = next_customer_number(work)
+                    inserted = []
+                    for index, row in zip(chunk.index, rows):
+                        row = (f"C{next_number:03d}", *row[1:])
+                        try:
+                            with work.savepoint():
+                                work.execute(INSERT_CUSTOMER_QUERY, row)
+                            inserted.append(index)
+                            chunk.loc[index, 'CustomerID'] = row[0]
+                            next_number += 1
+                        except Error as e:
+                            errors[index] = e.msg
+                    work.commit()
+                    imported.append(chunk.loc[inserted])
+                done += len(chunk)
+                if progress:
+                    progress(done, len(customers))
+        finally:
+            if work.connection.is_connected():
+                work.fetch_value("SELECT RELEASE_LOCK('customer_import')")
+    
+    if imported:
+        clear_customer_cache()
+    imported = pd.concat(imported) if imported else customers.iloc[:0].assign(CustomerID=[])
+    return imported, pd.Series(errors, dtype=object)
+
+# Async variants for callers running on an event loop (not cached: they read the database)
+async def get_customer_by_id_async(customer_id):
+    """Get a specific customer by ID"""
+    return await async_connector.fetch_one(CUSTOMER_BY_ID_QUERY, (customer_id,))
@@ -1,7 +1,55 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.db_connector import get_cached_data
+from database.db_connector import get_cached_data, get_cached_frame
+
+# Named queries (checked by database/verify_indexes.py)
+RECENT_CONTRACTS_QUERY = """
+    SELECT c.ContractID, cust.CustomerName, c.SignDate, t.InsuranceName, c.Status
+    FROM InsuranceContracts c
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    ORDER BY c.SignDate DESC
+    LIMIT %s
+"""
+RECENT_CLAIMS_QUERY = """
+    SELECT a.AssessmentID, c.ContractID, cust.CustomerName, 
+        a.AssessmentDate, a.ClaimAmount, a.Result
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    ORDER BY a.AssessmentDate DESC
+    LIMIT %s
+"""
+EXPIRING_SOON_COUNT_QUERY = """
+    SELECT COUNT(*) as count
+    FROM InsuranceContracts
+    WHERE ExpirationDate BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 30 DAY)
+    AND Status = 'Active'
+"""
+# All-time total: the hot payouts plus the running totals of the archived ones (no archive scan)
+TOTAL_PAYOUTS_QUERY = """
+    SELECT (
+        SELECT COALESCE(SUM(Amount), 0) FROM Payouts WHERE Status = 'Approved'
+    ) + (
+        SELECT COALESCE(SUM(TotalAmount), 0) FROM PayoutArchiveTotals WHERE Status = 'Approved'
+    ) AS total
+"""
+CLAIM_COUNTS_BY_TYPE_QUERY = """
+    SELECT t.InsuranceName, COUNT(a.AssessmentID) as ClaimCount
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    GROUP BY t.InsuranceName
+"""
+CONTRACT_COUNTS_BY_STATUS_QUERY = """
+    SELECT Status, COUNT(*) as Count
+    FROM InsuranceContracts
+    GROUP BY Status
+"""
+CUSTOMER_COUNT_QUERY = "SELECT COUNT(*) AS count FROM Customers"
+ACTIVE_CONTRACT_COUNT_QUERY = "SELECT COUNT(*) AS count FROM InsuranceContracts WHERE Status = 'Active'"
+PENDING_CLAIM_COUNT_QUERY = "SELECT COUNT(*) AS count FROM Assessments WHERE Result = 'Pending'"
 
 @st.cache_data(ttl=300)
 def get_dashboard_metrics():
@@ -9,19 +57,19 @@ def get_dashboard_metrics():
     metrics = {}
     
     # Total Customers
-    customer_count = get_cached_data("SELECT COUNT(*) AS count FROM Customers")
+    customer_count = get_cached_data(CUSTOMER_COUNT_QUERY)
     metrics['customer_count'] = customer_count[0]['count'] if customer_count else 0
     
     # Active Contracts
-    contract_count = get_cached_data("SELECT COUNT(*) AS count FROM InsuranceContracts WHERE Status = 'Active'")
+    contract_count = get_cached_data(ACTIVE_CONTRACT_COUNT_QUERY)
     metrics['contract_count'] = contract_count[0]['count'] if contract_count else 0
     
     # Pending Claims
-    pending_claims = get_cached_data("SELECT COUNT(*) AS count FROM Assessments WHERE Result = 'Pending'")
+    pending_claims = get_cached_data(PENDING_CLAIM_COUNT_QUERY)
     metrics['pending_claims'] = pending_claims[0]['count'] if pending_claims else 0
     
-    # Total Payouts
-    total_payouts = get_cached_data("SELECT SUM(Amount) AS total FROM Payouts WHERE Status = 'Approved'")
+    # Total Payouts (all-time, so archived payouts count too)
+    total_payouts = get_cached_data(TOTAL_PAYOUTS_QUERY)
     metrics['total_payouts'] = total_payouts[0]['total'] if total_payouts and total_payouts[0]['total'] else 0
     
     return metrics
@@ -29,63 +77,28 @@ def get_dashboard_metrics():
 @st.cache_data(ttl=300)
 def get_recent_contracts(limit=5):
     """Get the most recent contracts"""
-    query = """
-        SELECT c.ContractID, cust.CustomerName, c.SignDate, t.InsuranceName, c.Status
-        FROM InsuranceContracts c
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        ORDER BY c.SignDate DESC
-        LIMIT %s
-    """
-    return get_cached_data(query, (limit,))
+    return get_cached_data(RECENT_CONTRACTS_QUERY, (limit,))
 
 @st.cache_data(ttl=300)
 def get_recent_claims(limit=5):
     """Get the most recent assessments/claims"""
-    query = """
-        SELECT a.AssessmentID, c.ContractID, cust.CustomerName, 
-            a.AssessmentDate, a.ClaimAmount, a.Result
-        FROM Assessments a
-        JOIN InsuranceContracts c ON a.ContractID = c.ContractID
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        ORDER BY a.AssessmentDate DESC
-        LIMIT %s
-    """
-    return get_cached_data(query, (limit,))
+    return get_cached_data(RECENT_CLAIMS_QUERY, (limit,))
 
 @st.cache_data(ttl=300)
 def get_claims_by_type():
     """Get distribution of claims by insurance type"""
-    query = """
-        SELECT t.InsuranceName, COUNT(a.AssessmentID) as ClaimCount
-        FROM Assessments a
-        JOIN InsuranceContracts c ON a.ContractID = c.ContractID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        GROUP BY t.InsuranceName
-    """
-    return get_cached_data(query)
+    return get_cached_frame(CLAIM_COUNTS_BY_TYPE_QUERY)
 
 @st.cache_data(ttl=300)
 def get_expiring_contracts_count():
     """Get count of contracts expiring in the next 30 days"""
-    query = """
-        SELECT COUNT(*) as count
-        FROM InsuranceContracts
-        WHERE ExpirationDate BETWEEN CURDATE() AND DATE_ADD(CURDATE(), INTERVAL 30 DAY)
-        AND Status = 'Active'
-    """
-    result = get_cached_data(query)
+    result = get_cached_data(EXPIRING_SOON_COUNT_QUERY)
     return result[0]['count'] if result else 0
 
 @st.cache_data(ttl=300)
 def get_contracts_by_status():
     """Get counts of contracts by status"""
-    query = """
-        SELECT Status, COUNT(*) as Count
-        FROM InsuranceContracts
-        GROUP BY Status
-    """
-    return get_cached_data(query)
+    return get_cached_frame(CONTRACT_COUNTS_BY_STATUS_QUERY)
 
 def display_dashboard():
     """Display the dashboard with key metrics and charts"""
@@ -121,8 +134,8 @@ def display_claims_by_type():
     """Display the claims by insurance type chart"""
     st.markdown('<div class="sub-header">Claims by Insurance Type</div>', unsafe_allow_html=True)
     claims_by_type = get_claims_by_type()
-    if claims_by_type:
-        df_claims = pd.DataFrame(claims_by_type)
+    if not claims_by_type.empty:
+        df_claims = claims_by_type
         fig = px.pie(df_claims, values='ClaimCount', names='InsuranceName', title='Claims Distribution by Insurance Type')
         st.plotly_chart(fig, use_container_width=True)
     else:
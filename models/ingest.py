@@ -0,0 +1,187 @@
+import pandas as pd
+from mysql.connector import Error
+from database.db_connector import fetch_arrow, arrow_to_frame, unit_of_work
+from models.contract import ADD_CONTRACT_QUERY, LAST_CONTRACT_NUMBER_QUERY
+from models.assessment import ADD_ASSESSMENT_QUERY, ASSESSMENT_RESULTS
+from models.archive import with_history
+from utils.formatting import to_frame
+from utils.bulk_import import IMPORT_CHUNK_SIZE, match_columns, clean_text, collect_errors, format_ids, chunked
+
+# Columns of the partner feed files; the natural key columns identify a record across re-runs
+CONTRACT_FEED_COLUMNS = ['CustomerID', 'InsuranceTypeID', 'SignDate']
+CLAIM_FEED_COLUMNS = ['ContractID', 'AssessmentDate', 'ClaimAmount']
+CONTRACT_NATURAL_KEY = ['CustomerID', 'InsuranceTypeID', 'SignDate']
+CLAIM_NATURAL_KEY = ['ContractID', 'AssessmentDate', 'ClaimAmount']
+
+# Payouts of a chunk of new claims in one statement, numbered from the first reserved payout number
+# (what the AfterAssessmentInsert trigger does row by row; it stands down while @bulk_ingest = 1)
+CREATE_PAYOUTS_QUERY = """
+    INSERT INTO Payouts (PayoutID, ContractID, Amount, PayoutDate, Status)
+    SELECT CONCAT('P', LPAD(n, GREATEST(3, CHAR_LENGTH(n)), '0')), ContractID, ClaimAmount, CURDATE(), 'Pending'
+    FROM (
+        SELECT a.ContractID, a.ClaimAmount, %s + ROW_NUMBER() OVER (ORDER BY a.AssessmentID) - 1 AS n
+        FROM Assessments a
+        WHERE a.AssessmentID IN ({placeholders})
+    ) new_claims
+"""
+# Advance an IdSequences counter ('Assessments' / 'Payouts') by a chunk's worth of numbers
+# (LAST_INSERT_ID returns the new value)
+RESERVE_ID_NUMBERS_QUERY = "UPDATE IdSequences SET LastNumber = LAST_INSERT_ID(LastNumber + %s) WHERE Name = %s"
+
+def parse_dates(series):
+    """Parse ISO dates; unparseable values become NaT"""
+    return pd.to_datetime(clean_text(series), format="%Y-%m-%d", errors="coerce")
+
+def parse_amounts(series):
+    """Parse money amounts (thousands separators allowed), rounded to cents; invalid values become NaN"""
+    return pd.to_numeric(clean_text(series).str.replace(",", "", regex=False), errors="coerce").round(2)
+
+def existing_ids(query):
+    """First column of a query as a set (IDs of existing records)"""
+    table = fetch_arrow(query)
+    if table is None:
+        raise RuntimeError("Could not read the existing records")
+    return set(table.column(0).to_pylist())
+
+def existing_keys(query, columns):
+    """Natural keys of the records already in the database"""
+    table = fetch_arrow(query)
+    if table is None:
+        raise RuntimeError("Could not read the existing records")
+    return natural_keys(to_frame(arrow_to_frame(table)), columns)
+
+def natural_keys(df, columns):
+    """One comparable string per row made of the natural key columns"""
+    parts = []
+    for column in columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime("%Y-%m-%d")
+        elif pd.api.types.is_numeric_dtype(values):
+            values = values.map("{:.2f}".format)
+        parts.append(values.astype(str))
+    return pd.Series(["|".join(key) for key in zip(*parts)], index=df.index) if parts else pd.Series(dtype=object)
+
+def prepare_contract_feed(raw):
+    """Validate a contracts feed. Returns the new rows, errors by row and the number of rows already loaded"""
+    df, missing = match_columns(raw, CONTRACT_FEED_COLUMNS)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    contracts = pd.DataFrame({
+        'CustomerID': clean_text(df['CustomerID']).str.upper(),
+        'InsuranceTypeID': clean_text(df['InsuranceTypeID']).str.upper(),
+        'SignDate': parse_dates(df['SignDate'])
+    }, index=df.index)
+    errors = collect_errors(contracts.index, [
+        (~contracts['CustomerID'].isin(existing_ids("SELECT CustomerID FROM Customers")), "Unknown customer"),
+        (~contracts['InsuranceTypeID'].isin(existing_ids("SELECT InsuranceTypeID FROM InsuranceTypes")), "Unknown insurance type"),
+        (contracts['SignDate'].isna(), "Sign date must be a date (YYYY-MM-DD)")
+    ])
+    return split_new_rows(contracts, errors, CONTRACT_NATURAL_KEY, existing_keys(
+        "SELECT CustomerID, InsuranceTypeID, SignDate FROM InsuranceContracts", CONTRACT_NATURAL_KEY
+    ))
+
+def prepare_claim_feed(raw):
+    """Validate a claims feed. Returns the new rows, errors by row and the number of rows already loaded"""
+    df, missing = match_columns(raw, CLAIM_FEED_COLUMNS)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    claims = pd.DataFrame({
+        'ContractID': clean_text(df['ContractID']).str.upper(),
+        'AssessmentDate': parse_dates(df['AssessmentDate']),
+        'ClaimAmount': parse_amounts(df['ClaimAmount']),
+        'Result': clean_text(df['Result']).str.capitalize().replace("", "Pending") if 'Result' in df else "Pending"
+    }, index=df.index)
+    errors = collect_errors(claims.index, [
+        (~claims['ContractID'].isin(existing_ids("SELECT ContractID FROM InsuranceContracts")), "Unknown contract"),
+        (claims['AssessmentDate'].isna(), "Assessment date must be a date (YYYY-MM-DD)"),
+        (claims['ClaimAmount'].isna() | (claims['ClaimAmount'] < 0), "Claim amount must be a number of at least 0"),
+        (claims['ClaimAmount'] >= 1e10, "Claim amount is too large"),
+        (~claims['Result'].isin(ASSESSMENT_RESULTS), f"Result must be one of {', '.join(ASSESSMENT_RESULTS)}")
+    ])
+    # Archived claims count as loaded too, or a feed replaying old claims would file them again
+    return split_new_rows(claims, errors, CLAIM_NATURAL_KEY, existing_keys(
+        with_history("SELECT ContractID, AssessmentDate, ClaimAmount FROM Assessments"), CLAIM_NATURAL_KEY
+    ))
+
+def split_new_rows(rows, errors, key_columns, existing):
+    """Drop invalid rows and rows whose natural key is already loaded (or repeated in the file)"""
+    valid = rows[errors == ""]
+    keys = natural_keys(valid, key_columns)
+    loaded = keys.isin(existing) | keys.duplicated()
+    return valid[~loaded], errors[errors != ""], int(loaded.sum())
+
+def reserve_id_numbers(work, sequence, count):
+    """Take count consecutive numbers from an IdSequences counter; returns the first.
+
+    The counter row stays locked until the chunk commits, so claims and payouts written
+    meanwhile (by the API or the AfterAssessmentInsert trigger) cannot take the same numbers.
+    """
+    work.execute(RESERVE_ID_NUMBERS_QUERY, (count, sequence))
+    return int(work.fetch_value("SELECT LAST_INSERT_ID()")) - count + 1
+
+def ingest_chunks(rows, lock_name, allocate, write_chunk, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Write rows chunk by chunk, each chunk in one transaction, on a dedicated connection.
+
+    allocate(work, chunk) assigns the chunk's IDs; write_chunk(work, chunk) inserts it.
+    A chunk that fails is rolled back and reported for all its rows; the feed can be run
+    again once fixed, since rows already loaded are recognised by their natural key.
+    """
+    loaded = 0
+    errors = {}
+    with unit_of_work(pooled=False) as work:
+        if work.fetch_value("SELECT GET_LOCK(%s, 10)", (lock_name,)) != 1:
+            raise RuntimeError(f"Another {lock_name} is running, please try again later")
+        try:
+            # Lets the triggers skip the per-row work this ingestion does set-based
+            work.execute("SET @bulk_ingest = 1")
+            done = 0
+            for chunk in chunked(rows, chunk_size):
+                try:
+                    chunk = allocate(work, chunk)
+                    write_chunk(work, chunk)
+                    work.commit()
+                    loaded += len(chunk)
+                except Error as e:
+                    work.rollback()
+                    errors.update({index: f"Chunk failed: {e.msg}" for index in chunk.index})
+                done += len(chunk)
+                if progress:
+                    progress(done, len(rows))
+        finally:
+            if work.connection.is_connected():
+                work.execute("SET @bulk_ingest = NULL")
+                work.fetch_value("SELECT RELEASE_LOCK(%s)", (lock_name,))
+    return loaded, pd.Series(errors, dtype=object)
+
+def ingest_contracts(contracts, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Load validated contracts; the BeforeContractInsert trigger still sets expiration and status"""
+    def allocate(work, chunk):
+        first = int(work.fetch_value(LAST_CONTRACT_NUMBER_QUERY)) + 1
+        return chunk.assign(ContractID=format_ids("CT", first, len(chunk)).values)
+
+    def write_chunk(work, chunk):
+        rows = zip(chunk['ContractID'], chunk['CustomerID'], chunk['InsuranceTypeID'], chunk['SignDate'].dt.date)
+        work.execute_many(ADD_CONTRACT_QUERY, rows)
+
+    return ingest_chunks(contracts, "contract_ingest", allocate, write_chunk, chunk_size, progress)
+
+def ingest_claims(claims, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Load validated claims and create their pending payouts with one statement per chunk"""
+    def allocate(work, chunk):
+        first = reserve_id_numbers(work, "Assessments", len(chunk))
+        return chunk.assign(AssessmentID=format_ids("A", first, len(chunk)).values)
+
+    def write_chunk(work, chunk):
+        rows = zip(
+            chunk['AssessmentID'], chunk['ContractID'], chunk['AssessmentDate'].dt.date,
+            chunk['ClaimAmount'].map("{:.2f}".format), chunk['Result']
+        )
+        work.execute_many(ADD_ASSESSMENT_QUERY, rows)
+        first_payout = reserve_id_numbers(work, "Payouts", len(chunk))
+        placeholders = ", ".join(["%s"] * len(chunk))
+        work.execute(CREATE_PAYOUTS_QUERY.format(placeholders=placeholders), (first_payout, *chunk['AssessmentID']))
+
+    return ingest_chunks(claims, "claim_ingest", allocate, write_chunk, chunk_size, progress)
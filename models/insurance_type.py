@@ -1,29 +1,46 @@
 import streamlit as st
 import pandas as pd
 from mysql.connector import Error
-from database.db_connector import get_cached_data, execute_write_query
+from database.db_connector import get_cached_data, get_cached_frame, execute_write_query
+
+# Named queries (checked by database/verify_indexes.py)
+ADD_INSURANCE_TYPE_QUERY = """
+    INSERT INTO InsuranceTypes (InsuranceTypeID, InsuranceName, Description) 
+    VALUES (%s, %s, %s)
+"""
+UPDATE_INSURANCE_TYPE_QUERY = """
+    UPDATE InsuranceTypes 
+    SET InsuranceName = %s, Description = %s
+    WHERE InsuranceTypeID = %s
+"""
+ALL_INSURANCE_TYPES_QUERY = "SELECT * FROM InsuranceTypes"
+INSURANCE_TYPE_BY_ID_QUERY = "SELECT * FROM InsuranceTypes WHERE InsuranceTypeID = %s"
+INSURANCE_TYPES_DROPDOWN_QUERY = "SELECT InsuranceTypeID, InsuranceName FROM InsuranceTypes"
+LAST_INSURANCE_TYPE_ID_QUERY = "SELECT InsuranceTypeID FROM InsuranceTypes ORDER BY InsuranceTypeID DESC LIMIT 1"
+DELETE_INSURANCE_TYPE_QUERY = "DELETE FROM InsuranceTypes WHERE InsuranceTypeID = %s"
 
 def get_all_insurance_types():
     """Get all insurance types from database with caching"""
-    return get_cached_data("SELECT * FROM InsuranceTypes")
+    return get_cached_data(ALL_INSURANCE_TYPES_QUERY)
 
 def get_insurance_type_by_id(type_id):
     """Get a specific insurance type by ID"""
-    result = get_cached_data("SELECT * FROM InsuranceTypes WHERE InsuranceTypeID = %s", (type_id,))
+    result = get_cached_data(INSURANCE_TYPE_BY_ID_QUERY, (type_id,))
     if result and len(result) > 0:
         return result[0]
     return None
 
 def get_insurance_types_dropdown():
     """Get insurance types for dropdown selection"""
-    types = get_cached_data("SELECT InsuranceTypeID, InsuranceName FROM InsuranceTypes")
-    if not types:
+    df = get_cached_frame(INSURANCE_TYPES_DROPDOWN_QUERY)
+    if df.empty:
         return {}
-    return {f"{t['InsuranceTypeID']}: {t['InsuranceName']}": t['InsuranceTypeID'] for t in types}
+    labels = df['InsuranceTypeID'] + ': ' + df['InsuranceName'].astype(str)
+    return dict(zip(labels, df['InsuranceTypeID']))
 
 def generate_next_insurance_type_id():
     """Generate the next insurance type ID"""
-    last_type = get_cached_data("SELECT InsuranceTypeID FROM InsuranceTypes ORDER BY InsuranceTypeID DESC LIMIT 1")
+    last_type = get_cached_data(LAST_INSURANCE_TYPE_ID_QUERY)
     next_id = "T001"  # Default starting ID if no records exist
     
     if last_type and len(last_type) > 0:
@@ -39,24 +56,14 @@ def generate_next_insurance_type_id():
 
 def add_insurance_type(type_id, type_name, description):
     """Add a new insurance type to the database"""
-    query = """
-    INSERT INTO InsuranceTypes (InsuranceTypeID, InsuranceName, Description) 
-    VALUES (%s, %s, %s)
-    """
     data = (type_id, type_name, description)
-    return execute_write_query(query, data)
+    return execute_write_query(ADD_INSURANCE_TYPE_QUERY, data)
 
 def update_insurance_type(type_id, type_name, description):
     """Update an existing insurance type in the database"""
-    query = """
-    UPDATE InsuranceTypes 
-    SET InsuranceName = %s, Description = %s
-    WHERE InsuranceTypeID = %s
-    """
     data = (type_name, description, type_id)
-    return execute_write_query(query, data)
+    return execute_write_query(UPDATE_INSURANCE_TYPE_QUERY, data)
 
 def delete_insurance_type(type_id):
     """Delete an insurance type from the database"""
-    query = "DELETE FROM InsuranceTypes WHERE InsuranceTypeID = %s"
-    return execute_write_query(query, (type_id,))
+    return execute_write_query(DELETE_INSURANCE_TYPE_QUERY, (type_id,))
@@ -1,42 +1,88 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from database.db_connector import create_connection, execute_query, get_cached_data, execute_write_query
+from database.db_connector import create_connection, execute_query, get_cached_data, get_cached_frame, get_arrow_table, execute_write_query, execute_many, on_commit, on_external_write
+from database import async_connector
+from models.archive import with_history
+from utils.formatting import format_currency
 from models.assessment import get_approved_claims
 from mysql.connector import Error
 
-@st.cache_data(ttl=300)
-def get_all_payouts(limit=100, offset=0):
-    """Get all payouts with related information with pagination"""
+# Queries shared by the cached functions and their async variants
+PAYOUTS_QUERY = """
+    SELECT p.PayoutID, p.ContractID, c.CustomerID, cust.CustomerName, 
+           p.PayoutDate, p.Amount, p.Status, t.InsuranceName
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+"""
+PAYOUT_BY_ID_QUERY = PAYOUTS_QUERY + "WHERE p.PayoutID = %s"
+PAYOUTS_PAGE_QUERY = """
+    SELECT p.PayoutID, p.ContractID, cust.CustomerName, 
+           p.PayoutDate, p.Amount, p.Status, t.InsuranceName
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    ORDER BY p.PayoutDate DESC
+    LIMIT %s OFFSET %s
+"""
+PENDING_PAYOUTS_QUERY = """
+    SELECT p.PayoutID, p.ContractID, cust.CustomerName, 
+           p.PayoutDate, p.Amount, p.Status
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    WHERE p.Status = 'Pending'
+    ORDER BY p.PayoutDate
+"""
+# All-time total: the hot payouts plus the running totals of the archived ones (no archive scan)
+APPROVED_PAYOUTS_TOTAL_QUERY = """
+    SELECT (
+        SELECT COALESCE(SUM(Amount), 0) FROM Payouts WHERE Status = 'Approved' OR Status = 'Completed'
+    ) + (
+        SELECT COALESCE(SUM(TotalAmount), 0) FROM PayoutArchiveTotals WHERE Status = 'Approved' OR Status = 'Completed'
+    ) AS total
+"""
+ADD_PAYOUT_QUERY = """
+    INSERT INTO Payouts (PayoutID, ContractID, Amount, PayoutDate, Status) 
+    VALUES (%s, %s, %s, %s, %s)
+"""
+UPDATE_PAYOUT_STATUS_QUERY = """
+    UPDATE Payouts 
+    SET Status = %s
+    WHERE PayoutID = %s
+"""
+# Kept at or above every payout number (archived payouts included) by the BeforePayoutInsert trigger
+LAST_PAYOUT_NUMBER_QUERY = "SELECT LastNumber FROM IdSequences WHERE Name = 'Payouts'"
+# Truy vấn này lấy danh sách các khoản thanh toán để hiển thị trong dropdown.
+# Đã thêm LIMIT để giới hạn số lượng kết quả trả về.
+PAYOUTS_DROPDOWN_QUERY = """
+    SELECT p.PayoutID, cust.CustomerName, p.Amount
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN Customers cust ON c.CustomerID = cust.CustomerID
+    LIMIT 100
+"""
+PAYOUT_COUNTS_BY_STATUS_QUERY = """
+    SELECT Status, COUNT(*) AS count
+    FROM Payouts
+    GROUP BY Status
+"""
+
+def get_all_payouts(limit=100, offset=0, include_history=False):
+    """Get all payouts with related information with pagination (archived ones with include_history)"""
     # Truy vấn này lấy tất cả các khoản thanh toán với thông tin liên quan.
     # Đã thêm LIMIT và OFFSET để hỗ trợ phân trang, giúp giảm tải dữ liệu trả về.
-    query = """
-        SELECT p.PayoutID, p.ContractID, cust.CustomerName, 
-               p.PayoutDate, p.Amount, p.Status, t.InsuranceName
-        FROM Payouts p
-        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        ORDER BY p.PayoutDate DESC
-        LIMIT %s OFFSET %s
-    """
-    return get_cached_data(query, (limit, offset))
+    return get_arrow_table(with_history(PAYOUTS_PAGE_QUERY, include_history), (limit, offset))
 
 @st.cache_data(ttl=300)
 def get_payout_by_id(payout_id):
     """Get a specific payout by ID"""
     # Truy vấn này lấy thông tin chi tiết của một khoản thanh toán dựa trên ID.
     # Chỉ chọn các cột cần thiết để giảm tải dữ liệu không cần thiết.
-    query = """
-        SELECT p.PayoutID, p.ContractID, c.CustomerID, cust.CustomerName,
-               p.PayoutDate, p.Amount, p.Status, t.InsuranceName
-        FROM Payouts p
-        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE p.PayoutID = %s
-    """
-    result = get_cached_data(query, (payout_id,))
+    result = get_cached_data(PAYOUT_BY_ID_QUERY, (payout_id,))
     if result and len(result) > 0:
         return result[0]
     return None
@@ -44,104 +90,69 @@ def get_payout_by_id(payout_id):
 @st.cache_data(ttl=300)
 def get_payouts_dropdown():
     """Get payouts for dropdown selection"""
-    # Truy vấn này lấy danh sách các khoản thanh toán để hiển thị trong dropdown.
-    # Đã thêm LIMIT để giới hạn số lượng kết quả trả về.
-    query = """
-        SELECT p.PayoutID, cust.CustomerName, p.Amount
-        FROM Payouts p
-        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        LIMIT 100
-    """
-    payouts = get_cached_data(query)
-    if not payouts:
+    df = get_cached_frame(PAYOUTS_DROPDOWN_QUERY)
+    if df.empty:
         return {}
-    return {f"{p['PayoutID']}: {p['CustomerName']} - ${float(p['Amount']):,.2f}": p['PayoutID'] for p in payouts}
+    labels = df['PayoutID'] + ': ' + df['CustomerName'].astype(str) + ' - ' + format_currency(df['Amount'])
+    return dict(zip(labels, df['PayoutID']))
 
 @st.cache_data(ttl=300)
 def get_pending_payouts():
     """Get pending payouts"""
-    query = """
-        SELECT p.PayoutID, p.ContractID, cust.CustomerName, 
-               p.PayoutDate, p.Amount, p.Status
-        FROM Payouts p
-        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
-        JOIN Customers cust ON c.CustomerID = cust.CustomerID
-        WHERE p.Status = 'Pending'
-        ORDER BY p.PayoutDate
-    """
-    return get_cached_data(query)
+    return get_cached_frame(PENDING_PAYOUTS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_total_approved_payouts():
-    """Get total amount of approved payouts"""
-    query = """
-        SELECT SUM(Amount) AS total
-        FROM Payouts
-        WHERE Status = 'Approved' OR Status = 'Completed'
-    """
-    result = get_cached_data(query)
+    """Get total amount of approved payouts (archived ones included: it is an all-time total)"""
+    result = get_cached_data(APPROVED_PAYOUTS_TOTAL_QUERY)
     return result[0]['total'] if result and result[0]['total'] else 0
 
 @st.cache_data(ttl=300)
 def get_payout_counts_by_status():
     """Get count of payouts by status"""
-    query = """
-        SELECT Status, COUNT(*) AS count
-        FROM Payouts
-        GROUP BY Status
-    """
-    return get_cached_data(query)
+    return get_cached_data(PAYOUT_COUNTS_BY_STATUS_QUERY)
 
 def generate_next_payout_id():
-    """Generate the next payout ID"""
-    last_payout = get_cached_data("SELECT PayoutID FROM Payouts ORDER BY PayoutID DESC LIMIT 1")
-    next_id = "P001"  # Default starting ID if no records exist
-    
-    if last_payout and len(last_payout) > 0:
-        last_id = last_payout[0]['PayoutID']
-        # Extract the numeric part, increment it, and format it back
-        try:
-            id_num = int(last_id[1:])
-            next_id = f"P{(id_num + 1):03d}"
-        except (ValueError, IndexError):
-            pass  # Use default if parsing fails
-    
-    return next_id
+    """Generate the next payout ID (after the payout counter, archived payouts included)"""
+    last_payout = get_cached_data(LAST_PAYOUT_NUMBER_QUERY)
+    last_number = int(last_payout[0]['LastNumber']) if last_payout else 0
+    return f"P{last_number + 1:03d}"
 
 def add_payout(payout_id, contract_id, amount, payout_date, status="Pending"):
     """Add a new payout to the database"""
-    query = """
-    INSERT INTO Payouts (PayoutID, ContractID, Amount, PayoutDate, Status) 
-    VALUES (%s, %s, %s, %s, %s)
-    """
     data = (payout_id, contract_id, amount, payout_date, status)
-    result = execute_write_query(query, data)
+    result = execute_write_query(ADD_PAYOUT_QUERY, data)
     
     # Clear cache for payout-related functions
-    clear_payout_cache()
+    on_commit(clear_payout_cache)
     
     return result
 
 def update_payout_status(payout_id, status):
     """Update a payout's status in the database"""
-    query = """
-    UPDATE Payouts 
-    SET Status = %s
-    WHERE PayoutID = %s
-    """
     data = (status, payout_id)
-    result = execute_write_query(query, data)
+    result = execute_write_query(UPDATE_PAYOUT_STATUS_QUERY, data)
+    
+    # Clear cache for payout-related functions
+    on_commit(clear_payout_cache)
+    
+    return result
+
+def update_payout_statuses(payout_ids, status):
+    """Set the same status on several payouts in one batch.
+
+    Returns the number of payouts updated, or None on error.
+    """
+    data = [(status, payout_id) for payout_id in payout_ids]
+    result = execute_many(UPDATE_PAYOUT_STATUS_QUERY, data)
     
     # Clear cache for payout-related functions
-    clear_payout_cache()
+    on_commit(clear_payout_cache)
     
     return result
 
 def clear_payout_cache():
     """Clear all cached payout data"""
-    if hasattr(get_all_payouts, 'clear'):
-        get_all_payouts.clear()
     if hasattr(get_payout_by_id, 'clear'):
         get_payout_by_id.clear()
     if hasattr(get_payouts_dropdown, 'clear'):
@@ -151,4 +162,46 @@ def clear_payout_cache():
     if hasattr(get_total_approved_payouts, 'clear'):
         get_total_approved_payouts.clear()
     if hasattr(get_payout_counts_by_status, 'clear'):
-        get_payout_counts_by_status.clear()
\ No newline at end of file
+        get_payout_counts_by_status.clear()
+
+# Also cleared after writes the API makes in its own process
+on_external_write('payouts', clear_payout_cache)
+
+# Async variants for callers running on an event loop (not cached: they read the database)
+async def get_all_payouts_async(limit=100, offset=0, include_history=False):
+    """Get all payouts with related information with pagination (archived ones with include_history)"""
+    query = with_history(PAYOUTS_QUERY + "ORDER BY p.PayoutDate DESC LIMIT %s OFFSET %s", include_history)
+    return await async_connector.fetch(query, (limit, offset))
+
+async def list_payouts_async(after=None, limit=100, status=None, contract_id=None):
+    """Get a page of payouts ordered by ID, starting after the given payout ID"""
+    conditions, params = [], []
+    if after:
+        conditions.append("p.PayoutID > %s")
+        params.append(after)
+    if status:
+        conditions.append("p.Status = %s")
+        params.append(status)
+    if contract_id:
+        conditions.append("p.ContractID = %s")
+        params.append(contract_id)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    return await async_connector.fetch(
+        PAYOUTS_QUERY + where + "ORDER BY p.PayoutID LIMIT %s",
+        (*params, limit)
+    )
+
+async def get_payout_by_id_async(payout_id):
+    """Get a specific payout by ID"""
+    return await async_connector.fetch_one(PAYOUT_BY_ID_QUERY, (payout_id,))
+
+async def add_payout_async(payout_id, contract_id, amount, payout_date, status="Pending"):
+    """Add a new payout to the database"""
+    await async_connector.execute(ADD_PAYOUT_QUERY, (payout_id, contract_id, amount, payout_date, status))
+    await async_connector.mark_changed('payouts')
+
+async def update_payout_status_async(payout_id, status):
+    """Update a payout's status; returns whether the payout exists"""
+    updated = await async_connector.execute(UPDATE_PAYOUT_STATUS_QUERY, (status, payout_id))
+    await async_connector.mark_changed('payouts')
+    return updated > 0
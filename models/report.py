@@ -1,234 +1,280 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.db_connector import get_cached_data
+from database.db_connector import get_cached_data, stream_query, ARROW_BATCH_SIZE
+from database.olap import get_report_frame, get_report_rows
+from models.archive import with_history
+
+# Named queries (checked by database/verify_indexes.py); run on MySQL or the DuckDB replica
+CONTRACTS_BY_TYPE_QUERY = """
+    SELECT t.InsuranceName, COUNT(*) as Count
+    FROM InsuranceContracts c
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    GROUP BY t.InsuranceName
+"""
+CONTRACTS_BY_STATUS_QUERY = """
+    SELECT Status, COUNT(*) as Count
+    FROM InsuranceContracts
+    GROUP BY Status
+"""
+CONTRACTS_BY_MONTH_QUERY = """
+    SELECT DATE_FORMAT(SignDate, '%Y-%m') as Month, COUNT(*) as Count
+    FROM InsuranceContracts
+    GROUP BY DATE_FORMAT(SignDate, '%Y-%m')
+    ORDER BY Month
+"""
+ACTIVE_CONTRACTS_SUMMARY_QUERY = """
+    SELECT 
+        COUNT(*) as TotalActive,
+        SUM(CASE WHEN ExpirationDate <= DATE_ADD(CURDATE(), INTERVAL 30 DAY) THEN 1 ELSE 0 END) as ExpiringIn30Days,
+        MIN(ExpirationDate) as EarliestExpiration,
+        MAX(ExpirationDate) as LatestExpiration
+    FROM InsuranceContracts
+    WHERE Status = 'Active'
+"""
+CLAIMS_BY_STATUS_QUERY = """
+    SELECT Result, COUNT(*) as Count
+    FROM Assessments
+    GROUP BY Result
+"""
+CLAIMS_BY_TYPE_QUERY = """
+    SELECT t.InsuranceName, COUNT(*) as Count
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    GROUP BY t.InsuranceName
+"""
+CLAIM_AMOUNTS_BY_TYPE_QUERY = """
+    SELECT t.InsuranceName, SUM(a.ClaimAmount) as TotalAmount, AVG(a.ClaimAmount) as AverageAmount
+    FROM Assessments a
+    JOIN InsuranceContracts c ON a.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    GROUP BY t.InsuranceName
+"""
+CLAIMS_BY_MONTH_QUERY = """
+    SELECT DATE_FORMAT(AssessmentDate, '%Y-%m') as Month, COUNT(*) as Count
+    FROM Assessments
+    GROUP BY DATE_FORMAT(AssessmentDate, '%Y-%m')
+    ORDER BY Month
+"""
+CLAIMS_METRICS_QUERY = """
+    SELECT 
+        COUNT(*) as TotalClaims,
+        SUM(CASE WHEN Result = 'Approved' THEN 1 ELSE 0 END) as ApprovedClaims,
+        SUM(CASE WHEN Result = 'Rejected' THEN 1 ELSE 0 END) as RejectedClaims,
+        SUM(CASE WHEN Result = 'Pending' THEN 1 ELSE 0 END) as PendingClaims,
+        AVG(ClaimAmount) as AverageClaimAmount,
+        MAX(ClaimAmount) as MaximumClaimAmount
+    FROM Assessments
+"""
+PAYOUTS_BY_TYPE_QUERY = """
+    SELECT t.InsuranceName, COUNT(*) as Count, SUM(p.Amount) as TotalAmount
+    FROM Payouts p
+    JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+    JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+    WHERE p.Status = 'Approved' OR p.Status = 'Completed'
+    GROUP BY t.InsuranceName
+"""
+PAYOUTS_BY_MONTH_QUERY = """
+    SELECT DATE_FORMAT(PayoutDate, '%Y-%m') as Month, SUM(Amount) as TotalAmount
+    FROM Payouts
+    WHERE Status = 'Approved' OR Status = 'Completed'
+    GROUP BY DATE_FORMAT(PayoutDate, '%Y-%m')
+    ORDER BY Month
+"""
+PAYOUTS_BY_STATUS_QUERY = """
+    SELECT Status, COUNT(*) as Count, SUM(Amount) as TotalAmount
+    FROM Payouts
+    GROUP BY Status
+"""
+PAYOUT_METRICS_QUERY = """
+    SELECT 
+        COUNT(*) as TotalPayouts,
+        SUM(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE 0 END) as TotalApprovedAmount,
+        AVG(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE NULL END) as AveragePayoutAmount,
+        MAX(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE NULL END) as MaximumPayoutAmount
+    FROM Payouts
+"""
+TOP_CUSTOMERS_BY_CONTRACTS_QUERY = """
+    SELECT cust.CustomerName, COUNT(c.ContractID) as ContractCount
+    FROM Customers cust
+    LEFT JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
+    GROUP BY cust.CustomerID, cust.CustomerName
+    ORDER BY ContractCount DESC
+    LIMIT 10
+"""
+TOP_CUSTOMERS_BY_PAYOUT_QUERY = """
+    SELECT cust.CustomerName, SUM(p.Amount) as TotalPayoutAmount
+    FROM Customers cust
+    JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
+    JOIN Payouts p ON c.ContractID = p.ContractID
+    WHERE p.Status = 'Approved' OR p.Status = 'Completed'
+    GROUP BY cust.CustomerID, cust.CustomerName
+    ORDER BY TotalPayoutAmount DESC
+    LIMIT 10
+"""
+TOP_CUSTOMERS_BY_CLAIMS_QUERY = """
+    SELECT cust.CustomerName, COUNT(a.AssessmentID) as ClaimCount
+    FROM Customers cust
+    JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
+    JOIN Assessments a ON c.ContractID = a.ContractID
+    GROUP BY cust.CustomerID, cust.CustomerName
+    ORDER BY ClaimCount DESC
+    LIMIT 10
+"""
+CUSTOMER_OVERVIEW_QUERY = """
+    SELECT 
+        COUNT(DISTINCT cust.CustomerID) as TotalCustomers,
+        AVG(contracts.ContractCount) as AvgContractsPerCustomer,
+        AVG(IFNULL(claims.ClaimCount, 0)) as AvgClaimsPerCustomer,
+        AVG(IFNULL(payouts.PayoutAmount, 0)) as AvgPayoutPerCustomer
+    FROM 
+        Customers cust
+        LEFT JOIN (
+            SELECT CustomerID, COUNT(ContractID) as ContractCount
+            FROM InsuranceContracts
+            GROUP BY CustomerID
+        ) contracts ON cust.CustomerID = contracts.CustomerID
+        LEFT JOIN (
+            SELECT c.CustomerID, COUNT(a.AssessmentID) as ClaimCount
+            FROM Customers c
+            JOIN InsuranceContracts ic ON c.CustomerID = ic.CustomerID
+            JOIN Assessments a ON ic.ContractID = a.ContractID
+            GROUP BY c.CustomerID
+        ) claims ON cust.CustomerID = claims.CustomerID
+        LEFT JOIN (
+            SELECT c.CustomerID, SUM(p.Amount) as PayoutAmount
+            FROM Customers c
+            JOIN InsuranceContracts ic ON c.CustomerID = ic.CustomerID
+            JOIN Payouts p ON ic.ContractID = p.ContractID
+            WHERE p.Status = 'Approved' OR p.Status = 'Completed'
+            GROUP BY c.CustomerID
+        ) payouts ON cust.CustomerID = payouts.CustomerID
+"""
 
 @st.cache_data(ttl=300)
 def get_contracts_by_type():
     """Get contracts by insurance type for reporting"""
-    query = """
-        SELECT t.InsuranceName, COUNT(*) as Count
-        FROM InsuranceContracts c
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        GROUP BY t.InsuranceName
-    """
-    return get_cached_data(query)
+    return get_report_frame(CONTRACTS_BY_TYPE_QUERY)
 
 @st.cache_data(ttl=300)
 def get_contracts_by_status():
     """Get contracts by status for reporting"""
-    query = """
-        SELECT Status, COUNT(*) as Count
-        FROM InsuranceContracts
-        GROUP BY Status
-    """
-    return get_cached_data(query)
+    return get_report_frame(CONTRACTS_BY_STATUS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_contracts_by_month():
     """Get contracts by month for reporting"""
-    query = """
-        SELECT DATE_FORMAT(SignDate, '%Y-%m') as Month, COUNT(*) as Count
-        FROM InsuranceContracts
-        GROUP BY DATE_FORMAT(SignDate, '%Y-%m')
-        ORDER BY Month
-    """
-    return get_cached_data(query)
+    return get_report_frame(CONTRACTS_BY_MONTH_QUERY)
 
 @st.cache_data(ttl=300)
 def get_active_contracts_summary():
     """Get summary of active contracts"""
-    query = """
-        SELECT 
-            COUNT(*) as TotalActive,
-            SUM(CASE WHEN ExpirationDate <= DATE_ADD(CURDATE(), INTERVAL 30 DAY) THEN 1 ELSE 0 END) as ExpiringIn30Days,
-            MIN(ExpirationDate) as EarliestExpiration,
-            MAX(ExpirationDate) as LatestExpiration
-        FROM InsuranceContracts
-        WHERE Status = 'Active'
-    """
-    return get_cached_data(query)
+    return get_report_rows(ACTIVE_CONTRACTS_SUMMARY_QUERY)
 
 @st.cache_data(ttl=300)
-def get_claims_by_status():
+def get_claims_by_status(include_history=False):
     """Get claims by status for reporting"""
-    query = """
-        SELECT Result, COUNT(*) as Count
-        FROM Assessments
-        GROUP BY Result
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(CLAIMS_BY_STATUS_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_claims_by_type():
+def get_claims_by_type(include_history=False):
     """Get claims by insurance type for reporting"""
-    query = """
-        SELECT t.InsuranceName, COUNT(*) as Count
-        FROM Assessments a
-        JOIN InsuranceContracts c ON a.ContractID = c.ContractID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        GROUP BY t.InsuranceName
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(CLAIMS_BY_TYPE_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_claim_amounts_by_type():
+def get_claim_amounts_by_type(include_history=False):
     """Get claim amounts by insurance type"""
-    query = """
-        SELECT t.InsuranceName, SUM(a.ClaimAmount) as TotalAmount, AVG(a.ClaimAmount) as AverageAmount
-        FROM Assessments a
-        JOIN InsuranceContracts c ON a.ContractID = c.ContractID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        GROUP BY t.InsuranceName
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(CLAIM_AMOUNTS_BY_TYPE_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_claims_by_month():
+def get_claims_by_month(include_history=False):
     """Get claims by month for reporting"""
-    query = """
-        SELECT DATE_FORMAT(AssessmentDate, '%Y-%m') as Month, COUNT(*) as Count
-        FROM Assessments
-        GROUP BY DATE_FORMAT(AssessmentDate, '%Y-%m')
-        ORDER BY Month
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(CLAIMS_BY_MONTH_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_claims_metrics():
+def get_claims_metrics(include_history=False):
     """Get overall claims metrics"""
-    query = """
-        SELECT 
-            COUNT(*) as TotalClaims,
-            SUM(CASE WHEN Result = 'Approved' THEN 1 ELSE 0 END) as ApprovedClaims,
-            SUM(CASE WHEN Result = 'Rejected' THEN 1 ELSE 0 END) as RejectedClaims,
-            SUM(CASE WHEN Result = 'Pending' THEN 1 ELSE 0 END) as PendingClaims,
-            AVG(ClaimAmount) as AverageClaimAmount,
-            MAX(ClaimAmount) as MaximumClaimAmount
-        FROM Assessments
-    """
-    return get_cached_data(query)
+    return get_report_rows(with_history(CLAIMS_METRICS_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_payouts_by_type():
+def get_payouts_by_type(include_history=False):
     """Get payouts by insurance type for reporting"""
-    query = """
-        SELECT t.InsuranceName, COUNT(*) as Count, SUM(p.Amount) as TotalAmount
-        FROM Payouts p
-        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
-        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
-        WHERE p.Status = 'Approved' OR p.Status = 'Completed'
-        GROUP BY t.InsuranceName
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(PAYOUTS_BY_TYPE_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_payouts_by_month():
+def get_payouts_by_month(include_history=False):
     """Get payouts by month for reporting"""
-    query = """
-        SELECT DATE_FORMAT(PayoutDate, '%Y-%m') as Month, SUM(Amount) as TotalAmount
-        FROM Payouts
-        WHERE Status = 'Approved' OR Status = 'Completed'
-        GROUP BY DATE_FORMAT(PayoutDate, '%Y-%m')
-        ORDER BY Month
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(PAYOUTS_BY_MONTH_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_payouts_by_status():
+def get_payouts_by_status(include_history=False):
     """Get payouts by status for reporting"""
-    query = """
-        SELECT Status, COUNT(*) as Count, SUM(Amount) as TotalAmount
-        FROM Payouts
-        GROUP BY Status
-    """
-    return get_cached_data(query)
+    return get_report_frame(with_history(PAYOUTS_BY_STATUS_QUERY, include_history))
 
 @st.cache_data(ttl=300)
-def get_payout_metrics():
+def get_payout_metrics(include_history=False):
     """Get overall payout metrics"""
-    query = """
-        SELECT 
-            COUNT(*) as TotalPayouts,
-            SUM(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE 0 END) as TotalApprovedAmount,
-            AVG(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE NULL END) as AveragePayoutAmount,
-            MAX(CASE WHEN Status = 'Approved' OR Status = 'Completed' THEN Amount ELSE NULL END) as MaximumPayoutAmount
-        FROM Payouts
-    """
-    return get_cached_data(query)
+    return get_report_rows(with_history(PAYOUT_METRICS_QUERY, include_history))
 
 @st.cache_data(ttl=300)
 def get_top_customers_by_contracts():
     """Get top customers by number of contracts"""
-    query = """
-        SELECT cust.CustomerName, COUNT(c.ContractID) as ContractCount
-        FROM Customers cust
-        LEFT JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
-        GROUP BY cust.CustomerID
-        ORDER BY ContractCount DESC
-        LIMIT 10
-    """
-    return get_cached_data(query)
+    return get_report_frame(TOP_CUSTOMERS_BY_CONTRACTS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_top_customers_by_payout():
     """Get top customers by total payout amount"""
-    query = """
-        SELECT cust.CustomerName, SUM(p.Amount) as TotalPayoutAmount
-        FROM Customers cust
-        JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
-        JOIN Payouts p ON c.ContractID = p.ContractID
-        WHERE p.Status = 'Approved' OR p.Status = 'Completed'
-        GROUP BY cust.CustomerID
-        ORDER BY TotalPayoutAmount DESC
-        LIMIT 10
-    """
-    return get_cached_data(query)
+    return get_report_frame(TOP_CUSTOMERS_BY_PAYOUT_QUERY)
 
 @st.cache_data(ttl=300)
 def get_top_customers_by_claims():
     """Get top customers by number of claims"""
-    query = """
-        SELECT cust.CustomerName, COUNT(a.AssessmentID) as ClaimCount
-        FROM Customers cust
-        JOIN InsuranceContracts c ON cust.CustomerID = c.CustomerID
-        JOIN Assessments a ON c.ContractID = a.ContractID
-        GROUP BY cust.CustomerID
-        ORDER BY ClaimCount DESC
-        LIMIT 10
-    """
-    return get_cached_data(query)
+    return get_report_frame(TOP_CUSTOMERS_BY_CLAIMS_QUERY)
 
 @st.cache_data(ttl=300)
 def get_customer_overview():
     """Get customer overview metrics"""
-    query = """
-        SELECT 
-            COUNT(DISTINCT cust.CustomerID) as TotalCustomers,
-            AVG(contracts.ContractCount) as AvgContractsPerCustomer,
-            AVG(IFNULL(claims.ClaimCount, 0)) as AvgClaimsPerCustomer,
-            AVG(IFNULL(payouts.PayoutAmount, 0)) as AvgPayoutPerCustomer
-        FROM 
-            Customers cust
-            LEFT JOIN (
-                SELECT CustomerID, COUNT(ContractID) as ContractCount
-                FROM InsuranceContracts
-                GROUP BY CustomerID
-            ) contracts ON cust.CustomerID = contracts.CustomerID
-            LEFT JOIN (
-                SELECT c.CustomerID, COUNT(a.AssessmentID) as ClaimCount
-                FROM Customers c
-                JOIN InsuranceContracts ic ON c.CustomerID = ic.CustomerID
-                JOIN Assessments a ON ic.ContractID = a.ContractID
-                GROUP BY c.CustomerID
-            ) claims ON cust.CustomerID = claims.CustomerID
-            LEFT JOIN (
-                SELECT c.CustomerID, SUM(p.Amount) as PayoutAmount
-                FROM Customers c
-                JOIN InsuranceContracts ic ON c.CustomerID = ic.CustomerID
-                JOIN Payouts p ON ic.ContractID = p.ContractID
-                WHERE p.Status = 'Approved' OR p.Status = 'Completed'
-                GROUP BY c.CustomerID
-            ) payouts ON cust.CustomerID = payouts.CustomerID
+    return get_report_rows(CUSTOMER_OVERVIEW_QUERY)
+
+# Row-level datasets for full exports (streamed from the database, never cached)
+EXPORT_QUERIES = {
+    "Contracts": """
+        SELECT c.ContractID, c.CustomerID, cust.CustomerName, c.InsuranceTypeID,
+               t.InsuranceName, c.SignDate, c.ExpirationDate, c.Status
+        FROM InsuranceContracts c
+        JOIN Customers cust ON c.CustomerID = cust.CustomerID
+        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+        ORDER BY c.ContractID
+    """,
+    "Assessments": """
+        SELECT a.AssessmentID, a.ContractID, c.CustomerID, c.CustomerName,
+               a.AssessmentDate, a.ClaimAmount, a.Result
+        FROM Assessments a
+        JOIN InsuranceContracts ic ON a.ContractID = ic.ContractID
+        JOIN Customers c ON ic.CustomerID = c.CustomerID
+        ORDER BY a.AssessmentID
+    """,
+    "Payouts": """
+        SELECT p.PayoutID, p.ContractID, cust.CustomerName,
+               p.PayoutDate, p.Amount, p.Status, t.InsuranceName
+        FROM Payouts p
+        JOIN InsuranceContracts c ON p.ContractID = c.ContractID
+        JOIN Customers cust ON c.CustomerID = cust.CustomerID
+        JOIN InsuranceTypes t ON c.InsuranceTypeID = t.InsuranceTypeID
+        ORDER BY p.PayoutID
     """
-    return get_cached_data(query)
+}
+# The same datasets with the archived (closed, older) claims and payouts
+EXPORT_QUERIES["Assessments History"] = with_history(EXPORT_QUERIES["Assessments"])
+EXPORT_QUERIES["Payouts History"] = with_history(EXPORT_QUERIES["Payouts"])
+
+def stream_export(dataset, batch_size=ARROW_BATCH_SIZE):
+    """Stream a full export dataset as Arrow record batches"""
+    return stream_query(EXPORT_QUERIES[dataset], batch_size=batch_size)
+
+def count_export_rows(dataset):
+    """Number of rows in a full export dataset"""
+    query = f"SELECT COUNT(*) AS RowCount FROM ({EXPORT_QUERIES[dataset]}) AS export"
+    result = get_cached_data(query)
+    return int(result[0]['RowCount']) if result else None
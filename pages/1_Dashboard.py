@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.db_connector import create_connection
+from database.db_connector import create_connection, fetch_concurrently, sync_external_writes
+from utils.formatting import display_table
 from models.dashboard import (
     get_dashboard_metrics, 
     get_recent_contracts,
@@ -31,13 +32,30 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
 # Display refresh button
 if st.button("🔄 Refresh Data"):
     st.cache_data.clear()
-    st.experimental_rerun()
+    st.rerun()
 
-# Get metrics
-metrics = get_dashboard_metrics()
+# The dashboard queries are independent: run them in parallel instead of one after another
+(
+    metrics,
+    expiring_count,
+    recent_contracts,
+    recent_claims,
+    contracts_by_status,
+    claims_by_type
+) = fetch_concurrently(
+    get_dashboard_metrics,
+    get_expiring_contracts_count,
+    lambda: get_recent_contracts(5),
+    lambda: get_recent_claims(5),
+    get_contracts_by_status,
+    get_claims_by_type
+)
 
 # Display metrics in columns
 col1, col2, col3, col4 = st.columns(4)
@@ -55,35 +73,26 @@ def format_currency(value):
 col4.metric("Total Payouts", format_currency(metrics['total_payouts']))
 
 # Display important alerts
-expiring_count = get_expiring_contracts_count()
 if expiring_count > 0:
     st.warning(f"⚠️ {expiring_count} contracts are expiring in the next 30 days. Check the Contract Management page.")
 
 # Display recent contracts
 st.subheader("Recent Contracts")
-recent_contracts = get_recent_contracts(5)
 if recent_contracts:
-    df = pd.DataFrame(recent_contracts)
-    df['SignDate'] = pd.to_datetime(df['SignDate']).dt.strftime('%Y-%m-%d')
-    st.dataframe(df[['ContractID', 'CustomerName', 'InsuranceName', 'SignDate', 'Status']], use_container_width=True)
+    display_table(recent_contracts, ['ContractID', 'CustomerName', 'InsuranceName', 'SignDate', 'Status'])
 else:
     st.info("No recent contracts found.")
 
 # Display recent claims
 st.subheader("Recent Claims")
-recent_claims = get_recent_claims(5)
 if recent_claims:
-    df = pd.DataFrame(recent_claims)
-    df['AssessmentDate'] = pd.to_datetime(df['AssessmentDate']).dt.strftime('%Y-%m-%d')
-    df['ClaimAmount'] = df['ClaimAmount'].apply(lambda x: f"${x:,.2f}")
-    st.dataframe(df[['AssessmentID', 'CustomerName', 'AssessmentDate', 'ClaimAmount', 'Result']], use_container_width=True)
+    display_table(recent_claims, ['AssessmentID', 'CustomerName', 'AssessmentDate', 'ClaimAmount', 'Result'])
 else:
     st.info("No recent claims found.")
 
 # Display contracts by status
 st.subheader("Contracts by Status")
-contracts_by_status = get_contracts_by_status()
-if contracts_by_status:
+if not contracts_by_status.empty:
     df = pd.DataFrame(contracts_by_status)
     fig = px.bar(df, x='Status', y='Count', title='Contract Status Distribution')
     st.plotly_chart(fig, use_container_width=True)
@@ -92,8 +101,7 @@ else:
 
 # Display claims by insurance type
 st.subheader("Claims by Insurance Type")
-claims_by_type = get_claims_by_type()
-if claims_by_type:
+if not claims_by_type.empty:
     df = pd.DataFrame(claims_by_type)
     fig = px.pie(df, values='ClaimCount', names='InsuranceName', title='Claims Distribution by Insurance Type')
     st.plotly_chart(fig, use_container_width=True)
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
-from database.db_connector import create_connection
+from database.db_connector import create_connection, sync_external_writes
+from utils.formatting import display_table
+from utils.bulk_import import IMPORT_FILE_TYPES, read_upload, error_report
 from models.customer import (
     get_all_customers,  
     get_customer_by_id,
@@ -8,9 +10,13 @@ from models.customer import (
     generate_next_customer_id,
     add_customer,
     update_customer,
-    delete_customer
+    delete_customer,
+    search_customers,
+    get_customer_360,
+    prepare_customer_import,
+    import_customers,
+    CUSTOMER_IMPORT_COLUMNS
 )
-from models.contract import get_contracts_by_customer
 
 # Check the curent user role if they are allowed to access this page
 if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
@@ -35,6 +41,9 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
 # Initialize session state for success messages
 if 'customer_added' not in st.session_state:
     st.session_state.customer_added = False
@@ -44,83 +53,84 @@ if 'customer_deleted' not in st.session_state:
     st.session_state.customer_deleted = False
 if 'show_success' not in st.session_state:
     st.session_state.show_success = False
+if 'customer_import_run' not in st.session_state:
+    st.session_state.customer_import_run = 0
 
-# Create tabs
-tab1, tab2, tab3 = st.tabs(["View Customers", "Add Customer", "Edit Customer"])
+# Page sections are fragments: interacting with a widget inside one only reruns
+# that section instead of the whole script (and the full customers table).
+# Successful writes still call st.rerun() so every table picks up the change.
 
-# View Customers Tab
-with tab1:
-    st.subheader("All Customers")
+@st.fragment
+def customer_search_panel():
+    """Search box over customer names, addresses, phone numbers and IDs"""
+    term = st.text_input(
+        "Search customers",
+        placeholder="Name, address, phone number or customer ID",
+        key="customer_search"
+    )
+    if term.strip():
+        matches = search_customers(term)
+        if matches:
+            st.dataframe(pd.DataFrame(matches), use_container_width=True, hide_index=True)
+        else:
+            st.info(f"No customers match '{term.strip()}'.")
+
+@st.fragment
+def customer_details_panel():
+    """Show a selected customer with their contracts, claims and payouts"""
+    # Get customer dropdown options
+    customer_options = get_customers_dropdown()
+    selected_customer = st.selectbox(
+        "Select a customer to view details:",
+        options=list(customer_options.keys())
+    )
     
-    # Show success messages if redirected from other tabs
-    if st.session_state.show_success:
-        if st.session_state.customer_added:
-            st.success("Customer added successfully!")
-            st.session_state.customer_added = False
-        elif st.session_state.customer_updated:
-            st.success("Customer updated successfully!")
-            st.session_state.customer_updated = False
-        elif st.session_state.customer_deleted:
-            st.success("Customer deleted successfully!")
-            st.session_state.customer_deleted = False
-        
-        # Reset the success flag after showing
-        st.session_state.show_success = False
+    if selected_customer:
+        customer_id = customer_options[selected_customer]
+        # Customer, contracts, claims and payouts in one batch
+        profile = get_customer_360(customer_id)
     
-    # Refresh button
-    if st.button("🔄 Refresh", key="refresh_customers"):
-        st.cache_data.clear()
-        st.rerun()
+        if profile:
+            customer = profile['customer']
+            col1, col2 = st.columns(2)
     
-    # Get and display customers
-    customers = get_all_customers()
-    if customers:
-        df = pd.DataFrame(customers)
-        st.dataframe(df, use_container_width=True)
-        
-        # Customer details section
-        st.subheader("Customer Details")
-        
-        # Get customer dropdown options
-        customer_options = get_customers_dropdown()
-        selected_customer = st.selectbox(
-            "Select a customer to view details:",
-            options=list(customer_options.keys())
-        )
-        
-        if selected_customer:
-            customer_id = customer_options[selected_customer]
-            customer = get_customer_by_id(customer_id)
-            
-            if customer:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown(f"**Customer ID:** {customer['CustomerID']}")
-                    st.markdown(f"**Name:** {customer['CustomerName']}")
-                    st.markdown(f"**Phone:** {customer['PhoneNumber']}")
-                    st.markdown(f"**Address:** {customer['Address']}")
-                
-                with col2:
-                    # Show contracts for this customer
-                    contracts = get_contracts_by_customer(customer_id)
-                    if contracts:
-                        st.markdown("**Contracts:**")
-                        df_contracts = pd.DataFrame(contracts)
-                        if 'SignDate' in df_contracts.columns:
-                            df_contracts['SignDate'] = pd.to_datetime(df_contracts['SignDate']).dt.strftime('%Y-%m-%d')
-                        if 'ExpirationDate' in df_contracts.columns:
-                            df_contracts['ExpirationDate'] = pd.to_datetime(df_contracts['ExpirationDate']).dt.strftime('%Y-%m-%d')
-                        st.dataframe(df_contracts, use_container_width=True)
-                    else:
-                        st.info("No contracts found for this customer.")
-    else:
-        st.info("No customers found in the database.")
-
-# Add Customer Tab
-with tab2:
-    st.subheader("Add New Customer")
+            with col1:
+                st.markdown(f"**Customer ID:** {customer['CustomerID']}")
+                st.markdown(f"**Name:** {customer['CustomerName']}")
+                st.markdown(f"**Phone:** {customer['PhoneNumber']}")
+                st.markdown(f"**Address:** {customer['Address']}")
+    
+            with col2:
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Active Contracts", f"{sum(c['Status'] == 'Active' for c in profile['contracts'])} / {len(profile['contracts'])}")
+                m2.metric("Total Claimed", f"${sum(a['ClaimAmount'] or 0 for a in profile['claims']):,.2f}")
+                m3.metric("Total Paid Out", f"${sum(p['Amount'] or 0 for p in profile['payouts'] if p['Status'] == 'Completed'):,.2f}")
     
+            contracts_tab, claims_tab, payouts_tab = st.tabs([
+                f"Contracts ({len(profile['contracts'])})",
+                f"Claims ({len(profile['claims'])})",
+                f"Payouts ({len(profile['payouts'])})"
+            ])
+            st.caption("Claims and payouts closed more than 3 years ago are archived and not shown here.")
+            with contracts_tab:
+                if profile['contracts']:
+                    display_table(profile['contracts'])
+                else:
+                    st.info("No contracts found for this customer.")
+            with claims_tab:
+                if profile['claims']:
+                    display_table(profile['claims'])
+                else:
+                    st.info("No claims found for this customer.")
+            with payouts_tab:
+                if profile['payouts']:
+                    display_table(profile['payouts'])
+                else:
+                    st.info("No payouts found for this customer.")
+
+@st.fragment
+def add_customer_form():
+    """Form to add a new customer"""
     with st.form("add_customer_form"):
         # Auto-generate customer ID
         next_id = generate_next_customer_id()
@@ -143,18 +153,10 @@ with tab2:
                     st.error("Failed to add customer. Please try again.")
             else:
                 st.error("Please fill in all required fields.")
-    
-    # show success message if customer was just added and clear the form
-    if st.session_state.customer_added:
-        st.success("Customer added successfully!")
-        st.session_state.customer_added = False
-        st.session_state.show_success = True
 
-
-# Edit Customer Tab
-with tab3:
-    st.subheader("Edit Customer")
-    
+@st.fragment
+def edit_customer_panel():
+    """Customer selector with the edit form and delete confirmation"""
     # Get all customers for selection
     customer_options = get_customers_dropdown()
     if customer_options:
@@ -219,3 +221,153 @@ with tab3:
                             st.rerun()
     else:
         st.info("No customers found in the database.")
+
+def show_rejected_rows(raw, errors):
+    """Rows of an import file that were not imported, with the reasons and a CSV download"""
+    if len(errors):
+        st.warning(f"{len(errors):,} rows were not imported.")
+        report = error_report(raw, errors)
+        st.dataframe(report.head(100), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download Rejected Rows",
+            report.to_csv(index=False),
+            file_name="customer_import_errors.csv",
+            mime="text/csv"
+        )
+
+@st.fragment
+def import_customers_panel():
+    """Upload a CSV / Excel file of customers, validate it and import the valid rows"""
+    st.caption(
+        f"Columns: {', '.join(CUSTOMER_IMPORT_COLUMNS)} (header names are matched without case or spaces). "
+        "Customer IDs are assigned automatically."
+    )
+    # Each import gets a new uploader key, which empties the uploader once its file is imported
+    uploaded = st.file_uploader(
+        "Customer file",
+        type=IMPORT_FILE_TYPES,
+        key=f"customer_import_file_{st.session_state.customer_import_run}"
+    )
+    if not uploaded:
+        # Outcome of the last import, until another file is uploaded
+        result = st.session_state.get('customer_import_result')
+        if result:
+            message, raw, errors = result
+            st.success(message)
+            show_rejected_rows(raw, errors)
+        return
+    st.session_state.pop('customer_import_result', None)
+    
+    # Validated once per uploaded file: the duplicate check reads every customer, so widget
+    # interactions (which rerun this fragment) reuse the result
+    prepared = st.session_state.get('customer_import_prepared')
+    if prepared is None or prepared[0] != uploaded.file_id:
+        try:
+            raw = read_upload(uploaded)
+            customers, errors = prepare_customer_import(raw)
+        except ValueError as e:
+            st.error(f"Could not read the file: {e}")
+            return
+        except RuntimeError as e:
+            st.error(str(e))
+            return
+        prepared = st.session_state.customer_import_prepared = (uploaded.file_id, raw, customers, errors)
+    _, raw, customers, errors = prepared
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rows in File", f"{len(raw):,}")
+    col2.metric("Valid Rows", f"{len(customers):,}")
+    col3.metric("Rejected Rows", f"{len(errors):,}")
+    if len(customers):
+        st.dataframe(customers.head(20), use_container_width=True, hide_index=True)
+    
+    if st.button(f"Import {len(customers):,} Customers", disabled=customers.empty, key="run_customer_import"):
+        progress = st.progress(0.0, text="Importing customers...")
+        try:
+            imported, insert_errors = import_customers(
+                customers,
+                progress=lambda done, total: progress.progress(done / total, text=f"Imported {done:,} of {total:,} rows")
+            )
+        except RuntimeError as e:
+            st.error(str(e))
+            return
+        errors = pd.concat([errors, insert_errors]).sort_index()
+        message = (
+            f"Imported {len(imported):,} customers ({imported['CustomerID'].iloc[0]} to {imported['CustomerID'].iloc[-1]})."
+            if len(imported) else "No customers were imported."
+        )
+        # Keep the outcome, empty the uploader (its file must not be validated again) and
+        # rerun the whole page so every table and dropdown shows the new customers
+        st.session_state.customer_import_result = (message, raw, errors)
+        st.session_state.customer_import_run += 1
+        del st.session_state.customer_import_prepared
+        st.rerun()
+    
+    show_rejected_rows(raw, errors)
+
+# Create tabs
+tab1, tab2, tab3, tab4 = st.tabs(["View Customers", "Add Customer", "Edit Customer", "Import Customers"])
+
+# View Customers Tab
+with tab1:
+    st.subheader("All Customers")
+    
+    # Show success messages if redirected from other tabs
+    if st.session_state.show_success:
+        if st.session_state.customer_added:
+            st.success("Customer added successfully!")
+            st.session_state.customer_added = False
+        elif st.session_state.customer_updated:
+            st.success("Customer updated successfully!")
+            st.session_state.customer_updated = False
+        elif st.session_state.customer_deleted:
+            st.success("Customer deleted successfully!")
+            st.session_state.customer_deleted = False
+        
+        # Reset the success flag after showing
+        st.session_state.show_success = False
+    
+    # Refresh button
+    if st.button("🔄 Refresh", key="refresh_customers"):
+        st.cache_data.clear()
+        st.rerun()
+    
+    customer_search_panel()
+    
+    # Get and display customers
+    customers = get_all_customers()
+    if customers:
+        df = pd.DataFrame(customers)
+        st.dataframe(df, use_container_width=True)
+        
+        # Customer details section
+        st.subheader("Customer Details")
+        
+        customer_details_panel()
+    else:
+        st.info("No customers found in the database.")
+
+# Add Customer Tab
+with tab2:
+    st.subheader("Add New Customer")
+    
+    add_customer_form()
+    
+    # show success message if customer was just added and clear the form
+    if st.session_state.customer_added:
+        st.success("Customer added successfully!")
+        st.session_state.customer_added = False
+        st.session_state.show_success = True
+
+
+# Edit Customer Tab
+with tab3:
+    st.subheader("Edit Customer")
+    
+    edit_customer_panel()
+
+# Import Customers Tab
+with tab4:
+    st.subheader("Import Customers")
+    
+    import_customers_panel()
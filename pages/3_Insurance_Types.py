@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from database.db_connector import create_connection
+from database.db_connector import create_connection, sync_external_writes
 from models.insurance_type import (
     get_all_insurance_types,
     get_insurance_type_by_id,
@@ -34,6 +34,9 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
 # Initialize session state for success messages
 if 'type_added' not in st.session_state:
     st.session_state.type_added = False
@@ -44,65 +47,33 @@ if 'type_deleted' not in st.session_state:
 if 'show_success' not in st.session_state:
     st.session_state.show_success = False
 
-# Create tabs
-tab1, tab2, tab3 = st.tabs(["View Insurance Types", "Add Insurance Type", "Edit Insurance Type"])
+# Page sections are fragments: interacting with a widget inside one only reruns
+# that section instead of the whole script (and the full insurance types table).
+# Successful writes still call st.rerun() so every table picks up the change.
 
-# View Insurance Types Tab
-with tab1:
-    # Show success messages if redirected from other tabs
-    if st.session_state.show_success:
-        if st.session_state.type_added:
-            st.success("Insurance type added successfully!")
-            st.session_state.type_added = False
-        elif st.session_state.type_updated:
-            st.success("Insurance type updated successfully!")
-            st.session_state.type_updated = False
-        elif st.session_state.type_deleted:
-            st.success("Insurance type deleted successfully!")
-            st.session_state.type_deleted = False
-        
-        # Reset the success flag after showing
-        st.session_state.show_success = False
-    
-    st.subheader("All Insurance Types")
-    
-    # Refresh button
-    if st.button("🔄 Refresh", key="refresh_types"):
-        st.cache_data.clear()
-        st.rerun()
-    
-    # Get and display insurance types
-    insurance_types = get_all_insurance_types()
-    if insurance_types:
-        df = pd.DataFrame(insurance_types)
-        st.dataframe(df, use_container_width=True)
-        
-        # Insurance type details section
-        st.subheader("Insurance Type Details")
-        
-        # Get insurance type dropdown options
-        type_options = get_insurance_types_dropdown()
-        selected_type = st.selectbox(
-            "Select an insurance type to view details:",
-            options=list(type_options.keys())
-        )
-        
-        if selected_type:
-            type_id = type_options[selected_type]
-            insurance_type = get_insurance_type_by_id(type_id)
-            
-            if insurance_type:
-                st.markdown(f"**Insurance Type ID:** {insurance_type['InsuranceTypeID']}")
-                st.markdown(f"**Name:** {insurance_type['InsuranceName']}")
-                st.markdown("**Description:**")
-                st.write(insurance_type['Description'])
-    else:
-        st.info("No insurance types found in the database.")
+@st.fragment
+def insurance_type_details_panel():
+    """Show a selected insurance type"""
+    # Get insurance type dropdown options
+    type_options = get_insurance_types_dropdown()
+    selected_type = st.selectbox(
+        "Select an insurance type to view details:",
+        options=list(type_options.keys())
+    )
 
-# Add Insurance Type Tab
-with tab2:
-    st.subheader("Add New Insurance Type")
-    
+    if selected_type:
+        type_id = type_options[selected_type]
+        insurance_type = get_insurance_type_by_id(type_id)
+
+        if insurance_type:
+            st.markdown(f"**Insurance Type ID:** {insurance_type['InsuranceTypeID']}")
+            st.markdown(f"**Name:** {insurance_type['InsuranceName']}")
+            st.markdown("**Description:**")
+            st.write(insurance_type['Description'])
+
+@st.fragment
+def add_insurance_type_form():
+    """Form to add a new insurance type"""
     with st.form("add_insurance_type_form"):
         # Auto-generate insurance type ID
         next_id = generate_next_insurance_type_id()
@@ -124,17 +95,10 @@ with tab2:
                     st.error("Failed to add insurance type. Please try again.")
             else:
                 st.error("Please fill in all required fields.")
-    
-    # Show success message if type was just added
-    if st.session_state.type_added:
-        st.success("Insurance type added successfully!")
-        st.session_state.type_added = False
-        st.session_state.show_success = True
 
-# Edit Insurance Type Tab
-with tab3:
-    st.subheader("Edit Insurance Type")
-    
+@st.fragment
+def edit_insurance_type_panel():
+    """Insurance type selector with the edit form and delete confirmation"""
     # Get all insurance types for selection
     type_options = get_insurance_types_dropdown()
     if type_options:
@@ -198,6 +162,64 @@ with tab3:
                             st.rerun()
     else:
         st.info("No insurance types found in the database.")
+
+# Create tabs
+tab1, tab2, tab3 = st.tabs(["View Insurance Types", "Add Insurance Type", "Edit Insurance Type"])
+
+# View Insurance Types Tab
+with tab1:
+    # Show success messages if redirected from other tabs
+    if st.session_state.show_success:
+        if st.session_state.type_added:
+            st.success("Insurance type added successfully!")
+            st.session_state.type_added = False
+        elif st.session_state.type_updated:
+            st.success("Insurance type updated successfully!")
+            st.session_state.type_updated = False
+        elif st.session_state.type_deleted:
+            st.success("Insurance type deleted successfully!")
+            st.session_state.type_deleted = False
+        
+        # Reset the success flag after showing
+        st.session_state.show_success = False
+    
+    st.subheader("All Insurance Types")
+    
+    # Refresh button
+    if st.button("🔄 Refresh", key="refresh_types"):
+        st.cache_data.clear()
+        st.rerun()
+    
+    # Get and display insurance types
+    insurance_types = get_all_insurance_types()
+    if insurance_types:
+        df = pd.DataFrame(insurance_types)
+        st.dataframe(df, use_container_width=True)
+        
+        # Insurance type details section
+        st.subheader("Insurance Type Details")
+        
+        insurance_type_details_panel()
+    else:
+        st.info("No insurance types found in the database.")
+
+# Add Insurance Type Tab
+with tab2:
+    st.subheader("Add New Insurance Type")
+    
+    add_insurance_type_form()
+    
+    # Show success message if type was just added
+    if st.session_state.type_added:
+        st.success("Insurance type added successfully!")
+        st.session_state.type_added = False
+        st.session_state.show_success = True
+
+# Edit Insurance Type Tab
+with tab3:
+    st.subheader("Edit Insurance Type")
+    
+    edit_insurance_type_panel()
     
     # Show success message if type was just updated
     if st.session_state.type_updated:
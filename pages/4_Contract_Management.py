@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from database.db_connector import create_connection
+from mysql.connector import Error
+from database.db_connector import create_connection, transaction, sync_external_writes
+from utils.formatting import display_table, format_dates
 from models.contract import (
     get_all_contracts,
     get_contract_by_id,
@@ -11,8 +13,7 @@ from models.contract import (
     add_contract,
     update_contract,
     extend_contract,
-    get_contract_assessments,
-    get_contract_payouts
+    get_contract_detail
 )
 from models.customer import get_customers_dropdown
 from models.insurance_type import get_insurance_types_dropdown
@@ -40,6 +41,9 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
 # Initialize session state for success messages
 if 'contract_created' not in st.session_state:
     st.session_state.contract_created = False
@@ -50,101 +54,65 @@ if 'contract_extended' not in st.session_state:
 if 'show_success' not in st.session_state:
     st.session_state.show_success = False
 
-# Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["View Contracts", "Create Contract", "Update Contract", "Contract Extension"])
+# Extension periods offered on the page, in days
+EXTENSION_DAYS = {
+    "6 Months": 182,
+    "1 Year": 365,
+    "2 Years": 730
+}
 
-# View Contracts Tab
-with tab1:
-    # Show success messages if redirected from other tabs
-    if st.session_state.show_success:
-        if st.session_state.contract_created:
-            st.success("Contract created successfully!")
-            st.session_state.contract_created = False
-        elif st.session_state.contract_updated:
-            st.success("Contract updated successfully!")
-            st.session_state.contract_updated = False
-        elif st.session_state.contract_extended:
-            st.success("Contract(s) extended successfully!")
-            st.session_state.contract_extended = False
-        
-        # Reset the success flag after showing
-        st.session_state.show_success = False
+# Page sections are fragments: interacting with a widget inside one only reruns
+# that section instead of the whole script (and the full contracts table).
+# Successful writes still call st.rerun() so every table picks up the change.
+
+@st.fragment
+def contract_details_panel():
+    """Show a selected contract with its assessments and payouts"""
+    # Get contract dropdown options
+    contract_options = get_contracts_dropdown()
+    selected_contract = st.selectbox(
+        "Select a contract to view details:",
+        options=list(contract_options.keys())
+    )
     
-    st.subheader("All Contracts")
-        
-    # Refresh button
-    if st.button("🔄 Refresh", key="refresh_contracts"):
-        st.cache_data.clear()
-        st.rerun()
+    if selected_contract:
+        contract_id = contract_options[selected_contract]
+        # Contract, assessments and payouts in one round trip
+        detail = get_contract_detail(contract_id)
     
-    # Get and display contracts
-    contracts = get_all_contracts()
-    if contracts:
-        df = pd.DataFrame(contracts)
-        if 'SignDate' in df.columns:
-            df['SignDate'] = pd.to_datetime(df['SignDate']).dt.strftime('%Y-%m-%d')
-        if 'ExpirationDate' in df.columns:
-            df['ExpirationDate'] = pd.to_datetime(df['ExpirationDate']).dt.strftime('%Y-%m-%d')
-        
-        st.dataframe(df, use_container_width=True)
-        
-        # Contract details section
-        st.subheader("Contract Details")
-        
-        # Get contract dropdown options
-        contract_options = get_contracts_dropdown()
-        selected_contract = st.selectbox(
-            "Select a contract to view details:",
-            options=list(contract_options.keys())
-        )
-        
-        if selected_contract:
-            contract_id = contract_options[selected_contract]
-            contract = get_contract_by_id(contract_id)
-            
-            if contract:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown(f"**Contract ID:** {contract['ContractID']}")
-                    st.markdown(f"**Customer:** {contract['CustomerName']} ({contract['CustomerID']})")
-                    st.markdown(f"**Insurance Type:** {contract['InsuranceName']} ({contract['InsuranceTypeID']})")
-                
-                with col2:
-                    st.markdown(f"**Sign Date:** {contract['SignDate']}")
-                    st.markdown(f"**Expiration Date:** {contract['ExpirationDate']}")
-                    st.markdown(f"**Status:** {contract['Status']}")
-                
-                # Display Assessments for this contract
-                st.subheader("Assessments")
-                assessments = get_contract_assessments(contract_id)
-                if assessments:
-                    df_assessments = pd.DataFrame(assessments)
-                    df_assessments['AssessmentDate'] = pd.to_datetime(df_assessments['AssessmentDate']).dt.strftime('%Y-%m-%d')
-                    if 'ClaimAmount' in df_assessments.columns:
-                        df_assessments['ClaimAmount'] = df_assessments['ClaimAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
-                    st.dataframe(df_assessments, use_container_width=True)
-                else:
-                    st.info("No assessments found for this contract.")
-                
-                # Display Payouts for this contract
-                st.subheader("Payouts")
-                payouts = get_contract_payouts(contract_id)
-                if payouts:
-                    df_payouts = pd.DataFrame(payouts)
-                    df_payouts['PayoutDate'] = pd.to_datetime(df_payouts['PayoutDate']).dt.strftime('%Y-%m-%d')
-                    if 'Amount' in df_payouts.columns:
-                        df_payouts['Amount'] = df_payouts['Amount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
-                    st.dataframe(df_payouts, use_container_width=True)
-                else:
-                    st.info("No payouts found for this contract.")
-    else:
-        st.info("No contracts found in the database.")
-
-# Create Contract Tab
-with tab2:
-    st.subheader("Create New Contract")
+        if detail:
+            contract = detail['contract']
+            col1, col2 = st.columns(2)
+    
+            with col1:
+                st.markdown(f"**Contract ID:** {contract['ContractID']}")
+                st.markdown(f"**Customer:** {contract['CustomerName']} ({contract['CustomerID']})")
+                st.markdown(f"**Insurance Type:** {contract['InsuranceName']} ({contract['InsuranceTypeID']})")
+    
+            with col2:
+                st.markdown(f"**Sign Date:** {contract['SignDate']}")
+                st.markdown(f"**Expiration Date:** {contract['ExpirationDate']}")
+                st.markdown(f"**Status:** {contract['Status']}")
+    
+            # Display Assessments for this contract
+            st.subheader("Assessments")
+            assessments = detail['assessments']
+            if assessments:
+                display_table(assessments)
+            else:
+                st.info("No assessments found for this contract.")
     
+            # Display Payouts for this contract
+            st.subheader("Payouts")
+            payouts = detail['payouts']
+            if payouts:
+                display_table(payouts)
+            else:
+                st.info("No payouts found for this contract.")
+
+@st.fragment
+def create_contract_form():
+    """Form to create a new contract"""
     with st.form("create_contract_form"):
         # Auto-generate contract ID
         next_id = generate_next_contract_id()
@@ -185,17 +153,10 @@ with tab2:
                     st.error("Failed to create contract. Please try again.")
             else:
                 st.error("Please fill in all required fields.")
-    
-    # Show success message if contract was just created
-    if st.session_state.contract_created:
-        st.success("Contract created successfully!")
-        st.session_state.contract_created = False
-        st.session_state.show_success = True
 
-# Update Contract Tab
-with tab3:
-    st.subheader("Update Contract")
-    
+@st.fragment
+def update_contract_panel():
+    """Contract selector and form to update the selected contract"""
     # Get contract dropdown options
     contract_options = get_contracts_dropdown()
     if not contract_options:
@@ -237,6 +198,11 @@ with tab3:
                     
                     sign_date = st.date_input("Sign Date", value=contract['SignDate'])
                     expiration_date = st.date_input("Expiration Date", value=contract['ExpirationDate'])
+                    extension_period = st.selectbox(
+                        "Extend Contract",
+                        options=["No Extension", *EXTENSION_DAYS],
+                        help="Also extend the contract from the expiration date above (an expired contract becomes active again)"
+                    )
                     
                     submitted = st.form_submit_button("Update Contract")
                     if submitted:
@@ -244,14 +210,132 @@ with tab3:
                             customer_id = customer_options[selected_customer]
                             insurance_id = insurance_options[selected_insurance]
                             
-                            if update_contract(contract_id, customer_id, insurance_id, sign_date, expiration_date):
-                                # Set success flag
-                                st.session_state.contract_updated = True
-                                st.rerun()
-                            else:
-                                st.error("Failed to update contract. Please try again.")
+                            try:
+                                # The update and the extension commit together, or not at all
+                                with transaction():
+                                    update_contract(contract_id, customer_id, insurance_id, sign_date, expiration_date)
+                                    if extension_period in EXTENSION_DAYS:
+                                        extend_contract(contract_id, expiration_date + datetime.timedelta(days=EXTENSION_DAYS[extension_period]))
+                            except (Error, RuntimeError) as e:
+                                st.error(f"Failed to update contract: {e}")
+                                return
+                            # Set success flag
+                            st.session_state.contract_updated = True
+                            st.rerun()
                         else:
                             st.error("Please fill in all required fields.")
+
+@st.fragment
+def extend_contracts_form(expiring_contracts):
+    """Form to extend a selection of expiring contracts"""
+    with st.form("extend_contracts_form"):
+        # Change from set to dictionary for contract options
+        df_expiring = pd.DataFrame(expiring_contracts)
+        labels = df_expiring['ContractID'] + ': ' + df_expiring['CustomerName'].astype(str) + ' - Expires: ' + format_dates(df_expiring['ExpirationDate'])
+        contract_options = dict(zip(labels, df_expiring['ContractID']))
+        selected_contracts = st.multiselect(
+            "Select contracts to extend:",
+            options=list(contract_options.keys())
+        )
+    
+        extension_period = st.selectbox("Extension Period:", list(EXTENSION_DAYS), index=1)
+    
+        submitted = st.form_submit_button("Extend Selected Contracts")
+        if submitted:
+            if selected_contracts:
+                days = EXTENSION_DAYS[extension_period]
+    
+                # Process each selected contract, all in one transaction
+                success_count = 0
+                try:
+                    with transaction():
+                        for selection in selected_contracts:
+                            # Get contract ID from the dictionary using the selection as key
+                            contract_id = contract_options[selection]
+    
+                            # Get contract details
+                            contract_info = next((c for c in expiring_contracts if c['ContractID'] == contract_id), None)
+                            if contract_info:
+                                # Determine extension base date
+                                if contract_info['Status'] == 'Expired':
+                                    base_date = datetime.date.today()
+                                else:
+                                    base_date = pd.to_datetime(contract_info['ExpirationDate']).date()
+    
+                                # Calculate new expiration date
+                                new_exp_date = base_date + datetime.timedelta(days=days)
+
+                                if extend_contract(contract_id, new_exp_date):
+                                    success_count += 1
+                except (Error, RuntimeError) as e:
+                    st.error(f"Failed to extend contracts: {e}")
+                    return
+    
+                if success_count > 0:
+                    # Set success flag and show message in the placeholder
+                    st.session_state.contract_extended = True
+                    st.rerun()
+                else:
+                    st.error("Failed to extend contracts.")
+            else:
+                st.warning("Please select at least one contract to extend.")
+
+# Create tabs
+tab1, tab2, tab3, tab4 = st.tabs(["View Contracts", "Create Contract", "Update Contract", "Contract Extension"])
+
+# View Contracts Tab
+with tab1:
+    # Show success messages if redirected from other tabs
+    if st.session_state.show_success:
+        if st.session_state.contract_created:
+            st.success("Contract created successfully!")
+            st.session_state.contract_created = False
+        elif st.session_state.contract_updated:
+            st.success("Contract updated successfully!")
+            st.session_state.contract_updated = False
+        elif st.session_state.contract_extended:
+            st.success("Contract(s) extended successfully!")
+            st.session_state.contract_extended = False
+        
+        # Reset the success flag after showing
+        st.session_state.show_success = False
+    
+    st.subheader("All Contracts")
+        
+    # Refresh button
+    if st.button("🔄 Refresh", key="refresh_contracts"):
+        st.cache_data.clear()
+        st.rerun()
+    
+    # Get and display contracts
+    contracts = get_all_contracts()
+    if contracts.num_rows:
+        display_table(contracts)
+        
+        # Contract details section
+        st.subheader("Contract Details")
+        
+        contract_details_panel()
+    else:
+        st.info("No contracts found in the database.")
+
+# Create Contract Tab
+with tab2:
+    st.subheader("Create New Contract")
+    
+    create_contract_form()
+    
+    # Show success message if contract was just created
+    if st.session_state.contract_created:
+        st.success("Contract created successfully!")
+        st.session_state.contract_created = False
+        st.session_state.show_success = True
+
+# Update Contract Tab
+with tab3:
+    st.subheader("Update Contract")
+    
+    update_contract_panel()
     
     # Show success message if contract was just updated
     if st.session_state.contract_updated:
@@ -269,63 +353,9 @@ with tab4:
     if expiring_contracts:
         st.write("The following contracts are expiring in the next 3 months or have already expired:")
         
-        df = pd.DataFrame(expiring_contracts)
-        df['SignDate'] = pd.to_datetime(df['SignDate']).dt.strftime('%Y-%m-%d')
-        df['ExpirationDate'] = pd.to_datetime(df['ExpirationDate']).dt.strftime('%Y-%m-%d')
-        st.dataframe(df, use_container_width=True)
+        display_table(expiring_contracts)
         
-        with st.form("extend_contracts_form"):
-            # Change from set to dictionary for contract options
-            contract_options = {f"{c['ContractID']}: {c['CustomerName']} - Expires: {c['ExpirationDate']}": c['ContractID'] for c in expiring_contracts}
-            selected_contracts = st.multiselect(
-                "Select contracts to extend:",
-                options=list(contract_options.keys())
-            )
-            
-            extension_period = st.selectbox("Extension Period:", ["6 Months", "1 Year", "2 Years"], index=1)
-            
-            submitted = st.form_submit_button("Extend Selected Contracts")
-            if submitted:
-                if selected_contracts:
-                    # Map extension period to days
-                    period_map = {
-                        "6 Months": 182,
-                        "1 Year": 365,
-                        "2 Years": 730
-                    }
-                    days = period_map[extension_period]
-                    
-                    # Process each selected contract
-                    success_count = 0
-                    for selection in selected_contracts:
-                        # Get contract ID from the dictionary using the selection as key
-                        contract_id = contract_options[selection]
-                        
-                        # Get contract details
-                        contract_info = next((c for c in expiring_contracts if c['ContractID'] == contract_id), None)
-                        if contract_info:
-                            # Determine extension base date
-                            if contract_info['Status'] == 'Expired':
-                                base_date = datetime.date.today()
-                            else:
-                                base_date = pd.to_datetime(contract_info['ExpirationDate']).date()
-                            
-                            # Calculate new expiration date
-                            new_exp_date = base_date + datetime.timedelta(days=days)
-
-                            if extend_contract(contract_id, new_exp_date):
-                                success_count += 1
-                    
-                    if success_count > 0:
-                        # Set success flag and show message in the placeholder
-                        st.session_state.contract_extended = True
-                        # Clear the cache to refresh the data
-                        st.cache_data.clear()
-                        st.rerun()
-                    else:
-                        st.error("Failed to extend contracts.")
-                else:
-                    st.warning("Please select at least one contract to extend.")
+        extend_contracts_form(expiring_contracts)
         
         # Show persistent success message after form (also works after rerun)
         if st.session_state.contract_extended:
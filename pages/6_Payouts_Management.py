@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from database.db_connector import create_connection
+from mysql.connector import Error
+from database.db_connector import create_connection, transaction, sync_external_writes
+from utils.formatting import display_table, format_currency, to_frame
 from models.payout import (
     get_all_payouts,
     get_payout_by_id,
@@ -46,6 +48,145 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
+# Page sections are fragments: interacting with a widget inside one only reruns
+# that section instead of the whole script (and the full payouts table).
+# Successful writes still call st.rerun() so every table picks up the change.
+
+@st.fragment
+def payout_details_panel():
+    """Show a selected payout, its related assessment and the status update form"""
+    # Get payout dropdown options
+    payout_options = get_payouts_dropdown()
+    selected_payout = st.selectbox(
+        "Select a payout to view details:",
+        options=list(payout_options.keys())
+    )
+    
+    if selected_payout:
+        payout_id = payout_options[selected_payout]
+        payout = get_payout_by_id(payout_id)
+    
+        if payout:
+            col1, col2 = st.columns(2)
+    
+            with col1:
+                st.markdown(f"**Payout ID:** {payout['PayoutID']}")
+                st.markdown(f"**Contract ID:** {payout['ContractID']}")
+                st.markdown(f"**Customer:** {payout['CustomerName']} ({payout['CustomerID']})")
+    
+            with col2:
+                st.markdown(f"**Payout Date:** {payout['PayoutDate']}")
+                st.markdown(f"**Amount:** ${float(payout['Amount']):,.2f}")
+                st.markdown(f"**Status:** {payout['Status']}")
+    
+            # Display related assessment
+            st.subheader("Related Assessment")
+    
+            assessment = get_related_assessment(payout['ContractID'], payout['Amount'])
+            if assessment:
+                display_table(assessment)
+            else:
+                st.info("No related assessment found for this payout.")
+    
+            # Option to update the payout status
+            st.subheader("Update Payout Status")
+    
+            with st.form(key=f"update_payout_{payout_id}"):
+                new_status = st.selectbox(
+                    "Change status to:",
+                    options=["Pending", "Approved", "Rejected", "Completed"],
+                    index=["Pending", "Approved", "Rejected", "Completed"].index(payout['Status']) if payout['Status'] in ["Pending", "Approved", "Rejected", "Completed"] else 0
+                )
+    
+                update_submitted = st.form_submit_button("Update Status")
+                if update_submitted:
+                    if new_status != payout['Status']:
+                        if update_payout_status(payout_id, new_status):
+                            st.success(f"Payout status updated to {new_status}!")
+                            st.rerun()
+                        else:
+                            st.error("Failed to update payout status.")
+
+@st.fragment
+def process_payout_form(approved_claims):
+    """Form to process a payout for an approved claim"""
+    with st.form("process_payout_form"):
+        # Auto-generate payout ID
+        payout_id = st.text_input("Payout ID", value=generate_next_payout_id())
+    
+        # Create options for approved claims
+        df_claims = to_frame(approved_claims)
+        labels = df_claims['AssessmentID'] + ': ' + df_claims['CustomerName'].astype(str) + ' - ' + format_currency(df_claims['ClaimAmount'])
+        claim_options = dict(zip(labels, zip(df_claims['ContractID'], df_claims['ClaimAmount'])))
+    
+        if claim_options:
+            selected_claim = st.selectbox("Select Approved Claim", options=list(claim_options.keys()))
+    
+            payout_date = st.date_input("Payout Date", value=datetime.date.today())
+    
+            if selected_claim:
+                contract_id, claim_amount = claim_options[selected_claim]
+    
+                # claim_amount is already a float in dollars (converted by to_frame)
+                amount = float(claim_amount)
+    
+                # Display the amount from the assessment
+                st.markdown(f"**Amount from assessment: ${amount:,.2f}**")
+    
+                # Allow a custom amount (with the assessment amount as default)
+                custom_amount = st.number_input("Custom Amount (if different)", min_value=0.0, value=amount, step=100.0, format="%.2f")
+    
+                status = st.selectbox("Initial Status", options=["Pending", "Approved", "Completed"], index=1)
+    
+                submitted = st.form_submit_button("Process Payout")
+                if submitted:
+                    # Validate inputs
+                    if payout_id and contract_id and custom_amount > 0:
+                        # Process the payout (in a transaction, so a failure is raised and shown below)
+                        try:
+                            with transaction():
+                                add_payout(payout_id, contract_id, custom_amount, payout_date, status)
+                        except (Error, RuntimeError) as e:
+                            st.error(f"Failed to process payout: {e}")
+                            return
+                        # Set success flag
+                        st.session_state.payout_processed = True
+    
+                        # Rerun to show the success message
+                        st.rerun()
+                    else:
+                        st.error("Please fill in all required fields and ensure amount is greater than zero.")
+        else:
+            st.warning("Please select an approved claim to process.")
+
+@st.fragment
+def pending_payout_row(row):
+    """One pending payout with its approve/reject action"""
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.markdown(f"**Payout ID:** {row['PayoutID']} | **Contract:** {row['ContractID']} | **Customer:** {row['CustomerName']} | **Amount:** ${row['Amount']:,.2f} | **Date:** {row['PayoutDate']:%Y-%m-%d}")
+    
+    with col2:
+        action = st.selectbox(
+            "Action",
+            options=["Select Action", "Approve", "Reject"],
+            key=f"action_{row['PayoutID']}"
+        )
+    
+        if action in ["Approve", "Reject"]:
+            status = "Approved" if action == "Approve" else "Rejected"
+    
+            # Update the payout status
+            if update_payout_status(row['PayoutID'], status):
+                st.success(f"Payout {row['PayoutID']} {status.lower()}!")
+                st.rerun()
+            else:
+                st.error(f"Failed to update payout {row['PayoutID']}.")
+
 # Create tabs
 tab1, tab2, tab3 = st.tabs(["View Payouts", "Process New Payout", "Pending Payouts"])
 
@@ -58,72 +199,18 @@ with tab1:
         st.cache_data.clear()
         st.rerun()
     
+    # Closed payouts older than a few years are archived; list them only on request
+    include_history = st.checkbox("Include archived payouts", key="payouts_history")
+    
     # Get and display payouts
-    payouts = get_all_payouts()
-    if payouts:
-        df = pd.DataFrame(payouts)
-        df['PayoutDate'] = pd.to_datetime(df['PayoutDate']).dt.strftime('%Y-%m-%d')
-        df['Amount'] = df['Amount'].apply(lambda x: f"${float(x):,.2f}" if x else "$0.00")
-        
-        st.dataframe(df, use_container_width=True)
+    payouts = get_all_payouts(include_history=include_history)
+    if payouts.num_rows:
+        display_table(payouts)
         
         # Payout details section
         st.subheader("Payout Details")
         
-        # Get payout dropdown options
-        payout_options = get_payouts_dropdown()
-        selected_payout = st.selectbox(
-            "Select a payout to view details:",
-            options=list(payout_options.keys())
-        )
-        
-        if selected_payout:
-            payout_id = payout_options[selected_payout]
-            payout = get_payout_by_id(payout_id)
-            
-            if payout:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown(f"**Payout ID:** {payout['PayoutID']}")
-                    st.markdown(f"**Contract ID:** {payout['ContractID']}")
-                    st.markdown(f"**Customer:** {payout['CustomerName']} ({payout['CustomerID']})")
-                
-                with col2:
-                    st.markdown(f"**Payout Date:** {payout['PayoutDate']}")
-                    st.markdown(f"**Amount:** ${float(payout['Amount']):,.2f}")
-                    st.markdown(f"**Status:** {payout['Status']}")
-                
-                # Display related assessment
-                st.subheader("Related Assessment")
-                
-                assessment = get_related_assessment(payout['ContractID'], payout['Amount'])
-                if assessment:
-                    df_assessment = pd.DataFrame(assessment)
-                    df_assessment['AssessmentDate'] = pd.to_datetime(df_assessment['AssessmentDate']).dt.strftime('%Y-%m-%d')
-                    df_assessment['ClaimAmount'] = df_assessment['ClaimAmount'].apply(lambda x: f"${float(x):,.2f}")
-                    st.dataframe(df_assessment, use_container_width=True)
-                else:
-                    st.info("No related assessment found for this payout.")
-                
-                # Option to update the payout status
-                st.subheader("Update Payout Status")
-                
-                with st.form(key=f"update_payout_{payout_id}"):
-                    new_status = st.selectbox(
-                        "Change status to:",
-                        options=["Pending", "Approved", "Rejected", "Completed"],
-                        index=["Pending", "Approved", "Rejected", "Completed"].index(payout['Status']) if payout['Status'] in ["Pending", "Approved", "Rejected", "Completed"] else 0
-                    )
-                    
-                    update_submitted = st.form_submit_button("Update Status")
-                    if update_submitted:
-                        if new_status != payout['Status']:
-                            if update_payout_status(payout_id, new_status):
-                                st.success(f"Payout status updated to {new_status}!")
-                                st.rerun()
-                            else:
-                                st.error("Failed to update payout status.")
+        payout_details_panel()
     else:
         st.info("No payouts found in the database.")
 
@@ -134,62 +221,13 @@ with tab2:
     # Get approved claims without payouts
     approved_claims = get_approved_claims()
     
-    if approved_claims:
+    if not approved_claims.empty:
         st.write("The following approved claims are eligible for payout:")
         
-        # Create a DataFrame to show the approved claims
-        df = pd.DataFrame(approved_claims)
-        df['AssessmentDate'] = pd.to_datetime(df['AssessmentDate']).dt.strftime('%Y-%m-%d')
-        df['ClaimAmount'] = df['ClaimAmount'].apply(lambda x: f"${float(x):,.2f}")
-        st.dataframe(df, use_container_width=True)
+        # Show the approved claims
+        display_table(approved_claims)
         
-        with st.form("process_payout_form"):
-            # Auto-generate payout ID
-            payout_id = st.text_input("Payout ID", value=generate_next_payout_id())
-            
-            # Create options for approved claims
-            claim_options = {
-                f"{a['AssessmentID']}: {a['CustomerName']} - {a['ClaimAmount']}": (a['ContractID'], a['ClaimAmount']) 
-                for a in approved_claims
-            }
-            
-            if claim_options:
-                selected_claim = st.selectbox("Select Approved Claim", options=list(claim_options.keys()))
-                
-                payout_date = st.date_input("Payout Date", value=datetime.date.today())
-                
-                if selected_claim:
-                    contract_id, claim_amount = claim_options[selected_claim]
-                    
-                    # Convert claim_amount to float directly without string manipulation
-                    # since it's already a Decimal object
-                    amount = float(claim_amount)
-                    
-                    # Display the amount from the assessment
-                    st.markdown(f"**Amount from assessment: ${amount:,.2f}**")
-                    
-                    # Allow a custom amount (with the assessment amount as default)
-                    custom_amount = st.number_input("Custom Amount (if different)", min_value=0.0, value=amount, step=100.0, format="%.2f")
-                    
-                    status = st.selectbox("Initial Status", options=["Pending", "Approved", "Completed"], index=1)
-                    
-                    submitted = st.form_submit_button("Process Payout")
-                    if submitted:
-                        # Validate inputs
-                        if payout_id and contract_id and custom_amount > 0:
-                            # Process the payout
-                            if add_payout(payout_id, contract_id, custom_amount, payout_date, status):
-                                # Set success flag
-                                st.session_state.payout_processed = True
-                                
-                                # Rerun to show the success message
-                                st.rerun()
-                            else:
-                                st.error("Failed to process payout.")
-                        else:
-                            st.error("Please fill in all required fields and ensure amount is greater than zero.")
-            else:
-                st.warning("Please select an approved claim to process.")
+        process_payout_form(approved_claims)
     else:
         st.info("No approved claims without payouts found.")
     
@@ -206,37 +244,15 @@ with tab3:
     # Get pending payouts
     pending_payouts = get_pending_payouts()
     
-    if pending_payouts:
+    if not pending_payouts.empty:
         st.write("The following payouts are pending approval:")
         
-        # Create a DataFrame to display the pending payouts
-        df = pd.DataFrame(pending_payouts)
-        df['PayoutDate'] = pd.to_datetime(df['PayoutDate']).dt.strftime('%Y-%m-%d')
-        df['Amount'] = df['Amount'].apply(lambda x: f"${float(x):,.2f}")
+        # Convert amounts and dates once for the whole list
+        df = to_frame(pending_payouts)
         
         # Process each pending payout
         for index, row in df.iterrows():
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.markdown(f"**Payout ID:** {row['PayoutID']} | **Contract:** {row['ContractID']} | **Customer:** {row['CustomerName']} | **Amount:** {row['Amount']} | **Date:** {row['PayoutDate']}")
-            
-            with col2:
-                action = st.selectbox(
-                    "Action",
-                    options=["Select Action", "Approve", "Reject"],
-                    key=f"action_{row['PayoutID']}"
-                )
-                
-                if action in ["Approve", "Reject"]:
-                    status = "Approved" if action == "Approve" else "Rejected"
-                    
-                    # Update the payout status
-                    if update_payout_status(row['PayoutID'], status):
-                        st.success(f"Payout {row['PayoutID']} {status.lower()}!")
-                        st.rerun()
-                    else:
-                        st.error(f"Failed to update payout {row['PayoutID']}.")
+            pending_payout_row(row)
         
         # Add a button to refresh the pending payouts
         if st.button("Refresh Pending Payouts"):
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import io
-from database.db_connector import create_connection
+import datetime
+from database.db_connector import create_connection, bump_data_version, fetch_concurrently, sync_external_writes
+from database.olap import olap_enabled, replica_timestamp
+from utils.formatting import display_table, to_frame
+from utils.export import export_button, FORMATS
+from services.export_jobs import submit_export_job, list_export_jobs, ACTIVE_STATUSES
 from models.report import (
     get_contracts_by_type,
     get_contracts_by_status,
@@ -20,8 +24,11 @@ from models.report import (
     get_top_customers_by_contracts,
     get_top_customers_by_payout,
     get_top_customers_by_claims,
-    get_customer_overview
+    get_customer_overview,
+    EXPORT_QUERIES
 )
+from models.cube import get_claims_cube, get_payouts_cube, slice_cube, CUBE_DIMENSIONS, CUBE_MEASURES
+from services.report_scheduler import latest_reports, request_refresh, is_refreshing, snapshot_time
 
 # Check the curent user role if they are allowed to access this page
 if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
@@ -43,6 +50,9 @@ if not conn:
 else:
     conn.close()
 
+# Drop the cached data the API changed since the last run
+sync_external_writes()
+
 # Create report type selection
 report_type = st.selectbox(
     "Select Report Type",
@@ -50,24 +60,131 @@ report_type = st.selectbox(
         "Contracts Summary", 
         "Claims Analysis", 
         "Payout Summary", 
-        "Customer Activity"
+        "Customer Activity",
+        "Claims & Payouts Explorer"
     ]
 )
 
-# Refresh button
+# Claim and payout reports cover the hot tables; archived claims and payouts only on request
+# (also part of the export file keys, so the two variants are not served for each other)
+include_history = False
+if report_type in ("Claims Analysis", "Payout Summary", "Claims & Payouts Explorer"):
+    include_history = st.checkbox("Include archived claims and payouts", help="Computed live over the full history, so slower than the regular reports")
+
+def claim_reports(*fns):
+    """Latest snapshots of claim / payout reports, or the reports over the full history computed live"""
+    if include_history:
+        return fetch_concurrently(*[lambda fn=fn: fn(include_history=True) for fn in fns])
+    return latest_reports(*fns)
+
+# Reports are served from snapshots that the scheduler recomputes in the background.
+# Refresh only asks for new snapshots; nobody waits while they are computed.
+@st.fragment(run_every=2)
+def wait_for_snapshots():
+    """Rerun the page once the requested report refresh has finished"""
+    st.info("Refreshing reports in the background...")
+    if not is_refreshing():
+        st.session_state.reports_refreshing = False
+        st.rerun()
+
 if st.button("🔄 Refresh Data"):
-    st.cache_data.clear()
-    st.rerun()
+    request_refresh()
+    bump_data_version()  # Rebuild exports as well
+    st.session_state.reports_refreshing = True
+
+if st.session_state.get("reports_refreshing"):
+    wait_for_snapshots()
+
+last_snapshot = snapshot_time()
+if last_snapshot:
+    st.caption(f"Report data as of {datetime.datetime.fromtimestamp(last_snapshot):%Y-%m-%d %H:%M:%S}.")
+
+# Show where the report numbers come from when the analytics replica is used
+if olap_enabled():
+    replica_time = datetime.datetime.fromtimestamp(replica_timestamp())
+    st.caption(f"Reports are computed on the analytics replica copied at {replica_time:%Y-%m-%d %H:%M}.")
 
 # Add a download option for each report
-download_format = st.radio("Download Format", ["CSV", "Excel"], horizontal=True)
+download_format = st.radio("Download Format", ["CSV", "Excel", "Parquet"], horizontal=True)
+
+# The explorer is a fragment: changing a dimension or filter only reruns the explorer,
+# which slices the cached cube in memory without new SQL
+@st.fragment
+def cube_explorer():
+    """Pivot and drill-down over the claims or payouts cube"""
+    cube_name = st.radio("Cube", ["Claims", "Payouts"], horizontal=True)
+    cube = claim_reports(get_claims_cube if cube_name == "Claims" else get_payouts_cube)[0]
+    if cube.empty:
+        st.info(f"No {cube_name.lower()} found in the database.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rows = st.multiselect("Rows", CUBE_DIMENSIONS, default=['InsuranceName'])
+    with col2:
+        columns = st.selectbox("Columns", [None] + CUBE_DIMENSIONS, format_func=lambda d: d or "(none)")
+    with col3:
+        measure_label = st.selectbox("Measure", list(CUBE_MEASURES.keys()))
+    measure = CUBE_MEASURES[measure_label]
+    
+    # Drill down by restricting any dimension to some of its values
+    filters = {}
+    with st.expander("Filters"):
+        for dimension in CUBE_DIMENSIONS:
+            values = sorted(cube[dimension].dropna().unique().tolist())
+            filters[dimension] = st.multiselect(dimension, values, key=f"cube_filter_{dimension}")
+    
+    if columns and columns in rows:
+        st.warning("Choose different dimensions for rows and columns.")
+        return
+    if not rows and not columns:
+        st.info("Choose at least one dimension.")
+        return
+    
+    result = slice_cube(cube, rows, columns, filters, measure)
+    if result.empty:
+        st.info("No data for the selected filters.")
+        return
+    
+    number_format = "%d" if measure == 'Count' else "$%.2f"
+    st.dataframe(
+        result,
+        column_config={
+            col: st.column_config.NumberColumn(format=number_format)
+            for col in result.columns if col not in CUBE_DIMENSIONS
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    if not columns:
+        fig = px.bar(
+            result,
+            x=rows[0],
+            y=measure,
+            color=rows[1] if len(rows) > 1 else rows[0],
+            title=f"{cube_name} {measure_label} by {' / '.join(rows)}"
+        )
+        fig.update_layout(xaxis_title=rows[0], yaxis_title=measure_label)
+        st.plotly_chart(fig, use_container_width=True)
 
 # Contracts Summary Report
 if report_type == "Contracts Summary":
     st.subheader("Contracts Summary Report")
+    # Independent reports: load them in parallel
+    (
+        active_summary,
+        contracts_by_type,
+        contracts_by_status,
+        contracts_by_month
+    ) = latest_reports(
+        get_active_contracts_summary,
+        get_contracts_by_type,
+        get_contracts_by_status,
+        get_contracts_by_month
+    )
     
     # Display metrics
-    active_summary = get_active_contracts_summary()
     if active_summary and active_summary[0]['TotalActive'] is not None:
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -85,10 +202,9 @@ if report_type == "Contracts Summary":
             st.metric("Latest Expiration", latest.strftime('%Y-%m-%d') if latest else "N/A")
     
     # Contracts by insurance type
-    contracts_by_type = get_contracts_by_type()
-    if contracts_by_type:
+    if not contracts_by_type.empty:
         st.subheader("Contracts by Insurance Type")
-        df_type = pd.DataFrame(contracts_by_type)
+        df_type = to_frame(contracts_by_type)
         
         # Create a bar chart
         fig1 = px.bar(
@@ -102,32 +218,13 @@ if report_type == "Contracts Summary":
         fig1.update_layout(xaxis_title='Insurance Type', yaxis_title='Number of Contracts')
         st.plotly_chart(fig1, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_type.to_csv(index=False)
-            st.download_button(
-                f"Download Contracts by Type (CSV)",
-                data=csv,
-                file_name="contracts_by_type.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_type.to_excel(writer, sheet_name='Contracts by Type', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Contracts by Type (Excel)",
-                data=buffer,
-                file_name="contracts_by_type.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Contracts by Type", "contracts_by_type", download_format, lambda data=df_type: [data], sheet_name="Contracts by Type")
     
     # Contracts by status
-    contracts_by_status = get_contracts_by_status()
-    if contracts_by_status:
+    if not contracts_by_status.empty:
         st.subheader("Contracts by Status")
-        df_status = pd.DataFrame(contracts_by_status)
+        df_status = to_frame(contracts_by_status)
         
         # Create a pie chart
         fig2 = px.pie(
@@ -139,32 +236,13 @@ if report_type == "Contracts Summary":
         )
         st.plotly_chart(fig2, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_status.to_csv(index=False)
-            st.download_button(
-                f"Download Contracts by Status (CSV)",
-                data=csv,
-                file_name="contracts_by_status.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_status.to_excel(writer, sheet_name='Contracts by Status', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Contracts by Status (Excel)",
-                data=buffer,
-                file_name="contracts_by_status.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Contracts by Status", "contracts_by_status", download_format, lambda data=df_status: [data], sheet_name="Contracts by Status")
     
     # Monthly contract trends
-    contracts_by_month = get_contracts_by_month()
-    if contracts_by_month:
+    if not contracts_by_month.empty:
         st.subheader("Monthly Contract Trends")
-        df_month = pd.DataFrame(contracts_by_month)
+        df_month = to_frame(contracts_by_month)
         
         # Create a line chart
         fig3 = px.line(
@@ -179,33 +257,28 @@ if report_type == "Contracts Summary":
         fig3.update_layout(xaxis_title='Month', yaxis_title='Number of Contracts')
         st.plotly_chart(fig3, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_month.to_csv(index=False)
-            st.download_button(
-                f"Download Monthly Contract Trends (CSV)",
-                data=csv,
-                file_name="contracts_by_month.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_month.to_excel(writer, sheet_name='Monthly Contracts', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Monthly Contract Trends (Excel)",
-                data=buffer,
-                file_name="contracts_by_month.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Monthly Contract Trends", "contracts_by_month", download_format, lambda data=df_month: [data], sheet_name="Monthly Contracts")
 
 # Claims Analysis Report
 elif report_type == "Claims Analysis":
     st.subheader("Claims Analysis Report")
+    # Independent reports: load them in parallel
+    (
+        metrics,
+        claims_by_status,
+        claims_by_type,
+        claim_amounts,
+        claims_by_month
+    ) = claim_reports(
+        get_claims_metrics,
+        get_claims_by_status,
+        get_claims_by_type,
+        get_claim_amounts_by_type,
+        get_claims_by_month
+    )
     
     # Display overall claims metrics
-    metrics = get_claims_metrics()
     if metrics and metrics[0]['TotalClaims'] > 0:
         col1, col2, col3 = st.columns(3)
         
@@ -239,10 +312,9 @@ elif report_type == "Claims Analysis":
             st.metric("Pending Claims", pending)
     
     # Claims by status
-    claims_by_status = get_claims_by_status()
-    if claims_by_status:
+    if not claims_by_status.empty:
         st.subheader("Claims by Status")
-        df_status = pd.DataFrame(claims_by_status)
+        df_status = to_frame(claims_by_status)
         
         # Create a pie chart
         fig1 = px.pie(
@@ -254,46 +326,20 @@ elif report_type == "Claims Analysis":
         )
         st.plotly_chart(fig1, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_status.to_csv(index=False)
-            st.download_button(
-                f"Download Claims by Status (CSV)",
-                data=csv,
-                file_name="claims_by_status.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_status.to_excel(writer, sheet_name='Claims by Status', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Claims by Status (Excel)",
-                data=buffer,
-                file_name="claims_by_status.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Claims by Status", "claims_by_status", download_format, lambda data=df_status: [data], sheet_name="Claims by Status", params=(include_history,))
     
     # Claims by insurance type
-    claims_by_type = get_claims_by_type()
-    claim_amounts = get_claim_amounts_by_type()
-    
-    if claims_by_type and claim_amounts:
+    if not claims_by_type.empty and not claim_amounts.empty:
         st.subheader("Claims Analysis by Insurance Type")
         
         # Merge the data
-        df_type = pd.DataFrame(claims_by_type)
-        df_amounts = pd.DataFrame(claim_amounts)
+        df_type = to_frame(claims_by_type)
+        df_amounts = to_frame(claim_amounts)
         df_combined = pd.merge(df_type, df_amounts, on='InsuranceName')
         
-        # Format for display
-        df_display = df_combined.copy()
-        df_display['TotalAmount'] = df_display['TotalAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
-        df_display['AverageAmount'] = df_display['AverageAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
-        
         # Display the data as a table
-        st.dataframe(df_display, use_container_width=True)
+        display_table(df_combined)
         
         # Create a bar chart for claim counts
         fig2 = px.bar(
@@ -307,32 +353,13 @@ elif report_type == "Claims Analysis":
         fig2.update_layout(xaxis_title='Insurance Type', yaxis_title='Number of Claims')
         st.plotly_chart(fig2, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_combined.to_csv(index=False)
-            st.download_button(
-                f"Download Claims by Insurance Type (CSV)",
-                data=csv,
-                file_name="claims_by_type.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_combined.to_excel(writer, sheet_name='Claims by Type', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Claims by Insurance Type (Excel)",
-                data=buffer,
-                file_name="claims_by_type.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Claims by Insurance Type", "claims_by_type", download_format, lambda data=df_combined: [data], sheet_name="Claims by Type", params=(include_history,))
     
     # Monthly claim trends
-    claims_by_month = get_claims_by_month()
-    if claims_by_month:
+    if not claims_by_month.empty:
         st.subheader("Monthly Claims Trends")
-        df_month = pd.DataFrame(claims_by_month)
+        df_month = to_frame(claims_by_month)
         
         # Create a line chart
         fig3 = px.line(
@@ -347,33 +374,26 @@ elif report_type == "Claims Analysis":
         fig3.update_layout(xaxis_title='Month', yaxis_title='Number of Claims')
         st.plotly_chart(fig3, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_month.to_csv(index=False)
-            st.download_button(
-                f"Download Monthly Claims Trends (CSV)",
-                data=csv,
-                file_name="claims_by_month.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_month.to_excel(writer, sheet_name='Monthly Claims', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Monthly Claims Trends (Excel)",
-                data=buffer,
-                file_name="claims_by_month.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Monthly Claims Trends", "claims_by_month", download_format, lambda data=df_month: [data], sheet_name="Monthly Claims", params=(include_history,))
 
 # Payout Summary Report
 elif report_type == "Payout Summary":
     st.subheader("Payout Summary Report")
+    # Independent reports: load them in parallel
+    (
+        metrics,
+        payouts_by_status,
+        payouts_by_type,
+        payouts_by_month
+    ) = claim_reports(
+        get_payout_metrics,
+        get_payouts_by_status,
+        get_payouts_by_type,
+        get_payouts_by_month
+    )
     
     # Display overall payout metrics
-    metrics = get_payout_metrics()
     if metrics and metrics[0]['TotalPayouts'] > 0:
         col1, col2, col3 = st.columns(3)
         
@@ -391,18 +411,12 @@ elif report_type == "Payout Summary":
             st.metric("Average Payout Amount", f"${avg_amount:,.2f}")
     
     # Payouts by status
-    payouts_by_status = get_payouts_by_status()
-    if payouts_by_status:
+    if not payouts_by_status.empty:
         st.subheader("Payouts by Status")
-        df_status = pd.DataFrame(payouts_by_status)
-        
-        # Format the amounts for display
-        df_display = df_status.copy()
-        if 'TotalAmount' in df_display.columns:
-            df_display['TotalAmount'] = df_display['TotalAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
+        df_status = to_frame(payouts_by_status)
         
         # Display the data as a table
-        st.dataframe(df_display, use_container_width=True)
+        display_table(df_status)
         
         # Create a pie chart for payout counts
         fig1 = px.pie(
@@ -414,39 +428,16 @@ elif report_type == "Payout Summary":
         )
         st.plotly_chart(fig1, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_status.to_csv(index=False)
-            st.download_button(
-                f"Download Payouts by Status (CSV)",
-                data=csv,
-                file_name="payouts_by_status.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_status.to_excel(writer, sheet_name='Payouts by Status', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Payouts by Status (Excel)",
-                data=buffer,
-                file_name="payouts_by_status.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Payouts by Status", "payouts_by_status", download_format, lambda data=df_status: [data], sheet_name="Payouts by Status", params=(include_history,))
     
     # Payouts by insurance type
-    payouts_by_type = get_payouts_by_type()
-    if payouts_by_type:
+    if not payouts_by_type.empty:
         st.subheader("Payouts by Insurance Type")
-        df_type = pd.DataFrame(payouts_by_type)
-        
-        # Format the amounts for display
-        df_display = df_type.copy()
-        df_display['TotalAmount'] = df_display['TotalAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
+        df_type = to_frame(payouts_by_type)
         
         # Display the data as a table
-        st.dataframe(df_display, use_container_width=True)
+        display_table(df_type)
         
         # Create a bar chart
         fig2 = px.bar(
@@ -460,32 +451,13 @@ elif report_type == "Payout Summary":
         fig2.update_layout(xaxis_title='Insurance Type', yaxis_title='Total Amount ($)')
         st.plotly_chart(fig2, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_display.to_csv(index=False)
-            st.download_button(
-                f"Download Payouts by Insurance Type (CSV)",
-                data=csv,
-                file_name="payouts_by_type.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_display.to_excel(writer, sheet_name='Payouts by Type', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Payouts by Insurance Type (Excel)",
-                data=buffer,
-                file_name="payouts_by_type.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Payouts by Insurance Type", "payouts_by_type", download_format, lambda data=df_type: [data], sheet_name="Payouts by Type", params=(include_history,))
     
     # Monthly payout trends
-    payouts_by_month = get_payouts_by_month()
-    if payouts_by_month:
+    if not payouts_by_month.empty:
         st.subheader("Monthly Payout Trends")
-        df_month = pd.DataFrame(payouts_by_month)
+        df_month = to_frame(payouts_by_month)
         
         # Create a line chart
         fig3 = px.line(
@@ -500,33 +472,26 @@ elif report_type == "Payout Summary":
         fig3.update_layout(xaxis_title='Month', yaxis_title='Total Amount ($)')
         st.plotly_chart(fig3, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_month.to_csv(index=False)
-            st.download_button(
-                f"Download Monthly Payout Trends (CSV)",
-                data=csv,
-                file_name="payouts_by_month.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_month.to_excel(writer, sheet_name='Monthly Payouts', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Monthly Payout Trends (Excel)",
-                data=buffer,
-                file_name="payouts_by_month.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Monthly Payout Trends", "payouts_by_month", download_format, lambda data=df_month: [data], sheet_name="Monthly Payouts", params=(include_history,))
 
 # Customer Activity Report
 elif report_type == "Customer Activity":
     st.subheader("Customer Activity Report")
+    # Independent reports: load them in parallel
+    (
+        overview,
+        top_customers_contracts,
+        top_customers_payouts,
+        top_customers_claims
+    ) = latest_reports(
+        get_customer_overview,
+        get_top_customers_by_contracts,
+        get_top_customers_by_payout,
+        get_top_customers_by_claims
+    )
     
     # Display customer overview metrics
-    overview = get_customer_overview()
     if overview and overview[0]['TotalCustomers'] > 0:
         col1, col2, col3, col4 = st.columns(4)
         
@@ -548,10 +513,9 @@ elif report_type == "Customer Activity":
             st.metric("Avg Payout/Customer", f"${avg_payout:,.2f}")
     
     # Top customers by contracts
-    top_customers_contracts = get_top_customers_by_contracts()
-    if top_customers_contracts:
+    if not top_customers_contracts.empty:
         st.subheader("Top Customers by Number of Contracts")
-        df_contracts = pd.DataFrame(top_customers_contracts)
+        df_contracts = to_frame(top_customers_contracts)
         
         # Create a bar chart
         fig1 = px.bar(
@@ -565,39 +529,16 @@ elif report_type == "Customer Activity":
         fig1.update_layout(xaxis_title='Customer', yaxis_title='Number of Contracts')
         st.plotly_chart(fig1, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_contracts.to_csv(index=False)
-            st.download_button(
-                f"Download Top Customers by Contracts (CSV)",
-                data=csv,
-                file_name="top_customers_contracts.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_contracts.to_excel(writer, sheet_name='Top Customers', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Top Customers by Contracts (Excel)",
-                data=buffer,
-                file_name="top_customers_contracts.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Top Customers by Contracts", "top_customers_contracts", download_format, lambda data=df_contracts: [data], sheet_name="Top Customers")
     
     # Top customers by payout
-    top_customers_payouts = get_top_customers_by_payout()
-    if top_customers_payouts:
+    if not top_customers_payouts.empty:
         st.subheader("Top Customers by Total Payout Amount")
-        df_payouts = pd.DataFrame(top_customers_payouts)
-        
-        # Format for display
-        df_display = df_payouts.copy()
-        df_display['TotalPayoutAmount'] = df_display['TotalPayoutAmount'].apply(lambda x: f"${x:,.2f}" if x else "$0.00")
+        df_payouts = to_frame(top_customers_payouts)
         
         # Display the table
-        st.dataframe(df_display, use_container_width=True)
+        display_table(df_payouts)
         
         # Create a bar chart
         fig2 = px.bar(
@@ -611,32 +552,13 @@ elif report_type == "Customer Activity":
         fig2.update_layout(xaxis_title='Customer', yaxis_title='Total Payout Amount ($)')
         st.plotly_chart(fig2, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_display.to_csv(index=False)
-            st.download_button(
-                f"Download Top Customers by Payouts (CSV)",
-                data=csv,
-                file_name="top_customers_payouts.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_display.to_excel(writer, sheet_name='Top Customers', index=False)
-            buffer.seek(0)
-            st.download_button(
-                f"Download Top Customers by Payouts (Excel)",
-                data=buffer,
-                file_name="top_customers_payouts.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+        # Allow download (the file is only built when requested)
+        export_button("Top Customers by Payouts", "top_customers_payouts", download_format, lambda data=df_payouts: [data], sheet_name="Top Customers")
     
     # Top customers by claims
-    top_customers_claims = get_top_customers_by_claims()
-    if top_customers_claims:
+    if not top_customers_claims.empty:
         st.subheader("Top Customers by Number of Claims")
-        df_claims = pd.DataFrame(top_customers_claims)
+        df_claims = to_frame(top_customers_claims)
         
         # Create a bar chart
         fig3 = px.bar(
@@ -650,23 +572,84 @@ elif report_type == "Customer Activity":
         fig3.update_layout(xaxis_title='Customer', yaxis_title='Number of Claims')
         st.plotly_chart(fig3, use_container_width=True)
         
-        # Allow download
-        if download_format == "CSV":
-            csv = df_claims.to_csv(index=False)
-            st.download_button(
-                f"Download Top Customers by Claims (CSV)",
-                data=csv,
-                file_name="top_customers_claims.csv",
-                mime="text/csv"
-            )
-        else:
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_claims.to_excel(writer, sheet_name='Top Customers', index=False)
-            buffer.seek(0)
+        # Allow download (the file is only built when requested)
+        export_button("Top Customers by Claims", "top_customers_claims", download_format, lambda data=df_claims: [data], sheet_name="Top Customers")
+
+# Claims & Payouts Explorer
+elif report_type == "Claims & Payouts Explorer":
+    st.subheader("Claims & Payouts Explorer")
+    st.write("Slice the claims or payouts cube by insurance type, status, month and customer segment. Everything is computed in memory from one precomputed cube.")
+    
+    cube_explorer()
+
+# Full data export
+# Exports run as background jobs, so a large export neither blocks this page nor times out.
+# Identical requests share one job, and finished files stay downloadable until they expire.
+
+def show_export_jobs(jobs):
+    """Show export jobs with their progress"""
+    df_jobs = pd.DataFrame(jobs)
+    df_jobs['Progress'] = df_jobs['progress_rows'] / df_jobs['total_rows'].where(df_jobs['total_rows'] > 0)
+    df_jobs.loc[df_jobs['status'] == 'done', 'Progress'] = 1.0
+    df_jobs['Created'] = pd.to_datetime(df_jobs['created_at'], unit='s')
+    df_jobs['Expires'] = pd.to_datetime(df_jobs['expires_at'], unit='s')
+    st.dataframe(
+        df_jobs[['job_id', 'dataset', 'format', 'status', 'Progress', 'progress_rows', 'Created', 'Expires', 'error']],
+        column_config={
+            'job_id': "Job",
+            'dataset': "Dataset",
+            'format': "Format",
+            'status': "Status",
+            'Progress': st.column_config.ProgressColumn(min_value=0, max_value=1, format="%.0f%%"),
+            'progress_rows': st.column_config.NumberColumn("Rows Written"),
+            'Created': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm"),
+            'Expires': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm"),
+            'error': "Error"
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+@st.fragment(run_every=2)
+def export_jobs_progress():
+    """Poll running export jobs; reruns the page once they have all finished"""
+    jobs = list_export_jobs()
+    show_export_jobs(jobs)
+    if not any(job['status'] in ACTIVE_STATUSES for job in jobs):
+        st.rerun()
+
+st.markdown('---')
+st.subheader("Full Data Export")
+st.write("Export every row of a dataset in the background. Rows are streamed from the database in batches and written straight to the file. Parquet exports are full-table snapshots for analytics tools.")
+
+export_dataset = st.selectbox("Dataset", list(EXPORT_QUERIES.keys()))
+if st.button(f"Start Export ({download_format})", key="start_full_export"):
+    job = submit_export_job(export_dataset, download_format)
+    st.info(f"Export job {job['job_id']} is {job['status']}.")
+
+export_jobs = list_export_jobs()
+if not export_jobs:
+    st.info("No export jobs yet.")
+elif any(job['status'] in ACTIVE_STATUSES for job in export_jobs):
+    export_jobs_progress()
+else:
+    show_export_jobs(export_jobs)
+
+finished_jobs = {
+    f"{job['dataset']} ({job['format']}) - {job['job_id']}": job
+    for job in export_jobs if job['status'] == 'done'
+}
+if finished_jobs:
+    selected_job = finished_jobs[st.selectbox("Finished export:", list(finished_jobs.keys()))]
+    extension, mime = FORMATS[selected_job['format']]
+    try:
+        with open(selected_job['path'], "rb") as f:
             st.download_button(
-                f"Download Top Customers by Claims (Excel)",
-                data=buffer,
-                file_name="top_customers_claims.xlsx",
-                mime="application/vnd.ms-excel"
+                f"Download {selected_job['dataset']} ({selected_job['format']})",
+                data=f,
+                file_name=f"{selected_job['dataset'].lower().replace(' ', '_')}_full.{extension}",
+                mime=mime
             )
+    except FileNotFoundError:
+        # Purged (expired) since the job list was read, or removed from the disk
+        st.info("This export has expired. Start a new export to download the data.")
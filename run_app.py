@@ -0,0 +1,13 @@
+import sys
+from streamlit.web import cli as stcli
+from services.warmup import start_readiness_server, start_warmup
+
+# Start the app like `streamlit run Home.py`, plus:
+# - a cache warm-up that runs in this process once the server is up
+# - a readiness endpoint (http://host:READINESS_PORT/ready) for the load balancer
+# Extra arguments are passed on to Streamlit, e.g. python run_app.py --server.port 8501
+if __name__ == "__main__":
+    start_readiness_server()
+    start_warmup()
+    sys.argv = ["streamlit", "run", "Home.py", *sys.argv[1:]]
+    sys.exit(stcli.main())
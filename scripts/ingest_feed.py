@@ -0,0 +1,48 @@
+"""Load a partner feed of contracts or claims: python -m scripts.ingest_feed claims feed.csv"""
+import sys
+import time
+import argparse
+import pandas as pd
+from models.ingest import prepare_contract_feed, prepare_claim_feed, ingest_contracts, ingest_claims
+from utils.bulk_import import IMPORT_CHUNK_SIZE, read_upload, error_report
+
+FEEDS = {
+    'contracts': (prepare_contract_feed, ingest_contracts),
+    'claims': (prepare_claim_feed, ingest_claims)
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate and bulk load a partner feed file (CSV or Excel)")
+    parser.add_argument("feed", choices=FEEDS, help="what the file contains")
+    parser.add_argument("path", help="CSV or .xlsx file")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument("--errors", help="write the rejected rows with their reasons to this CSV file")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    prepare, ingest = FEEDS[args.feed]
+    started = time.perf_counter()
+
+    raw = read_upload(args.path)
+    rows, errors, already_loaded = prepare(raw)
+    print(f"{len(raw):,} rows read: {len(rows):,} new, {already_loaded:,} already loaded, {len(errors):,} invalid "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    if not args.dry_run and len(rows):
+        def progress(done, total):
+            print(f"\r{done:,} / {total:,} rows", end="", flush=True)
+
+        loaded, load_errors = ingest(rows, chunk_size=args.chunk_size, progress=progress)
+        elapsed = time.perf_counter() - started
+        print(f"\n{loaded:,} {args.feed} loaded in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s)")
+        errors = pd.concat([errors, load_errors]).sort_index()
+
+    if len(errors) and args.errors:
+        error_report(raw, errors).to_csv(args.errors, index=False)
+        print(f"Rejected rows written to {args.errors}")
+    return 1 if len(errors) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Load test for the API server: python scripts/load_test.py http://localhost:8000/contracts"""
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+from urllib.parse import urlsplit
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send GET requests over keep-alive connections and report throughput")
+    parser.add_argument("urls", nargs="+", help="URLs to request, used round-robin")
+    parser.add_argument("-c", "--concurrency", type=int, default=64, help="open connections")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("-k", "--api-key", help="value of the X-API-Key header")
+    parser.add_argument("--etag", action="store_true", help="revalidate with If-None-Match like a caching client")
+    return parser.parse_args()
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns the status and headers"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers
+
+async def client(targets, deadline, args, latencies, statuses, offset):
+    """One keep-alive connection sending requests back to back until the deadline"""
+    host, port = targets[0][0], targets[0][1]
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            _, _, path = targets[i % len(targets)]
+            i += 1
+            headers = [f"GET {path} HTTP/1.1", f"Host: {host}:{port}"]
+            if args.api_key:
+                headers.append(f"X-API-Key: {args.api_key}")
+            if args.etag and path in etags:
+                headers.append(f"If-None-Match: {etags[path]}")
+            started = time.perf_counter()
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode())
+            status, response_headers = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            if "etag" in response_headers:
+                etags[path] = response_headers["etag"]
+    finally:
+        writer.close()
+
+async def run(args):
+    targets = []
+    for url in args.urls:
+        parts = urlsplit(url)
+        targets.append((parts.hostname, parts.port or 80, parts.path + (f"?{parts.query}" if parts.query else "")))
+
+    latencies, statuses = [], Counter()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    results = await asyncio.gather(
+        *[client(targets, deadline, args, latencies, statuses, n) for n in range(args.concurrency)],
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    errors = [result for result in results if isinstance(result, Exception)]
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+
+    print(f"{len(latencies)} requests in {elapsed:.1f}s over {args.concurrency} connections")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"Latency ms: p50 {percentile(0.5):.1f}  p95 {percentile(0.95):.1f}  p99 {percentile(0.99):.1f}")
+    print(f"Statuses: {dict(statuses)}")
+    if errors:
+        print(f"Connection errors: {len(errors)} (first: {errors[0]!r})")
+    return 0 if not errors and all(status < 500 for status in statuses) else 1
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -0,0 +1,170 @@
+import os
+import time
+import datetime
+import uuid
+import logging
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from database.db_connector import get_data_version
+from database.local_store import init_local_store, local_query, local_execute, state_path
+from models.report import stream_export, count_export_rows
+from utils.export import FORMATS, EXPORT_TTL, to_tables, write_export
+
+logger = logging.getLogger(__name__)
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# Finished export files are kept on disk for this long
+EXPORT_JOB_TTL = int(os.getenv("EXPORT_JOB_TTL_HOURS", "24")) * 3600
+ACTIVE_STATUSES = ('queued', 'running')
+# Server processes sharing APP_STATE_DIR each run their own jobs and refresh their heartbeat;
+# the jobs of a process silent for EXPORT_STALE_SECONDS (it stopped) are started again by another
+EXPORT_HEARTBEAT_SECONDS = 15
+EXPORT_STALE_SECONDS = int(os.getenv("EXPORT_STALE_SECONDS", "60"))
+# Owner of the jobs this process runs
+PROCESS_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Serializes the "find an identical job, else create one" step
+_submit_lock = threading.Lock()
+
+@st.cache_resource
+def get_executor():
+    """Worker pool for export jobs (one per server process)"""
+    executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export-job")
+    init_local_store()
+    reclaim_stale_jobs(executor)
+    threading.Thread(target=heartbeat_loop, args=(executor,), name="export-heartbeat", daemon=True).start()
+    return executor
+
+def reclaim_stale_jobs(executor):
+    """Start again, from the beginning, the unfinished jobs of server processes that stopped"""
+    stale_before = time.time() - EXPORT_STALE_SECONDS
+    stale = local_query(
+        "SELECT job_id FROM export_jobs WHERE status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+        (stale_before,)
+    )
+    for job in stale:
+        now = time.time()
+        # The update checks the job is still stale, so only one process takes it over
+        claimed = local_execute(
+            """
+            UPDATE export_jobs SET status = 'queued', progress_rows = 0, owner = ?, heartbeat_at = ?, updated_at = ?
+            WHERE job_id = ? AND status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+            """,
+            (PROCESS_OWNER, now, now, job['job_id'], stale_before)
+        )
+        if claimed:
+            executor.submit(run_export_job, job['job_id'])
+
+def heartbeat_loop(executor):
+    """Keep the jobs of this process marked as alive, and take over those of stopped processes"""
+    while True:
+        time.sleep(EXPORT_HEARTBEAT_SECONDS)
+        try:
+            local_execute(
+                "UPDATE export_jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time(), PROCESS_OWNER)
+            )
+            reclaim_stale_jobs(executor)
+        except sqlite3.Error:
+            logger.exception("Export job heartbeat failed")
+
+def job_key(dataset, fmt):
+    """Key under which identical export requests are deduplicated"""
+    key = repr((dataset, fmt, get_data_version())).encode()
+    return hashlib.sha1(key).hexdigest()
+
+def get_export_job(job_id):
+    """Get an export job by ID"""
+    result = local_query("SELECT * FROM export_jobs WHERE job_id = ?", (job_id,))
+    return result[0] if result else None
+
+def list_export_jobs(limit=20):
+    """Get the most recent export jobs"""
+    get_executor()  # Creates the job table and resumes unfinished jobs on first use
+    purge_expired_jobs()
+    return local_query("SELECT * FROM export_jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+
+def update_export_job(job_id, **fields):
+    """Update columns of an export job"""
+    fields['updated_at'] = time.time()
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    local_execute(f"UPDATE export_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+def submit_export_job(dataset, fmt):
+    """Queue a full export of a dataset, or return an identical job that is running or recently finished"""
+    executor = get_executor()
+    key = job_key(dataset, fmt)
+    now = time.time()
+    with _submit_lock:
+        existing = local_query(
+            """
+            SELECT * FROM export_jobs
+            WHERE job_key = ?
+              AND (status IN ('queued', 'running') OR (status = 'done' AND created_at > ?))
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (key, now - EXPORT_TTL)
+        )
+        if existing:
+            return existing[0]
+
+        job_id = uuid.uuid4().hex[:12]
+        local_execute(
+            """
+            INSERT INTO export_jobs (job_id, job_key, dataset, format, status, created_at, updated_at, owner, heartbeat_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)
+            """,
+            (job_id, key, dataset, fmt, now, now, PROCESS_OWNER, now)
+        )
+    executor.submit(run_export_job, job_id)
+    return get_export_job(job_id)
+
+def track_progress(job_id, batches):
+    """Pass record batches through, recording the number of rows written so far"""
+    rows = 0
+    for batch in batches:
+        yield batch
+        rows += batch.num_rows
+        update_export_job(job_id, progress_rows=rows)
+
+def run_export_job(job_id):
+    """Run an export job in a worker thread"""
+    # Claim the job; it may already have been picked up by another worker (or taken over by another process)
+    claimed = local_execute(
+        "UPDATE export_jobs SET status = 'running', progress_rows = 0, updated_at = ? WHERE job_id = ? AND status = 'queued' AND owner = ?",
+        (time.time(), job_id, PROCESS_OWNER)
+    )
+    if not claimed:
+        return
+
+    job = get_export_job(job_id)
+    path = state_path("exports", f"{job_id}.{FORMATS[job['format']][0]}")
+    tmp_path = f"{path}.tmp"
+    try:
+        update_export_job(job_id, total_rows=count_export_rows(job['dataset']))
+        tables = to_tables(track_progress(job_id, stream_export(job['dataset'])))
+        # Parquet snapshots record what they contain in the file metadata
+        metadata = {'dataset': job['dataset'], 'snapshot_at': datetime.datetime.now().isoformat(timespec='seconds')}
+        if not write_export(tables, tmp_path, job['format'], job['dataset'], metadata):
+            raise RuntimeError("The export query returned no result. Check the database connection.")
+        os.replace(tmp_path, path)
+        update_export_job(job_id, status='done', path=path, expires_at=time.time() + EXPORT_JOB_TTL)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        update_export_job(job_id, status='failed', error=str(e))
+
+def purge_expired_jobs():
+    """Delete the files of finished jobs past their expiry"""
+    expired = local_query(
+        "SELECT job_id, path FROM export_jobs WHERE status = 'done' AND expires_at < ?",
+        (time.time(),)
+    )
+    for job in expired:
+        if job['path'] and os.path.exists(job['path']):
+            os.remove(job['path'])
+        update_export_job(job['job_id'], status='expired', path=None)
@@ -0,0 +1,189 @@
+import os
+import time
+import logging
+import pickle
+import threading
+import streamlit as st
+from contextlib import closing
+from database.db_connector import fetch_concurrently
+from database.local_store import init_local_store, local_query, create_local_connection
+from database.olap import uncached_reports, olap_enabled, refresh_replica
+from models.report import (
+    get_contracts_by_type,
+    get_contracts_by_status,
+    get_contracts_by_month,
+    get_active_contracts_summary,
+    get_claims_by_status,
+    get_claims_by_type,
+    get_claims_by_month,
+    get_claim_amounts_by_type,
+    get_claims_metrics,
+    get_payouts_by_type,
+    get_payouts_by_month,
+    get_payouts_by_status,
+    get_payout_metrics,
+    get_top_customers_by_contracts,
+    get_top_customers_by_payout,
+    get_top_customers_by_claims,
+    get_customer_overview
+)
+from models.cube import get_claims_cube, get_payouts_cube
+
+logger = logging.getLogger(__name__)
+
+REPORT_REFRESH_SECONDS = int(os.getenv("REPORT_REFRESH_SECONDS", "300"))
+# Reports over every customer or the cubes change slowly and cost the most
+REPORT_SLOW_REFRESH_SECONDS = int(os.getenv("REPORT_SLOW_REFRESH_SECONDS", "900"))
+REPORT_SNAPSHOTS_KEPT = int(os.getenv("REPORT_SNAPSHOTS_KEPT", "5"))
+# How often the scheduler looks for reports that are due
+SCHEDULER_TICK_SECONDS = 5
+
+# Reports served from snapshots, with their refresh cadence in seconds
+SCHEDULED_REPORTS = {
+    fn.__name__: (fn, REPORT_REFRESH_SECONDS) for fn in [
+        get_contracts_by_type,
+        get_contracts_by_status,
+        get_contracts_by_month,
+        get_active_contracts_summary,
+        get_claims_by_status,
+        get_claims_by_type,
+        get_claims_by_month,
+        get_claim_amounts_by_type,
+        get_claims_metrics,
+        get_payouts_by_type,
+        get_payouts_by_month,
+        get_payouts_by_status,
+        get_payout_metrics
+    ]
+}
+SCHEDULED_REPORTS.update({
+    fn.__name__: (fn, REPORT_SLOW_REFRESH_SECONDS) for fn in [
+        get_top_customers_by_contracts,
+        get_top_customers_by_payout,
+        get_top_customers_by_claims,
+        get_customer_overview,
+        get_claims_cube,
+        get_payouts_cube
+    ]
+})
+
+# Unpickled snapshot data of this process: report name -> (version, data)
+_loaded = {}
+_loaded_lock = threading.Lock()
+# Set by request_refresh() to recompute every report on the next tick
+_refresh_requested = threading.Event()
+_refreshing = threading.Event()
+
+def compute_snapshot(name):
+    """Recompute a report from the database and store it as a new snapshot version"""
+    fn, _ = SCHEDULED_REPORTS[name]
+    # Call the undecorated function so neither st.cache_data nor the query caches answer
+    with uncached_reports():
+        data = fn.__wrapped__()
+
+    with closing(create_local_connection()) as connection:
+        with connection:
+            # Next version number and insert in one statement, so concurrent refreshes cannot collide
+            version = connection.execute(
+                """
+                INSERT INTO report_snapshots (report, version, created_at, data)
+                SELECT ?, COALESCE(MAX(version), 0) + 1, ?, ? FROM report_snapshots WHERE report = ?
+                RETURNING version
+                """,
+                (name, time.time(), pickle.dumps(data), name)
+            ).fetchone()[0]
+            connection.execute(
+                "DELETE FROM report_snapshots WHERE report = ? AND version <= ?",
+                (name, version - REPORT_SNAPSHOTS_KEPT)
+            )
+    with _loaded_lock:
+        _loaded[name] = (version, data)
+    return data
+
+def latest_versions():
+    """Latest snapshot version and time of every report"""
+    rows = local_query(
+        """
+        SELECT report, MAX(version) AS version, MAX(created_at) AS created_at
+        FROM report_snapshots
+        GROUP BY report
+        """
+    )
+    return {row['report']: row for row in rows}
+
+def latest_report(fn):
+    """Latest snapshot of a report; computed on the spot only if it has never been taken"""
+    name = fn.__name__
+    start_scheduler()
+    latest = latest_versions().get(name)
+    if latest is None:
+        try:
+            return compute_snapshot(name)
+        except Exception:
+            return fn()  # Fall back to the live query
+
+    with _loaded_lock:
+        loaded = _loaded.get(name)
+    if loaded and loaded[0] == latest['version']:
+        return loaded[1]
+    result = local_query(
+        "SELECT data FROM report_snapshots WHERE report = ? AND version = ?",
+        (name, latest['version'])
+    )
+    data = pickle.loads(result[0]['data'])
+    with _loaded_lock:
+        _loaded[name] = (latest['version'], data)
+    return data
+
+def latest_reports(*fns):
+    """Latest snapshots of several reports, loaded in parallel (see latest_report)"""
+    return fetch_concurrently(*[lambda fn=fn: latest_report(fn) for fn in fns])
+
+def snapshot_time():
+    """Time of the oldest latest snapshot across reports (epoch seconds), or None"""
+    versions = latest_versions()
+    if not versions:
+        return None
+    return min(row['created_at'] for row in versions.values())
+
+def request_refresh():
+    """Ask the scheduler to recompute every report now; returns without waiting"""
+    _refresh_requested.set()
+
+def is_refreshing():
+    """Whether an on-demand refresh is queued or running"""
+    return _refresh_requested.is_set() or _refreshing.is_set()
+
+def scheduler_loop():
+    """Recompute reports whose snapshot is older than their cadence, or all on request"""
+    while True:
+        forced = _refresh_requested.is_set()
+        if forced:
+            _refreshing.set()
+            _refresh_requested.clear()
+            if olap_enabled():
+                # Pick up the latest MySQL data before recomputing from the replica
+                try:
+                    refresh_replica()
+                except Exception:
+                    logger.exception("OLAP replica refresh failed")
+
+        versions = latest_versions()
+        now = time.time()
+        for name, (fn, cadence) in SCHEDULED_REPORTS.items():
+            latest = versions.get(name)
+            if forced or latest is None or now - latest['created_at'] >= cadence:
+                try:
+                    compute_snapshot(name)
+                except Exception:
+                    logger.exception("Report snapshot %s failed", name)
+        _refreshing.clear()
+        _refresh_requested.wait(SCHEDULER_TICK_SECONDS)
+
+@st.cache_resource
+def start_scheduler():
+    """Start the report scheduler thread (once per server process)"""
+    init_local_store()
+    thread = threading.Thread(target=scheduler_loop, name="report-scheduler", daemon=True)
+    thread.start()
+    return thread
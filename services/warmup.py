@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models.dashboard import (
+    get_dashboard_metrics,
+    get_recent_contracts,
+    get_recent_claims,
+    get_claims_by_type,
+    get_expiring_contracts_count,
+    get_contracts_by_status
+)
+from models.contract import get_all_contracts, get_contracts_dropdown, get_expiring_contracts
+from models.customer import get_all_customers, get_customers_dropdown
+from models.insurance_type import get_all_insurance_types, get_insurance_types_dropdown
+from models.assessment import (
+    get_all_assessments,
+    get_assessments_dropdown,
+    get_pending_assessments,
+    get_approved_claims,
+    get_active_contracts_dropdown
+)
+from models.payout import (
+    get_all_payouts,
+    get_pending_payouts,
+    get_payouts_dropdown,
+    get_total_approved_payouts,
+    get_payout_counts_by_status
+)
+from services.report_scheduler import SCHEDULED_REPORTS, latest_report
+
+# Queries run at the same time during warm-up (keeps the startup burst on MySQL bounded)
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+# Port of the readiness endpoint for the load balancer (0 disables it)
+READINESS_PORT = int(os.getenv("READINESS_PORT", "8502"))
+
+# Cached calls to pre-populate, with the same arguments the pages use (cache keys include them)
+WARMUP_CALLS = {
+    'get_dashboard_metrics': get_dashboard_metrics,
+    'get_expiring_contracts_count': get_expiring_contracts_count,
+    'get_recent_contracts': lambda: get_recent_contracts(5),
+    'get_recent_claims': lambda: get_recent_claims(5),
+    'get_contracts_by_status': get_contracts_by_status,
+    'get_claims_by_type': get_claims_by_type,
+    'get_all_contracts': get_all_contracts,
+    'get_contracts_dropdown': get_contracts_dropdown,
+    'get_expiring_contracts': get_expiring_contracts,
+    'get_all_customers': get_all_customers,
+    'get_customers_dropdown': get_customers_dropdown,
+    'get_all_insurance_types': get_all_insurance_types,
+    'get_insurance_types_dropdown': get_insurance_types_dropdown,
+    'get_all_assessments': get_all_assessments,
+    'get_assessments_dropdown': get_assessments_dropdown,
+    'get_pending_assessments': get_pending_assessments,
+    'get_active_contracts_dropdown': get_active_contracts_dropdown,
+    'get_all_payouts': get_all_payouts,
+    'get_pending_payouts': get_pending_payouts,
+    'get_approved_claims': get_approved_claims,
+    'get_payouts_dropdown': get_payouts_dropdown,
+    'get_total_approved_payouts': get_total_approved_payouts,
+    'get_payout_counts_by_status': get_payout_counts_by_status
+}
+# Reports are served from snapshots; loading them takes the first snapshot if there is none
+WARMUP_CALLS.update({
+    f"report:{name}": (lambda fn=fn: latest_report(fn))
+    for name, (fn, _) in SCHEDULED_REPORTS.items()
+})
+
+# Warm-up progress, read by the readiness endpoint
+warmup_state = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'completed': 0,
+    'failed': [],
+    'total': len(WARMUP_CALLS)
+}
+
+def run_warmup(concurrency=WARMUP_CONCURRENCY):
+    """Call every warm-up function in parallel and mark the app ready when all have returned.
+
+    Failures are recorded but do not hold back readiness: pages still work with a cold cache.
+    """
+    warmup_state['started_at'] = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="warmup") as executor:
+        futures = {executor.submit(fn): name for name, fn in WARMUP_CALLS.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                warmup_state['completed'] += 1
+            except Exception as e:
+                warmup_state['failed'].append(f"{futures[future]}: {e}")
+    warmup_state['finished_at'] = time.time()
+    warmup_state['ready'] = True
+
+class ReadinessHandler(BaseHTTPRequestHandler):
+    """/ready answers 200 once the warm-up has finished and 503 before; /live always 200"""
+
+    def do_GET(self):
+        if self.path == "/live":
+            status = 200
+        elif self.path == "/ready":
+            status = 200 if warmup_state['ready'] else 503
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(warmup_state).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Health checks would flood the log
+
+def start_readiness_server(port=READINESS_PORT):
+    """Serve the readiness endpoint from a daemon thread"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), ReadinessHandler)
+    threading.Thread(target=server.serve_forever, name="readiness", daemon=True).start()
+    return server
+
+def start_warmup():
+    """Run the warm-up in a background thread once the Streamlit runtime is up"""
+    def wait_and_warm():
+        from streamlit.runtime import Runtime
+        # The caches belong to the runtime; wait for the server to create it
+        while not Runtime.exists():
+            time.sleep(0.2)
+        run_warmup()
+
+    thread = threading.Thread(target=wait_and_warm, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,68 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Rows written per transaction (one multi-row INSERT and one commit per chunk)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_FILE_TYPES = ["csv", "xlsx"]
+
+def read_upload(uploaded_file):
+    """Read an uploaded CSV or Excel file (or the path of one) with every column as text"""
+    name = getattr(uploaded_file, 'name', str(uploaded_file))
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
+    return pd.read_excel(uploaded_file, dtype=str, keep_default_na=False)
+
+def column_key(name):
+    """Column name compared without case, spaces or underscores"""
+    return re.sub(r"[\s_]+", "", str(name)).lower()
+
+def match_columns(df, columns, aliases=None):
+    """Rename the file's columns to the table's column names; returns the frame and the missing columns"""
+    wanted = {column_key(column): column for column in columns}
+    wanted.update({column_key(alias): column for alias, column in (aliases or {}).items()})
+    renames = {name: wanted[column_key(name)] for name in df.columns if column_key(name) in wanted}
+    df = df.rename(columns=renames)
+    return df, [column for column in columns if column not in df.columns]
+
+def to_text(series):
+    """Text column as an Arrow string array (missing values as empty strings)"""
+    return pc.fill_null(pa.array(series.astype(object), type=pa.string(), from_pandas=True), "")
+
+def from_text(array, index):
+    """Arrow string array back to a text column with the given index"""
+    return pd.Series(array.to_numpy(zero_copy_only=False), index=index, dtype=object)
+
+def clean_text(series):
+    """Trim and collapse whitespace in a text column (computed in Arrow, not row by row)"""
+    text = pc.utf8_trim_whitespace(to_text(series))
+    return from_text(pc.replace_substring_regex(text, r"\s+", " "), series.index)
+
+def collect_errors(index, checks):
+    """Error message per row from (failed rows mask, message) checks; empty for valid rows"""
+    messages = pd.Series("", index=index, dtype=object)
+    for failed, message in checks:
+        failed = pd.Series(failed, index=index).fillna(True).astype(bool)
+        messages[failed] = messages[failed] + "; " + message
+    return messages.str.removeprefix("; ")
+
+def format_ids(prefix, first, count, width=3):
+    """Consecutive IDs in the repo's format (prefix + zero-padded number), e.g. C001"""
+    numbers = np.arange(first, first + count).astype(str)
+    return prefix + pd.Series(numbers).str.zfill(width)
+
+def chunked(df, size=IMPORT_CHUNK_SIZE):
+    """Split a frame into consecutive chunks of at most size rows"""
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+def error_report(df, errors):
+    """Rejected rows with their file row number and reason, for download"""
+    rejected = df.loc[errors.index].copy()
+    # Row 1 of the file is the header
+    rejected.insert(0, 'Row', errors.index + 2)
+    rejected.insert(1, 'Error', errors.values)
+    return rejected.reset_index(drop=True)
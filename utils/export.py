@@ -0,0 +1,214 @@
+import os
+import glob
+import hashlib
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import xlsxwriter
+from database.db_connector import MONEY_COLUMNS, get_data_version
+from utils.formatting import DATE_COLUMNS, to_display_table
+
+# Finished export files are reused for as long as query results are cached
+EXPORT_TTL = 300
+# Rows per Excel worksheet (the .xlsx limit, minus the header row)
+EXCEL_MAX_ROWS = 1048575
+# Rows per Parquet row group (each group gets its own min/max statistics)
+PARQUET_ROW_GROUP_SIZE = 100000
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.ms-excel"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet")
+}
+
+@st.cache_resource
+def export_dir():
+    """Directory holding the export files of this server process"""
+    return tempfile.mkdtemp(prefix="insurance_exports_")
+
+def artifact_path(name, fmt, params=()):
+    """Export file path for a report, its parameters and the current data version"""
+    extension = FORMATS[fmt][0]
+    key = repr((params, get_data_version())).encode()
+    digest = hashlib.sha1(key).hexdigest()[:12]
+    return os.path.join(export_dir(), f"{name}-{digest}.{extension}")
+
+def is_fresh(path):
+    """Whether an export file exists and is younger than EXPORT_TTL"""
+    return os.path.exists(path) and time.time() - os.path.getmtime(path) < EXPORT_TTL
+
+def to_tables(chunks):
+    """Normalize export chunks (DataFrames, Arrow tables or record batches) to Arrow tables"""
+    for chunk in chunks:
+        if isinstance(chunk, pd.DataFrame):
+            chunk = pa.Table.from_pandas(chunk, preserve_index=False)
+        elif isinstance(chunk, pa.RecordBatch):
+            chunk = pa.Table.from_batches([chunk])
+        for i, field in enumerate(chunk.schema):
+            # Date columns of pandas frames come in as timestamps; export them as plain dates
+            if field.name in DATE_COLUMNS and pa.types.is_timestamp(field.type):
+                chunk = chunk.set_column(i, field.name, chunk.column(i).cast(pa.date32()))
+        yield chunk
+
+def to_decimal_money(table):
+    """Arrow table with money columns as exact decimal128 dollars (for Parquet)"""
+    for i, field in enumerate(table.schema):
+        if field.name not in MONEY_COLUMNS:
+            continue
+        cents = table.column(i)
+        if pa.types.is_floating(field.type):
+            # Dollars from a pandas frame: round to whole cents first
+            cents = pc.round(pc.multiply(cents, 100)).cast(pa.int64())
+        elif not pa.types.is_integer(field.type):
+            continue
+        dollars = pc.multiply(cents.cast(pa.decimal128(19, 0)), pa.scalar(Decimal('0.01'), pa.decimal128(3, 2)))
+        table = table.set_column(i, field.name, dollars.cast(pa.decimal128(19, 2)))
+    return table
+
+def write_csv(tables, path):
+    """Write tables to a CSV file one chunk at a time"""
+    writer = None
+    with open(path, "wb") as f:
+        for table in tables:
+            table = to_display_table(table)
+            if writer is None:
+                writer = pa_csv.CSVWriter(f, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    return writer is not None
+
+def write_excel(tables, path, sheet_name):
+    """Write tables to an .xlsx file row by row in constant-memory mode"""
+    # constant_memory flushes each row to disk once the next one is started
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    money_format = workbook.add_format({'num_format': '$#,##0.00'})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    worksheet = None
+    row_index = 0
+    sheet_count = 0
+    try:
+        for table in tables:
+            table = to_display_table(table)
+            columns = table.column_names
+            formats = [
+                money_format if col in MONEY_COLUMNS else date_format if col in DATE_COLUMNS else None
+                for col in columns
+            ]
+            for batch in table.to_batches():
+                values = [column.to_pylist() for column in batch.columns]
+                for row in zip(*values):
+                    if worksheet is None or row_index > EXCEL_MAX_ROWS:
+                        # Start a new worksheet (with the header) when the current one is full
+                        sheet_count += 1
+                        title = sheet_name if sheet_count == 1 else f"{sheet_name[:25]} ({sheet_count})"
+                        worksheet = workbook.add_worksheet(title[:31])
+                        worksheet.write_row(0, 0, columns)
+                        row_index = 1
+                    for col_index, value in enumerate(row):
+                        worksheet.write(row_index, col_index, value, formats[col_index])
+                    row_index += 1
+            if worksheet is None:
+                # Empty result: still write the header
+                sheet_count += 1
+                worksheet = workbook.add_worksheet(sheet_name[:31])
+                worksheet.write_row(0, 0, columns)
+                row_index = 1
+    finally:
+        workbook.close()
+    return worksheet is not None
+
+def write_parquet(tables, path, metadata=None):
+    """Write tables to a zstd-compressed Parquet file, one row group at a time"""
+    writer = None
+    pending = []
+    pending_rows = 0
+
+    def flush():
+        # Batches are collected up to a full row group so the statistics cover many rows
+        writer.write_table(pa.concat_tables(pending, promote_options='default'), row_group_size=PARQUET_ROW_GROUP_SIZE)
+        pending.clear()
+
+    try:
+        for table in tables:
+            table = to_decimal_money(table)
+            if writer is None:
+                schema = table.schema.with_metadata(metadata) if metadata else table.schema
+                writer = pq.ParquetWriter(path, schema, compression='zstd', write_statistics=True)
+            pending.append(table.cast(writer.schema))
+            pending_rows += table.num_rows
+            if pending_rows >= PARQUET_ROW_GROUP_SIZE:
+                flush()
+                pending_rows = 0
+        if pending:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer is not None
+
+def write_export(tables, path, fmt, sheet_name, metadata=None):
+    """Write tables to an export file in the given format; False if there was nothing to write"""
+    if fmt == "CSV":
+        return write_csv(tables, path)
+    if fmt == "Parquet":
+        return write_parquet(tables, path, metadata)
+    return write_excel(tables, path, sheet_name)
+
+def build_export(name, fmt, source, sheet_name=None, params=()):
+    """Build (or reuse) the export file for a report and return its path, or None on failure.
+
+    source is a callable returning an iterable of DataFrames, Arrow tables or record batches;
+    it is only called when no fresh file exists for (name, params, data version).
+    """
+    path = artifact_path(name, fmt, params)
+    if is_fresh(path):
+        return path
+
+    # Write next to the final path and rename, so other sessions never see a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    written = write_export(to_tables(source()), tmp_path, fmt, sheet_name or name, {'report': name})
+    if not written:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+
+    # Drop files of this report built from older data
+    for old_path in glob.glob(os.path.join(export_dir(), f"{name}-*.{FORMATS[fmt][0]}")):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass  # Already removed by another session
+    return path
+
+@st.fragment
+def export_button(label, name, fmt, source, sheet_name=None, params=()):
+    """Download button that only builds the export file when asked to"""
+    extension, mime = FORMATS[fmt]
+    path = artifact_path(name, fmt, params)
+    if not is_fresh(path):
+        if not st.button(f"Prepare {label} ({fmt})", key=f"prepare_{name}_{fmt}"):
+            return
+        with st.spinner(f"Preparing {label}..."):
+            path = build_export(name, fmt, source, sheet_name, params)
+        if path is None:
+            st.error("Export failed. Please try again.")
+            return
+
+    with open(path, "rb") as f:
+        st.download_button(
+            f"Download {label} ({fmt})",
+            data=f,
+            file_name=f"{name}.{extension}",
+            mime=mime,
+            key=f"download_{name}_{fmt}"
+        )
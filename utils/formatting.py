@@ -0,0 +1,98 @@
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from database.db_connector import MONEY_COLUMNS
+
+# Columns that hold dates across the model queries (money columns are listed in db_connector)
+DATE_COLUMNS = {'SignDate', 'ExpirationDate', 'AssessmentDate', 'PayoutDate'}
+
+def to_dollars(values):
+    """Money column as float64 dollars; integer columns from typed frames hold cents"""
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype('float64') / 100
+    return values.astype('float64')
+
+def to_frame(rows):
+    """Build a DataFrame with money columns as float64 and date columns as datetime64.
+
+    A DataFrame passed in is not modified (it may be a cached or shared object): the
+    converted columns go into a new frame.
+    """
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    converted = {}
+    for col in df.columns:
+        # One column-wide conversion instead of per-row float()/strftime() calls
+        if col in MONEY_COLUMNS and df[col].dtype != 'float64':
+            converted[col] = to_dollars(df[col])
+        elif col in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            converted[col] = pd.to_datetime(df[col])
+    return df.assign(**converted) if converted else df
+
+def to_display_table(table):
+    """Arrow table with money columns converted from cents to float64 dollars"""
+    for i, name in enumerate(table.column_names):
+        if name in MONEY_COLUMNS and pa.types.is_integer(table.schema.field(i).type):
+            dollars = pc.divide(pc.cast(table.column(i), pa.float64()), 100.0)
+            table = table.set_column(i, name, dollars)
+    return table
+
+def column_config(data):
+    """Column display config so money and dates stay typed and are formatted by the browser"""
+    columns = data.column_names if isinstance(data, pa.Table) else data.columns
+    config = {}
+    for col in columns:
+        if col in MONEY_COLUMNS:
+            config[col] = st.column_config.NumberColumn(format="$%.2f")
+        elif col in DATE_COLUMNS:
+            config[col] = st.column_config.DateColumn(format="YYYY-MM-DD")
+    return config
+
+def display_table(rows, columns=None):
+    """Display query results (rows, DataFrame or Arrow table) with currency and date formatting"""
+    if isinstance(rows, pa.Table):
+        # Arrow tables go to st.dataframe as they are, without a pandas copy
+        data = to_display_table(rows)
+        if columns:
+            data = data.select(columns)
+    else:
+        data = to_frame(rows)
+        if columns:
+            data = data[columns]
+    st.dataframe(data, column_config=column_config(data), use_container_width=True)
+    return data
+
+def format_currency(values):
+    """Format a money column as '$1,234.56' strings (for labels, where column config does not apply).
+
+    Built with Arrow compute kernels over the whole column, without a Python call per row.
+    """
+    values = to_dollars(values)
+    cents = pa.array((values.fillna(0) * 100).round().astype('int64'))
+    units = pc.abs(cents)
+    whole = pc.divide(units, 100)
+    fraction = pc.subtract(units, pc.multiply(whole, 100))
+
+    def group(number):
+        # The last three digits of number, zero-padded
+        last = pc.subtract(number, pc.multiply(pc.divide(number, 1000), 1000))
+        return pc.utf8_lpad(pc.cast(last, pa.string()), width=3, padding='0')
+
+    # Prepend a thousands group for as long as any amount has more digits, then drop the padding
+    dollars = group(whole)
+    rest = pc.divide(whole, 1000)
+    while pc.any(pc.greater(rest, 0)).as_py():
+        dollars = pc.if_else(pc.greater(rest, 0), pc.binary_join_element_wise(group(rest), dollars, ','), dollars)
+        rest = pc.divide(rest, 1000)
+    dollars = pc.utf8_ltrim(dollars, characters='0')
+    dollars = pc.if_else(pc.equal(dollars, ''), '0', dollars)
+
+    sign = pc.if_else(pc.less(cents, 0), '-', '')
+    cents_text = pc.utf8_lpad(pc.cast(fraction, pa.string()), width=2, padding='0')
+    labels = pc.binary_join_element_wise('$', sign, dollars, '.', cents_text, '')
+    return pd.Series(labels.to_numpy(zero_copy_only=False), index=values.index)
+
+def format_dates(values):
+    """Format a date column as 'YYYY-MM-DD' strings"""
+    return pd.to_datetime(pd.Series(values)).dt.strftime('%Y-%m-%d')
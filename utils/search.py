@@ -0,0 +1,74 @@
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Smallest trigram similarity (Dice coefficient) a fuzzy match must have
+FUZZY_MIN_SCORE = 0.3
+
+def pad_text(array):
+    """Lower-cased text padded so the first and last letters also start / end trigrams"""
+    text = pc.utf8_lower(pc.fill_null(array, ""))
+    return pc.binary_join_element_wise("  ", text, " ", "")
+
+def text_trigrams(array):
+    """Trigram codes of every string of an Arrow string array, all strings at once.
+
+    Returns (row, code) arrays with one entry per trigram occurrence; a code packs the
+    three bytes of a trigram into one integer.
+    """
+    padded = pad_text(array)
+    if isinstance(padded, pa.ChunkedArray):
+        padded = padded.combine_chunks()
+    offsets = np.frombuffer(padded.buffers()[1], dtype=np.int32)[padded.offset:padded.offset + len(padded) + 1]
+    data = np.frombuffer(padded.buffers()[2], dtype=np.uint8)
+    counts = np.maximum(np.diff(offsets) - 2, 0)
+    total = int(counts.sum())
+
+    rows = np.repeat(np.arange(len(padded), dtype=np.int32), counts)
+    # Position of each trigram: start of its string plus its rank within the string
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    starts = np.repeat(offsets[:-1], counts) + (np.arange(total) - first)
+    codes = (data[starts].astype(np.int32) << 16) | (data[starts + 1].astype(np.int32) << 8) | data[starts + 2]
+    return rows, codes
+
+class TrigramIndex:
+    """In-memory inverted index of the trigrams of a text column, for typo-tolerant lookups.
+
+    Postings are kept in flat numpy arrays (sorted by trigram), so a lookup is a few
+    binary searches and one bincount over the rows sharing a trigram with the term.
+    """
+
+    def __init__(self, keys, texts):
+        self.keys = np.asarray(keys, dtype=object)
+        rows, codes = text_trigrams(pa.array(texts, type=pa.string()))
+        # Sorting (trigram, row) pairs groups the postings of a trigram and drops repeats
+        pairs = np.unique((codes.astype(np.int64) << 32) | rows)
+        self.codes = (pairs >> 32).astype(np.int32)
+        self.rows = (pairs & 0xFFFFFFFF).astype(np.int32)
+        self.trigram_counts = np.bincount(self.rows, minlength=len(self.keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, term, limit=20, min_score=FUZZY_MIN_SCORE):
+        """Keys of the texts most similar to the term, best first, with their scores"""
+        _, codes = text_trigrams(pa.array([re.sub(r"\s+", " ", term.strip())]))
+        codes = np.unique(codes)
+        if not len(codes) or not len(self.keys):
+            return []
+
+        lo = np.searchsorted(self.codes, codes, side="left")
+        hi = np.searchsorted(self.codes, codes, side="right")
+        matches = np.concatenate([self.rows[a:b] for a, b in zip(lo, hi)])
+        shared = np.bincount(matches, minlength=len(self.keys))
+        # A text needs at least this many shared trigrams to reach min_score, however short it is
+        candidates = np.flatnonzero(shared >= max(1, int(np.ceil(min_score * (len(codes) + 1) / 2))))
+        scores = 2 * shared[candidates] / (len(codes) + self.trigram_counts[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.keys[row], float(score)) for row, score in zip(candidates[order], scores[order])]